@@ -1,27 +1,57 @@
 import time
 import sqlite3
 import argparse
+import contextlib
+import csv
+import io
+import json
+import os
+import platform
 import statistics
+import sys
+import tempfile
+from datetime import datetime, timedelta
+from utils.db_utils import query_filter
+
+# Fixed dataset sizes for the suite; --scale also accepts a plain row count.
+SCALES = {"10k": 10000, "1m": 1000000, "10m": 10000000}
+DATA_DIR = "bench_data"
+RESULTS_DIR = "bench_results"
+# Bump when the dataset recipe changes so cached databases are rebuilt.
+DATASET_VERSION = 2
+# Every dataset ends at the same instant so timestamps depend only on the seed.
+DATASET_END = datetime(2024, 1, 1)
+DATASET_DAYS = 30
+DATASET_USERS = 1000
+DATASET_QUERIES = 5000
+FLAG_TERMS = 500
+# Rows written to a fresh database by the ingest workload.
+INGEST_ROWS = 100000
+# A regression must be slower by this fraction of the baseline and by at
+# least NOISE_FLOOR seconds before compare reports it.
+REGRESSION_THRESHOLD = 0.10
+NOISE_FLOOR = 0.001
 
 def benchmark_queries(db_path='logs.db'):
     conn = sqlite3.connect(db_path)
     cursor = conn.cursor()
 
+    clause, pattern = query_filter(conn, "flask")
     tests = [
-        ("Total logs", "SELECT COUNT(*) FROM search_logs"),
-        ("Searches by test_user_1", "SELECT * FROM search_logs WHERE user_id = 'test_user_1'"),
-        ("Queries containing 'flask'", "SELECT * FROM search_logs WHERE search_query LIKE '%flask%'"),
-        ("Response time avg", "SELECT AVG(response_time) FROM search_logs")
+        ("Total logs", "SELECT COUNT(*) FROM search_logs", ()),
+        ("Searches by test_user_1", "SELECT * FROM search_logs WHERE user_id = 'test_user_1'", ()),
+        ("Queries containing 'flask'", "SELECT * FROM search_logs WHERE 1=1" + clause, (pattern,)),
+        ("Response time avg", "SELECT AVG(response_time) FROM search_logs", ())
     ]
 
     times = []
 
     print("Benchmarking queries:")
-    for label, query in tests:
-        start = time.time()
-        cursor.execute(query)
+    for label, query, params in tests:
+        start = time.perf_counter()
+        cursor.execute(query, params)
         cursor.fetchall()
-        elapsed = round(time.time() - start, 4)
+        elapsed = round(time.perf_counter() - start, 4)
         print(f"{label}: {elapsed} seconds")
         times.append(elapsed)
 
@@ -33,12 +63,260 @@ def benchmark_queries(db_path='logs.db'):
     print(f"Mean time: {statistics.mean(times):.4f}s")
     print(f"Median time: {statistics.median(times):.4f}s")
 
+def parse_scale(scale):
+    """Row count for a named scale ("10k", "1m", "10m") or a plain integer."""
+    if scale.lower() in SCALES:
+        return SCALES[scale.lower()]
+    return int(scale)
+
+def dataset_vocabulary(seed):
+    """Users, queries and flagged terms shared by every dataset built from seed."""
+    from flag_manager import synthetic_workload
+    queries, terms = synthetic_workload(num_queries=DATASET_QUERIES, num_terms=FLAG_TERMS, seed=seed)
+    users = [f"user_{i}" for i in range(DATASET_USERS)]
+    return users, queries, terms
+
+def dataset_rows(rows, seed):
+    from populate_fake_logs import generate_logs
+    users, queries, _ = dataset_vocabulary(seed)
+    return generate_logs(rows, seed=seed, user_pool=users, query_pool=queries, days=DATASET_DAYS, end=DATASET_END)
+
+def build_dataset(rows, seed=0, data_dir=DATA_DIR):
+    """Path to the seeded benchmark database with `rows` rows, generating it on first use."""
+    from populate_fake_logs import insert_logs
+    from optimize_db import INDEXES
+    from utils.db_utils import init_schema
+
+    os.makedirs(data_dir, exist_ok=True)
+    path = os.path.join(data_dir, f"logs_{rows}_seed{seed}_v{DATASET_VERSION}.db")
+    if os.path.exists(path):
+        return path
+
+    print(f"📦 Generating {rows:,} rows into {path}...")
+    start = time.perf_counter()
+    partial = path + ".partial"
+    if os.path.exists(partial):
+        os.remove(partial)
+    conn = sqlite3.connect(partial)
+    init_schema(conn)
+    conn.close()
+    insert_logs(partial, dataset_rows(rows, seed))
+    conn = sqlite3.connect(partial)
+    for idx_name, col in INDEXES:
+        conn.execute(f"CREATE INDEX IF NOT EXISTS {idx_name} ON search_logs({col})")
+    conn.execute("ANALYZE")
+    conn.commit()
+    conn.close()
+    os.replace(partial, path)
+    print(f"Generated in {time.perf_counter() - start:.1f}s")
+    return path
+
+def percentile(samples, q):
+    """Linearly interpolated q-th percentile (0-100) of samples."""
+    ordered = sorted(samples)
+    if len(ordered) == 1:
+        return ordered[0]
+    rank = (len(ordered) - 1) * q / 100
+    low = int(rank)
+    high = min(low + 1, len(ordered) - 1)
+    return ordered[low] + (ordered[high] - ordered[low]) * (rank - low)
+
+def summarize(samples):
+    return {
+        "min": min(samples),
+        "p50": percentile(samples, 50),
+        "p90": percentile(samples, 90),
+        "p95": percentile(samples, 95),
+        "max": max(samples),
+        "mean": statistics.mean(samples),
+        "stdev": statistics.stdev(samples) if len(samples) > 1 else 0.0,
+    }
+
+def time_workload(run, setup=None, warmup=1, repeat=5):
+    """Wall-clock samples (seconds) of run(), after `warmup` untimed calls.
+
+    setup() runs before every call, outside the timed region. Output printed
+    by the tools under test is discarded.
+    """
+    samples = []
+    for i in range(warmup + repeat):
+        if setup:
+            setup()
+        with contextlib.redirect_stdout(io.StringIO()):
+            start = time.perf_counter()
+            run()
+            elapsed = time.perf_counter() - start
+        if i >= warmup:
+            samples.append(elapsed)
+    return samples
+
+def workloads(db_path, seed, scratch):
+    """(name, run, setup) for every workload in the suite, in run order."""
+    import log_filter
+    import flag_manager
+    import import_logs
+    from log_reporter import compute_full_report
+    from utils.db_utils import fetch_data
+    from utils.term_matcher import TermMatcher
+
+    users, queries, terms = dataset_vocabulary(seed)
+    matcher = TermMatcher(terms)
+    # A short word from a popular query, so the substring filter has hits.
+    word = min(queries[0].split(), key=len)
+    last_day = DATASET_END - timedelta(days=1)
+    day_start = last_day.strftime("%Y-%m-%d 00:00:00")
+    day_end = last_day.strftime("%Y-%m-%d 23:59:59")
+
+    conn = sqlite3.connect(db_path)
+    rows = conn.execute("SELECT COUNT(*) FROM search_logs").fetchone()[0]
+    conn.close()
+
+    ingest_csv = os.path.join(scratch, "ingest.csv")
+    ingest_db = os.path.join(scratch, "ingest.db")
+    with open(ingest_csv, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(["timestamp", "user_id", "search_query", "response_time"])
+        writer.writerows(dataset_rows(min(rows, INGEST_ROWS), seed))
+
+    def fresh_ingest_db():
+        for suffix in ("", "-wal", "-shm"):
+            if os.path.exists(ingest_db + suffix):
+                os.remove(ingest_db + suffix)
+
+    def report():
+        conn = sqlite3.connect(db_path)
+        try:
+            compute_full_report(conn)
+        finally:
+            conn.close()
+
+    export_csv = os.path.join(scratch, "export.csv")
+    return [
+        ("ingest", lambda: import_logs.import_from_csv(ingest_csv, db_file=ingest_db), fresh_ingest_db),
+        ("filter_user", lambda: log_filter.filter_logs(db_path, user=users[0]), None),
+        ("filter_query", lambda: log_filter.filter_logs(db_path, query=word), None),
+        ("filter_day", lambda: log_filter.filter_logs(db_path, start=day_start, end=day_end), None),
+        ("aggregate", lambda: fetch_data(db_path), None),
+        ("report", report, None),
+        ("export", lambda: log_filter.export_logs_to_csv(
+            log_filter.filter_logs(db_path, start=day_start, end=day_end), export_csv), None),
+        ("flag_match", lambda: flag_manager.filter_logs(db_path, only_flagged=True, flagged_list=matcher), None),
+    ]
+
+def environment():
+    return {
+        "python": platform.python_version(),
+        "sqlite": sqlite3.sqlite_version,
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+        "cpus": os.cpu_count(),
+    }
+
+def run_suite(rows, seed=0, warmup=1, repeat=5, only=None, data_dir=DATA_DIR):
+    """Run every (or only the named) workload against the seeded dataset; returns the results dict."""
+    db_path = build_dataset(rows, seed, data_dir)
+    results = {}
+    with tempfile.TemporaryDirectory() as scratch:
+        for name, run, setup in workloads(db_path, seed, scratch):
+            if only and name not in only:
+                continue
+            samples = time_workload(run, setup, warmup=warmup, repeat=repeat)
+            stats = summarize(samples)
+            results[name] = {"samples": samples, **stats}
+            print(f"{name:<14} p50={stats['p50']:.4f}s p95={stats['p95']:.4f}s "
+                  f"min={stats['min']:.4f}s max={stats['max']:.4f}s")
+    return {
+        "rows": rows,
+        "seed": seed,
+        "dataset_version": DATASET_VERSION,
+        "warmup": warmup,
+        "repeat": repeat,
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "environment": environment(),
+        "results": results,
+    }
+
+def save_results(report, path=None):
+    if path is None:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        stamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        path = os.path.join(RESULTS_DIR, f"bench_{report['rows']}_seed{report['seed']}_{stamp}.json")
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"📁 Saved results to {path}")
+    return path
+
+def compare_results(baseline, current, threshold=REGRESSION_THRESHOLD, noise_floor=NOISE_FLOOR):
+    """Per-workload p50 comparison; returns (name, baseline_p50, current_p50, ratio, regressed) rows."""
+    rows = []
+    for name, base in baseline["results"].items():
+        if name not in current["results"]:
+            continue
+        old, new = base["p50"], current["results"][name]["p50"]
+        ratio = new / old if old > 0 else float("inf")
+        regressed = new > old * (1 + threshold) and new - old > noise_floor
+        rows.append((name, old, new, ratio, regressed))
+    return rows
+
+def compare_files(baseline_file, current_file, threshold=REGRESSION_THRESHOLD):
+    """Print the comparison of two result files; returns True if nothing regressed."""
+    with open(baseline_file, encoding="utf-8") as f:
+        baseline = json.load(f)
+    with open(current_file, encoding="utf-8") as f:
+        current = json.load(f)
+
+    for key in ("rows", "seed", "dataset_version"):
+        if baseline.get(key) != current.get(key):
+            print(f"⚠️ {key} differs: baseline={baseline.get(key)} current={current.get(key)}")
+
+    print(f"\n{'workload':<14} {'baseline':>10} {'current':>10} {'change':>8}")
+    rows = compare_results(baseline, current, threshold)
+    for name, old, new, ratio, regressed in rows:
+        flag = " ❌ regression" if regressed else ""
+        print(f"{name:<14} {old:>9.4f}s {new:>9.4f}s {(ratio - 1) * 100:>+7.1f}%{flag}")
+
+    regressions = [row[0] for row in rows if row[4]]
+    if regressions:
+        print(f"\n❌ {len(regressions)} regression(s) over {threshold:.0%}: {', '.join(regressions)}")
+        return False
+    print("\n✅ No regressions.")
+    return True
+
 def main():
     parser = argparse.ArgumentParser(description="Run performance benchmarks on logs.db")
     parser.add_argument("--db", default="logs.db", help="Path to SQLite database")
+    sub = parser.add_subparsers(dest="command")
+
+    run = sub.add_parser("run", help="Run the benchmark suite on a seeded synthetic dataset")
+    run.add_argument("--scale", default="10k", help="Dataset size: 10k, 1m, 10m or a row count")
+    run.add_argument("--seed", type=int, default=0, help="Dataset seed")
+    run.add_argument("--warmup", type=int, default=1, help="Untimed runs before measuring")
+    run.add_argument("--repeat", type=int, default=5, help="Timed runs per workload")
+    run.add_argument("--only", help="Comma-separated workloads to run")
+    run.add_argument("--data-dir", default=DATA_DIR, help="Where generated datasets are cached")
+    run.add_argument("--out", help="Results JSON path (default: bench_results/...)")
+    run.add_argument("--baseline", help="Compare against this results file after running")
+    run.add_argument("--threshold", type=float, default=REGRESSION_THRESHOLD, help="Allowed slowdown fraction")
+
+    compare = sub.add_parser("compare", help="Compare two results files and flag regressions")
+    compare.add_argument("baseline", help="Baseline results JSON")
+    compare.add_argument("current", help="Current results JSON")
+    compare.add_argument("--threshold", type=float, default=REGRESSION_THRESHOLD, help="Allowed slowdown fraction")
+
     args = parser.parse_args()
 
-    benchmark_queries(args.db)
+    if args.command == "run":
+        only = set(args.only.split(",")) if args.only else None
+        report = run_suite(parse_scale(args.scale), seed=args.seed, warmup=args.warmup,
+                           repeat=args.repeat, only=only, data_dir=args.data_dir)
+        path = save_results(report, args.out)
+        if args.baseline and not compare_files(args.baseline, path, args.threshold):
+            sys.exit(1)
+    elif args.command == "compare":
+        if not compare_files(args.baseline, args.current, args.threshold):
+            sys.exit(1)
+    else:
+        benchmark_queries(args.db)
 
 if __name__ == "__main__":
     main()
@@ -1,11 +1,52 @@
-import sqlite3
+import argparse
+import time
+from utils.retention import PURGE_BATCH, cutoff_for, enable_incremental_vacuum, purge
 
-conn = sqlite3.connect("logs.db")
-cursor = conn.cursor()
+def print_report(stats, cutoff, elapsed, vacuum=True):
+    rate = stats["rows"] / elapsed if elapsed > 0 else 0
+    scope = f"dated before {cutoff}" if cutoff else "(all logs)"
+    print(f"\n🗑️  Purged {stats['rows']} rows {scope} in {stats['batches']} batches, "
+          f"{elapsed:.2f}s ({rate:,.0f} rows/s)")
+    if stats["dropped_partitions"]:
+        print(f"📁 Dropped {stats['dropped_partitions']} expired partition files")
+    print(f"🔒 Longest write lock held: {stats['max_lock'] * 1000:.1f} ms")
+    print(f"💾 Database size: {stats['bytes_before'] / 1e6:.2f} MB -> {stats['bytes_after'] / 1e6:.2f} MB "
+          f"({stats['pages_freed']} pages returned by incremental vacuum)")
+    if vacuum and stats["batches"] and not stats["pages_freed"]:
+        print("   Freed pages stay in the file for reuse; run once with --enable-incremental-vacuum to let purges shrink it.")
+    if stats["archive"]:
+        print(f"📦 Archived to {stats['archive']}")
 
-# Delete all rows from the search_logs table
-cursor.execute("DELETE FROM search_logs")
+def main():
+    parser = argparse.ArgumentParser(description="Purge old search logs in small batches, optionally archiving them first")
+    parser.add_argument("--db", default="logs.db", help="Path to SQLite database or partition directory")
+    parser.add_argument("--older-than", type=int, metavar="DAYS", help="Purge logs dated more than DAYS days ago")
+    parser.add_argument("--before", metavar="YYYY-MM-DD", help="Purge logs dated before this day")
+    parser.add_argument("--archive", metavar="DIR", help="Append purged rows to a gzipped CSV in DIR first")
+    parser.add_argument("--batch-size", type=int, default=PURGE_BATCH, help="Ids per delete transaction")
+    parser.add_argument("--pause-ms", type=int, default=0, help="Sleep between batches to leave room for ingest")
+    parser.add_argument("--no-vacuum", action="store_true", help="Keep freed pages in the file for reuse")
+    parser.add_argument("--enable-incremental-vacuum", action="store_true",
+                        help="Convert an older database to auto_vacuum=INCREMENTAL (runs one full VACUUM) and exit")
+    args = parser.parse_args()
 
-conn.commit()
-conn.close()
-print("logs.db has been cleared.")
+    if args.enable_incremental_vacuum:
+        enable_incremental_vacuum(args.db)
+        print(f"{args.db} now uses incremental vacuum.")
+        return
+
+    try:
+        cutoff = cutoff_for(args.older_than, args.before)
+    except ValueError:
+        print(f"Invalid --before date: {args.before}")
+        return
+
+    start = time.perf_counter()
+    stats = purge(args.db, cutoff, batch=args.batch_size, archive_dir=args.archive,
+                  vacuum=not args.no_vacuum, pause=args.pause_ms / 1000)
+    print_report(stats, cutoff, time.perf_counter() - start, vacuum=not args.no_vacuum)
+    if cutoff is None:
+        print(f"{args.db} has been cleared.")
+
+if __name__ == "__main__":
+    main()
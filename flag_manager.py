@@ -1,8 +1,12 @@
 import argparse
-import sqlite3
-import csv
 import os
+import random
+import time
 from datetime import datetime
+from log_filter import count_logs, export_logs, select_logs
+from utils.columnar import ROW_GROUP_ROWS, columnar_format
+from utils.log_stream import STREAM_BATCH_ROWS, count_rows, limited, matching, write_csv
+from utils.term_matcher import TermMatcher, load_matcher
 
 FLAGGED_FILE = "flagged_terms.txt"
 
@@ -12,62 +16,104 @@ def load_flagged_terms():
     with open(FLAGGED_FILE, "r", encoding="utf-8") as f:
         return [line.strip().lower() for line in f if line.strip()]
 
-def filter_logs(db_path, user=None, query=None, start=None, end=None, flagged=None, only_flagged=False, flagged_list=None):
-    conn = sqlite3.connect(db_path)
-    cursor = conn.cursor()
-
-    sql = "SELECT timestamp, user_id, search_query, response_time FROM search_logs WHERE 1=1"
-    params = []
-
-    if user:
-        sql += " AND user_id = ?"
-        params.append(user)
-    if query:
-        sql += " AND search_query LIKE ?"
-        params.append(f"%{query}%")
-    if start:
-        sql += " AND timestamp >= ?"
-        params.append(start)
-    if end:
-        sql += " AND timestamp <= ?"
-        params.append(end)
-
-    cursor.execute(sql, params)
-    results = cursor.fetchall()
-    conn.close()
-
-    # Combine manual and list-based flagged terms
-    all_flags = set()
+def load_flagged_matcher():
+    """Compiled matcher for FLAGGED_FILE, cached on disk until the file changes."""
+    if not os.path.exists(FLAGGED_FILE):
+        return TermMatcher([])
+    return load_matcher(FLAGGED_FILE, load_flagged_terms)
+
+def build_matcher(flagged=None, flagged_list=None):
+    """Combine the manual --flagged term with the saved list into one matcher."""
+    if isinstance(flagged_list, TermMatcher) and not flagged:
+        return flagged_list
+    all_flags = set(flagged_list or [])
     if flagged:
         all_flags.add(flagged.lower())
-    if flagged_list:
-        all_flags.update(flagged_list)
-
-    if all_flags:
-        if only_flagged:
-            results = [r for r in results if any(term in r[2].lower() for term in all_flags)]
-    return results, all_flags
-
-def print_logs(logs, flagged_terms=None):
+    return TermMatcher(all_flags)
+
+def log_batches(db_path, user=None, query=None, start=None, end=None, matcher=None, only_flagged=False,
+                limit=None, arraysize=STREAM_BATCH_ROWS):
+    """Yield matching (timestamp, user_id, search_query, response_time) rows in lists of up to arraysize."""
+    if not (matcher and only_flagged):
+        return select_logs(db_path, user, query, start, end, limit, arraysize)
+    batches = select_logs(db_path, user, query, start, end, arraysize=arraysize)
+    return limited(matching(batches, lambda row: matcher.matches(row[2])), limit)
+
+def filter_logs(db_path, user=None, query=None, start=None, end=None, flagged=None, only_flagged=False, flagged_list=None,
+                limit=None):
+    # Combine manual and list-based flagged terms
+    all_flags = build_matcher(flagged, flagged_list)
+    batches = log_batches(db_path, user, query, start, end, all_flags, only_flagged, limit)
+    return [row for rows in batches for row in rows], all_flags
+
+def format_log(row, matcher=None):
+    timestamp, user_id, query, resp_time = row
+    hits = matcher.find(query) if matcher else None
+    flag = f" 🚩 ({', '.join(sorted(hits))})" if hits else ""
+    resp = f"{resp_time:.3f}s" if resp_time is not None else "n/a"
+    return f"[{timestamp}] user='{user_id}' query='{query}' time={resp}{flag}"
+
+def echo_logs(batches, flagged_terms=None):
+    """Print each batch of logs, with the flagged terms it hits, and hand it on to the next stage."""
     print("\n📄 Filtered Logs:")
-    if not logs:
+    matcher = flagged_terms if isinstance(flagged_terms, TermMatcher) else TermMatcher(flagged_terms or [])
+    shown = 0
+    for rows in batches:
+        print("\n".join(format_log(row, matcher) for row in rows))
+        shown += len(rows)
+        yield rows
+    if not shown:
         print("No logs match the given criteria.")
-        return
 
-    for timestamp, user_id, query, resp_time in logs:
-        flag = " 🚩" if flagged_terms and any(term in query.lower() for term in flagged_terms) else ""
-        print(f"[{timestamp}] user='{user_id}' query='{query}' time={resp_time:.3f}s{flag}")
+def print_logs(logs, flagged_terms=None):
+    count_rows(echo_logs([logs], flagged_terms))
 
 def export_logs_to_csv(logs, filename):
-    with open(filename, "w", newline="", encoding="utf-8") as f:
-        writer = csv.writer(f)
-        writer.writerow(["timestamp", "user_id", "search_query", "response_time"])
-        writer.writerows(logs)
-    print(f"\n✅ Exported {len(logs)} logs to '{filename}'")
+    count = write_csv([logs], filename)
+    print(f"\n✅ Exported {count} logs to '{filename}'")
+
+def benchmark_matcher(queries, terms, repeat=3):
+    """Time the compiled matcher against the per-term substring scan it replaced."""
+    terms = [t.lower() for t in terms]
+    matcher = TermMatcher(terms)
+
+    def naive():
+        return [r for r in queries if any(term in r.lower() for term in terms)]
+
+    def compiled():
+        return [r for r in queries if matcher.matches(r)]
+
+    print(f"\n⏱ Matching {len(queries)} queries against {len(terms)} flagged terms:")
+    results = {}
+    for label, fn in (("substring scan", naive), ("compiled matcher", compiled)):
+        best = None
+        for _ in range(repeat):
+            start = time.perf_counter()
+            hits = fn()
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+        results[label] = (best, hits)
+        print(f"{label}: {best:.4f}s ({len(hits)} flagged)")
+
+    if results["substring scan"][1] != results["compiled matcher"][1]:
+        print("⚠️ Matchers disagree!")
+    naive_time, compiled_time = results["substring scan"][0], results["compiled matcher"][0]
+    if compiled_time > 0:
+        print(f"Speedup: {naive_time / compiled_time:.1f}x")
+    return results
+
+def synthetic_workload(num_queries=20000, num_terms=2000, seed=0):
+    """Random queries and terms for benchmarking when logs.db is small."""
+    rng = random.Random(seed)
+    alphabet = "abcdefghijklmnopqrstuvwxyz"
+    words = ["".join(rng.choice(alphabet) for _ in range(rng.randint(3, 9))) for _ in range(5000)]
+    queries = [" ".join(rng.choice(words) for _ in range(rng.randint(2, 6))) for _ in range(num_queries)]
+    terms = rng.sample(words, num_terms)
+    return queries, terms
 
 def main():
     parser = argparse.ArgumentParser(description="Filter and view logs from logs.db")
-    parser.add_argument("--db", type=str, default="logs.db", help="Path to SQLite database")
+    parser.add_argument("--db", type=str, default="logs.db", help="Path to SQLite database or partition directory")
     parser.add_argument("--user", help="Filter by user ID")
     parser.add_argument("--query", help="Search by query keyword")
     parser.add_argument("--start", help="Start timestamp (YYYY-MM-DD or full ISO format)")
@@ -75,27 +121,43 @@ def main():
     parser.add_argument("--flagged", help="Flag specific search terms of interest")
     parser.add_argument("--only-flagged", action="store_true", help="Only show logs that include flagged terms")
     parser.add_argument("--use-flagged-list", action="store_true", help="Use saved flagged terms from file")
-    parser.add_argument("--export", type=str, help="Export filtered logs to a CSV file")
+    parser.add_argument("--limit", type=int, help="Stop after this many matching logs")
+    parser.add_argument("--count-only", action="store_true", help="Only print how many logs match")
+    parser.add_argument("--export", type=str,
+                        help="Export filtered logs to .csv or .csv.gz, or to .parquet / .arrow without listing them")
+    parser.add_argument("--row-group-size", type=int, default=ROW_GROUP_ROWS,
+                        help=f"Rows per Parquet row group / Arrow batch (default: {ROW_GROUP_ROWS})")
+    parser.add_argument("--benchmark", action="store_true", help="Benchmark the flagged-term matcher on synthetic data")
 
     args = parser.parse_args()
 
-    flagged_list = load_flagged_terms() if args.use_flagged_list else []
+    if args.benchmark:
+        benchmark_matcher(*synthetic_workload())
+        return
+
+    flagged_list = load_flagged_matcher() if args.use_flagged_list else []
+    matcher = build_matcher(args.flagged, flagged_list)
+    filters = (args.db, args.user, args.query, args.start, args.end)
 
-    logs, all_flags = filter_logs(
-        db_path=args.db,
-        user=args.user,
-        query=args.query,
-        start=args.start,
-        end=args.end,
-        flagged=args.flagged,
-        only_flagged=args.only_flagged,
-        flagged_list=flagged_list
-    )
+    if args.count_only:
+        if matcher and args.only_flagged:
+            count = count_rows(log_batches(*filters, matcher, True, args.limit))
+        else:
+            count = count_logs(*filters, limit=args.limit)
+        print(f"🔢 {count} logs match the given criteria.")
+        return
 
-    print_logs(logs, flagged_terms=all_flags)
+    # Every stage below holds one batch at a time, however many rows match.
+    columnar = bool(args.export and columnar_format(args.export))
+    batches = log_batches(*filters, matcher, args.only_flagged, args.limit,
+                          arraysize=args.row_group_size if columnar else STREAM_BATCH_ROWS)
+    if not columnar:
+        batches = echo_logs(batches, flagged_terms=matcher)
 
     if args.export:
-        export_logs_to_csv(logs, args.export)
+        export_logs(batches, args.export, args.row_group_size)
+    else:
+        count_rows(batches)
 
 if __name__ == "__main__":
     main()
@@ -1,47 +1,280 @@
-import sqlite3
 import csv
 import argparse
+import gzip
+import json
+import math
 import os
+import time
+from optimize_db import INDEXES
+from utils.db_utils import connect, init_schema, is_valid_timestamp
+from utils.partitions import PartitionWriter, is_partitioned
 
-def import_from_csv(csv_file, db_file='logs.db'):
+CHUNK_SIZE = 10000
+
+# Relaxed settings for the duration of a bulk load; the database is only
+# ever left in a committed state, and the checkpoint lets a crashed load
+# pick up where it stopped.
+BULK_LOAD_PRAGMAS = [
+    ("synchronous", "OFF"),
+    ("cache_size", -256000),
+    ("temp_store", "MEMORY"),
+]
+
+# A missing timestamp means "now", as for the column default and /log/bulk.
+INSERT_SQL = """
+    INSERT INTO search_logs (timestamp, user_id, search_query, response_time)
+    VALUES (COALESCE(?, CURRENT_TIMESTAMP), ?, ?, ?)
+"""
+
+NDJSON_SUFFIXES = (".ndjson", ".jsonl")
+
+def is_ndjson(path):
+    """True for newline-delimited JSON exports (.ndjson/.jsonl, optionally gzipped)."""
+    return path.removesuffix(".gz").endswith(NDJSON_SUFFIXES)
+
+def open_source(path):
+    """Open a CSV or NDJSON file for binary reading, transparently handling .gz files."""
+    if path.endswith(".gz"):
+        return gzip.open(path, "rb")
+    return open(path, "rb")
+
+def read_lines(f, position):
+    """Yield decoded lines, keeping position[0] at the byte offset consumed so far."""
+    for line in f:
+        position[0] += len(line)
+        yield line.decode("utf-8")
+
+def parse_response_time(value):
+    """float(value), or None when empty; inf and nan would poison AVG, the rollups and the sketches."""
+    if value is None or value == "":
+        return None
+    response_time = float(value)
+    if not math.isfinite(response_time):
+        raise ValueError("response_time must be a finite number")
+    return response_time
+
+def parse_row(row, columns):
+    timestamp = row[columns["timestamp"]] or None
+    user_id = row[columns["user_id"]]
+    search_query = row[columns["search_query"]]
+    response_time = row[columns["response_time"]]
+    if not user_id or not search_query:
+        raise ValueError("missing user_id or search_query")
+    return (timestamp, user_id, search_query, parse_response_time(response_time))
+
+def parse_json_row(line):
+    record = json.loads(line)
+    if not isinstance(record, dict):
+        raise ValueError("expected a JSON object")
+    timestamp = record.get("timestamp")
+    user_id = record.get("user_id")
+    search_query = record.get("search_query")
+    response_time = record.get("response_time")
+    if not user_id or not search_query:
+        raise ValueError("missing user_id or search_query")
+    # Same rule as /log/bulk: a timestamp is either absent or in the stored format.
+    if timestamp not in (None, "") and not is_valid_timestamp(timestamp):
+        raise ValueError("timestamp must be formatted as YYYY-MM-DD HH:MM:SS or YYYY-MM-DD")
+    return (timestamp or None, str(user_id), str(search_query), parse_response_time(response_time))
+
+def read_json_lines(f, position):
+    """Like read_lines, skipping blank lines."""
+    for line in read_lines(f, position):
+        if line.strip():
+            yield line
+
+def record_reader(f, path):
+    """(header_end, parse, records) for a CSV or NDJSON source, or None if a CSV lacks required columns."""
+    if is_ndjson(path):
+        return 0, parse_json_row, read_json_lines
+    header_pos = [0]
+    header = next(csv.reader(read_lines(f, header_pos)))
+    columns = {name: i for i, name in enumerate(header)}
+    missing = {"timestamp", "user_id", "search_query", "response_time"} - columns.keys()
+    if missing:
+        print(f"CSV is missing columns: {', '.join(sorted(missing))}")
+        return None
+    parse = lambda row: parse_row(row, columns)
+    records = lambda f, position: csv.reader(read_lines(f, position))
+    return header_pos[0], parse, records
+
+def ensure_checkpoint_table(conn):
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS import_checkpoints (
+            source TEXT PRIMARY KEY,
+            byte_offset INTEGER NOT NULL,
+            rows INTEGER NOT NULL,
+            dropped_indexes TEXT
+        )
+    """)
+    # Checkpoint tables from before dropped_indexes was recorded.
+    columns = {row[1] for row in conn.execute("PRAGMA table_info(import_checkpoints)")}
+    if "dropped_indexes" not in columns:
+        conn.execute("ALTER TABLE import_checkpoints ADD COLUMN dropped_indexes TEXT")
+    conn.commit()
+
+def save_checkpoint(conn, source, offset, rows, dropped):
+    conn.execute("INSERT OR REPLACE INTO import_checkpoints (source, byte_offset, rows, dropped_indexes) VALUES (?, ?, ?, ?)",
+                 (source, offset, rows, json.dumps(dropped)))
+
+def drop_indexes(conn):
+    """Drop whichever optimize_db.INDEXES exist and return their CREATE INDEX statements."""
+    existing = dict(conn.execute("SELECT name, sql FROM sqlite_master WHERE type = 'index' AND sql IS NOT NULL"))
+    dropped = [existing[idx_name] for idx_name, _ in INDEXES if idx_name in existing]
+    for idx_name, _ in INDEXES:
+        if idx_name in existing:
+            conn.execute(f"DROP INDEX {idx_name}")
+    return dropped
+
+def rebuild_indexes(conn, statements):
+    for sql in statements:
+        print(f"Rebuilding index: {sql}")
+        # sqlite_master keeps the DDL without IF NOT EXISTS.
+        conn.execute(sql.replace("CREATE INDEX ", "CREATE INDEX IF NOT EXISTS ", 1))
+    conn.commit()
+
+def import_from_csv(csv_file, db_file='logs.db', chunk_size=CHUNK_SIZE, drop_and_rebuild_indexes=False, restart=False):
+    """Stream a (optionally gzipped) CSV or NDJSON export into search_logs in chunked transactions.
+
+    Progress is checkpointed in the target database in the same transaction
+    as each chunk, so re-running after a crash resumes from the last committed
+    byte offset unless ``restart`` is set.
+    """
     if not os.path.exists(csv_file):
         print(f"File not found: {csv_file}")
         return
 
-    conn = sqlite3.connect(db_file)
-    cursor = conn.cursor()
+    if is_partitioned(db_file):
+        return import_into_partitions(csv_file, db_file, chunk_size)
 
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS search_logs (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            timestamp TEXT,
-            user_id TEXT,
-            search_query TEXT,
-            response_time REAL
-        )
-    """)
+    source = os.path.abspath(csv_file)
+    conn = connect(db_file)
+    for name, value in BULK_LOAD_PRAGMAS:
+        conn.execute(f"PRAGMA {name} = {value}")
+    init_schema(conn)
+    ensure_checkpoint_table(conn)
+
+    offset, count, dropped = 0, 0, []
+    checkpoint = conn.execute("SELECT byte_offset, rows, dropped_indexes FROM import_checkpoints WHERE source = ?",
+                              (source,)).fetchone()
+    if checkpoint:
+        # Indexes an interrupted --rebuild-indexes run dropped are restored
+        # at the end, with or without the flag this time.
+        dropped = json.loads(checkpoint[2] or "[]")
+        if not restart:
+            offset, count = checkpoint[:2]
+            print(f"Resuming {csv_file} at byte {offset} ({count} rows already imported)")
+
+    if drop_and_rebuild_indexes:
+        # The dropped DDL is checkpointed in the same transaction as the drop.
+        with conn:
+            conn.execute("BEGIN")
+            dropped += drop_indexes(conn)
+            save_checkpoint(conn, source, offset, count, dropped)
+
+    start = time.perf_counter()
+    imported = 0
+    skipped = 0
+    with open_source(csv_file) as f:
+        reader_parts = record_reader(f, csv_file)
+        if reader_parts is None:
+            conn.close()
+            return
+        header_end, parse, records = reader_parts
 
-    with open(csv_file, 'r', newline='', encoding='utf-8') as f:
-        reader = csv.DictReader(f)
-        count = 0
+        if offset > header_end:
+            f.seek(offset)
+        else:
+            offset = header_end
+
+        position = [offset]
+        reader = records(f, position)
+        chunk = []
         for row in reader:
-            cursor.execute("""
-                INSERT INTO search_logs (timestamp, user_id, search_query, response_time)
-                VALUES (?, ?, ?, ?)
-            """, (row['timestamp'], row['user_id'], row['search_query'], float(row['response_time'])))
-            count += 1
+            try:
+                chunk.append(parse(row))
+            except (ValueError, IndexError, TypeError):
+                skipped += 1
+                continue
+
+            if len(chunk) >= chunk_size:
+                imported += len(chunk)
+                with conn:
+                    conn.executemany(INSERT_SQL, chunk)
+                    save_checkpoint(conn, source, position[0], count + imported, dropped)
+                chunk = []
+
+        with conn:
+            if chunk:
+                imported += len(chunk)
+                conn.executemany(INSERT_SQL, chunk)
+            if dropped:
+                # Keep the checkpoint until the indexes are back.
+                save_checkpoint(conn, source, position[0], count + imported, dropped)
+            else:
+                conn.execute("DELETE FROM import_checkpoints WHERE source = ?", (source,))
+
+    if dropped:
+        rebuild_indexes(conn, dropped)
+        with conn:
+            conn.execute("DELETE FROM import_checkpoints WHERE source = ?", (source,))
 
-    conn.commit()
     conn.close()
-    print(f"Imported {count} log entries into {db_file}")
+    elapsed = time.perf_counter() - start
+    rate = imported / elapsed if elapsed > 0 else 0
+    print(f"Imported {count + imported} log entries into {db_file} ({rate:,.0f} rows/s)")
+    if skipped:
+        print(f"Skipped {skipped} malformed rows")
+    return count + imported
+
+def import_into_partitions(csv_file, directory, chunk_size=CHUNK_SIZE):
+    """Stream a CSV or NDJSON export into a month-partitioned directory (utils/partitions.py).
+
+    Each chunk is committed one partition at a time, so there is no single
+    transaction to checkpoint in: an interrupted import into partitions
+    cannot be resumed and should be re-run into a clean directory.
+    """
+    writer = PartitionWriter(directory)
+    start = time.perf_counter()
+    imported = 0
+    skipped = 0
+    with open_source(csv_file) as f:
+        reader_parts = record_reader(f, csv_file)
+        if reader_parts is None:
+            return
+        header_end, parse, records = reader_parts
+        chunk = []
+        for row in records(f, [header_end]):
+            try:
+                chunk.append(parse(row))
+            except (ValueError, IndexError, TypeError):
+                skipped += 1
+                continue
+            if len(chunk) >= chunk_size:
+                imported += writer.insert(chunk)
+                chunk = []
+        if chunk:
+            imported += writer.insert(chunk)
+    writer.close()
+
+    elapsed = time.perf_counter() - start
+    rate = imported / elapsed if elapsed > 0 else 0
+    print(f"Imported {imported} log entries into partitions under {directory} ({rate:,.0f} rows/s)")
+    if skipped:
+        print(f"Skipped {skipped} malformed rows")
+    return imported
 
 def main():
-    parser = argparse.ArgumentParser(description="Import search logs from a CSV file into logs.db")
-    parser.add_argument("csv_file", help="Path to the CSV file to import")
-    parser.add_argument("--db", default="logs.db", help="Target SQLite database file")
+    parser = argparse.ArgumentParser(description="Import search logs from a CSV or NDJSON file into logs.db")
+    parser.add_argument("csv_file", help="Path to the file to import (.csv, .ndjson or .jsonl, optionally .gz)")
+    parser.add_argument("--db", default="logs.db", help="Target SQLite database file, or an existing partition directory")
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE, help="Rows per transaction")
+    parser.add_argument("--rebuild-indexes", action="store_true", help="Drop indexes during the load and rebuild them afterwards")
+    parser.add_argument("--restart", action="store_true", help="Ignore any checkpoint left by an interrupted import")
     args = parser.parse_args()
 
-    import_from_csv(args.csv_file, db_file=args.db)
+    import_from_csv(args.csv_file, db_file=args.db, chunk_size=args.chunk_size,
+                    drop_and_rebuild_indexes=args.rebuild_indexes, restart=args.restart)
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,338 @@
+import argparse
+import http.client
+import json
+import os
+import queue
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from urllib.parse import urlencode, urlsplit
+from populate_fake_logs import generate_logs, insert_logs, query_text, user_name
+from utils.quantiles import ResponseTimeSketch
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+# Default request mix: mostly ingest, some paged reads.
+DEFAULT_MIX = "post=9,get=1"
+GET_PAGE_SIZE = 100
+NUM_USERS = 1000
+NUM_QUERIES = 10000
+REQUEST_TIMEOUT = 30
+SERVER_START_TIMEOUT = 30
+# Open loop: how long queued requests may still be sent after the last arrival.
+DRAIN_SECONDS = 2
+
+def parse_mix(text):
+    """"post=9,get=1" -> [("post", 9.0), ("get", 1.0)]."""
+    mix = []
+    for part in text.split(","):
+        name, _, weight = part.partition("=")
+        if name not in ("post", "get"):
+            raise ValueError(f"unknown request type {name!r}; expected post or get")
+        mix.append((name, float(weight or 1)))
+    return mix
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def start_server(workdir, port, threads=4, buffered=False, seed_rows=0):
+    """Run log_service under waitress in workdir (its logs.db lives there); returns the process."""
+    db_path = os.path.join(workdir, "logs.db")
+    insert_logs(db_path, generate_logs(seed_rows, seed=0, num_users=NUM_USERS, num_queries=NUM_QUERIES))
+
+    env = dict(os.environ, PYTHONPATH=HERE + os.pathsep + os.environ.get("PYTHONPATH", ""))
+    if buffered:
+        env["LOG_BUFFERED"] = "1"
+    cmd = [sys.executable, "-m", "waitress", f"--listen=127.0.0.1:{port}", f"--threads={threads}", "log_service:app"]
+    # stderr goes to a file: an unread pipe fills up under saturation
+    # (waitress queue warnings, tracebacks) and would stall the server.
+    log_path = os.path.join(workdir, "server.log")
+    with open(log_path, "wb") as log:
+        proc = subprocess.Popen(cmd, cwd=workdir, env=env, stdout=subprocess.DEVNULL, stderr=log)
+    deadline = time.monotonic() + SERVER_START_TIMEOUT
+    while time.monotonic() < deadline:
+        if proc.poll() is not None:
+            with open(log_path, "rb") as log:
+                raise RuntimeError(f"log_service exited: {log.read().decode(errors='replace')}")
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=0.5).close()
+            return proc
+        except OSError:
+            time.sleep(0.1)
+    proc.terminate()
+    raise RuntimeError("log_service did not start listening in time")
+
+def stop_server(proc):
+    proc.terminate()
+    try:
+        proc.wait(timeout=10)
+    except subprocess.TimeoutExpired:
+        proc.kill()
+        proc.wait()
+
+class Client:
+    """One keep-alive HTTP connection, reopened after any failure."""
+
+    def __init__(self, host, port):
+        self.host = host
+        self.port = port
+        self.conn = None
+
+    def request(self, method, path, body=None):
+        """Send one request and read the whole response; returns the status code."""
+        if self.conn is None:
+            self.conn = http.client.HTTPConnection(self.host, self.port, timeout=REQUEST_TIMEOUT)
+        headers = {"Content-Type": "application/json"} if body is not None else {}
+        try:
+            self.conn.request(method, path, body=body, headers=headers)
+            response = self.conn.getresponse()
+            response.read()
+            return response.status
+        except (OSError, http.client.HTTPException):
+            self.close()
+            raise
+
+    def close(self):
+        if self.conn is not None:
+            self.conn.close()
+            self.conn = None
+
+class Recorder:
+    """Latency sketches, request and error counts per reporting interval and overall."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.started = time.perf_counter()
+        self.interval = self._new()
+        self.total = self._new()
+        self.endpoints = {}
+
+    @staticmethod
+    def _new():
+        return {"requests": 0, "errors": 0, "latency": ResponseTimeSketch()}
+
+    def record(self, endpoint, latency, ok):
+        with self._lock:
+            for stats in (self.interval, self.total, self.endpoints.setdefault(endpoint, self._new())):
+                stats["requests"] += 1
+                stats["errors"] += 0 if ok else 1
+                stats["latency"].add(latency)
+
+    def rotate(self):
+        """Return the current interval's stats and start a new one."""
+        with self._lock:
+            stats, self.interval = self.interval, self._new()
+        return stats
+
+def summarize(stats, seconds):
+    latency = stats["latency"]
+    quantiles = latency.quantiles()
+    return {
+        "requests": stats["requests"],
+        "throughput": stats["requests"] / seconds if seconds > 0 else 0.0,
+        "error_rate": stats["errors"] / stats["requests"] if stats["requests"] else 0.0,
+        "mean_ms": latency.mean * 1000 if latency.count else None,
+        **{f"{label}_ms": value * 1000 if value is not None else None for label, value in quantiles.items()},
+        "max_ms": latency.max * 1000 if latency.max is not None else None,
+    }
+
+def format_summary(summary):
+    def ms(value):
+        return f"{value:.1f}ms" if value is not None else "-"
+    return (f"{summary['throughput']:8.1f} req/s  err={summary['error_rate']:6.2%}  "
+            f"p50={ms(summary['p50_ms'])} p95={ms(summary['p95_ms'])} "
+            f"p99={ms(summary['p99_ms'])} max={ms(summary['max_ms'])}")
+
+class Workload:
+    """Picks the next request from the mix: POST /log with a synthetic log, or a GET /logs page."""
+
+    def __init__(self, mix, seed=None):
+        self.names = [name for name, _ in mix]
+        self.weights = [weight for _, weight in mix]
+        self.seed = seed
+
+    def generator(self, worker):
+        rng = random.Random(None if self.seed is None else f"{self.seed}-{worker}")
+        while True:
+            name = rng.choices(self.names, weights=self.weights)[0]
+            user = user_name(int(rng.paretovariate(1.1)) % NUM_USERS)
+            if name == "post":
+                body = json.dumps({"user_id": user, "search_query": query_text(rng.randrange(NUM_QUERIES)),
+                                   "response_time": round(rng.lognormvariate(-1.4, 0.5), 3)})
+                yield "POST /log", "POST", "/log", body
+            else:
+                yield "GET /logs", "GET", "/logs?" + urlencode({"user_id": user, "limit": GET_PAGE_SIZE}), None
+
+def issue(client, recorder, request, scheduled=None):
+    """Send one request and record its latency, measured from `scheduled` if given."""
+    endpoint, method, path, body = request
+    start = time.perf_counter() if scheduled is None else scheduled
+    try:
+        ok = client.request(method, path, body) < 400
+    except (OSError, http.client.HTTPException):
+        ok = False
+    recorder.record(endpoint, time.perf_counter() - start, ok)
+
+def run_closed_loop(host, port, workload, recorder, concurrency, duration):
+    """Each of `concurrency` clients sends its next request as soon as the last one completes."""
+    deadline = time.perf_counter() + duration
+
+    def worker(i):
+        client = Client(host, port)
+        requests = workload.generator(i)
+        while time.perf_counter() < deadline:
+            issue(client, recorder, next(requests))
+        client.close()
+
+    threads = [threading.Thread(target=worker, args=(i,), daemon=True) for i in range(concurrency)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+def run_open_loop(host, port, workload, recorder, concurrency, duration, rate, poisson=False):
+    """Issue requests at a fixed arrival rate, whether or not earlier ones have completed.
+
+    Latency is measured from each request's scheduled start, so queueing
+    behind a saturated server shows up in the percentiles instead of
+    silently lowering the offered load. Returns the number of requests that
+    were never sent because every client stayed busy past the drain period.
+    """
+    pending = queue.Queue()
+    done = threading.Event()
+
+    def worker(i):
+        client = Client(host, port)
+        requests = workload.generator(i)
+        while True:
+            scheduled = pending.get()
+            if scheduled is None:
+                break
+            if not done.is_set():
+                issue(client, recorder, next(requests), scheduled)
+        client.close()
+
+    threads = [threading.Thread(target=worker, args=(i,), daemon=True) for i in range(concurrency)]
+    for t in threads:
+        t.start()
+
+    rng = random.Random(workload.seed)
+    start = time.perf_counter()
+    sent, offset = 0, 0.0
+    while offset < duration:
+        delay = start + offset - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+        pending.put(start + offset)
+        sent += 1
+        offset = offset + rng.expovariate(rate) if poisson else sent / rate
+
+    # Give the clients a grace period to catch up; whatever is still queued
+    # after that was never going to be served and is dropped, not sent late.
+    grace_until = time.perf_counter() + DRAIN_SECONDS
+    while not pending.empty() and time.perf_counter() < grace_until:
+        time.sleep(0.01)
+    done.set()
+    unsent = pending.qsize()
+    for _ in threads:
+        pending.put(None)
+    for t in threads:
+        t.join()
+    return unsent
+
+def run_step(host, port, workload, mode, concurrency, duration, rate=None, interval=1.0, poisson=False):
+    """Drive one load level, printing a line per interval; returns its summary."""
+    recorder = Recorder()
+    stop = threading.Event()
+
+    def reporter():
+        last = time.perf_counter()
+        while not stop.wait(interval):
+            now = time.perf_counter()
+            print(f"  t={now - recorder.started:6.1f}s {format_summary(summarize(recorder.rotate(), now - last))}")
+            last = now
+
+    thread = threading.Thread(target=reporter, daemon=True)
+    thread.start()
+    unsent = 0
+    if mode == "open":
+        unsent = run_open_loop(host, port, workload, recorder, concurrency, duration, rate, poisson)
+    else:
+        run_closed_loop(host, port, workload, recorder, concurrency, duration)
+    elapsed = time.perf_counter() - recorder.started
+    stop.set()
+    thread.join()
+
+    summary = summarize(recorder.total, elapsed)
+    summary.update(mode=mode, concurrency=concurrency, offered_rate=rate, unsent=unsent, seconds=elapsed,
+                   endpoints={name: summarize(stats, elapsed) for name, stats in recorder.endpoints.items()})
+    return summary
+
+def main():
+    parser = argparse.ArgumentParser(description="Load-test the log service's POST /log and GET /logs endpoints")
+    parser.add_argument("--url", help="Target a running service (default: start log_service under waitress)")
+    parser.add_argument("--mode", choices=["closed", "open"], default="closed",
+                        help="closed: clients wait for each response; open: fixed arrival rate")
+    parser.add_argument("--concurrency", type=int, default=16, help="Number of client connections")
+    parser.add_argument("--rate", default="100",
+                        help="Open-loop arrival rate(s) in req/s; a comma-separated list runs one step per rate")
+    parser.add_argument("--poisson", action="store_true", help="Open loop: Poisson arrivals instead of evenly spaced")
+    parser.add_argument("--duration", type=float, default=10, help="Seconds per step")
+    parser.add_argument("--interval", type=float, default=1, help="Seconds between progress lines")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help="Request mix, e.g. post=9,get=1")
+    parser.add_argument("--seed", type=int, help="Seed for the request stream")
+    parser.add_argument("--threads", type=int, default=4, help="waitress worker threads (local server only)")
+    parser.add_argument("--buffered", action="store_true", help="Start the local server with LOG_BUFFERED=1")
+    parser.add_argument("--seed-rows", type=int, default=10000, help="Rows preloaded into the local server's database")
+    parser.add_argument("--json", help="Write the step summaries to this file")
+    args = parser.parse_args()
+
+    workload = Workload(parse_mix(args.mix), args.seed)
+    rates = [float(r) for r in args.rate.split(",")] if args.mode == "open" else [None]
+
+    proc = None
+    scratch = None
+    if args.url:
+        target = urlsplit(args.url)
+        host, port = target.hostname, target.port or 80
+    else:
+        scratch = tempfile.TemporaryDirectory()
+        host, port = "127.0.0.1", free_port()
+        print(f"🚀 Starting log_service on {host}:{port} (threads={args.threads}, buffered={args.buffered})")
+        proc = start_server(scratch.name, port, args.threads, args.buffered, args.seed_rows)
+
+    results = []
+    try:
+        for rate in rates:
+            label = f"{rate:g} req/s offered" if rate else f"{args.concurrency} clients"
+            print(f"\n⏱ {args.mode}-loop, {label}, {args.duration:g}s:")
+            summary = run_step(host, port, workload, args.mode, args.concurrency, args.duration,
+                               rate, args.interval, args.poisson)
+            results.append(summary)
+            print(f"  total     {format_summary(summary)}")
+            if summary["unsent"]:
+                print(f"  ⚠️ {summary['unsent']} requests never sent: all clients were busy (saturated)")
+    finally:
+        if proc:
+            stop_server(proc)
+            scratch.cleanup()
+
+    if len(results) > 1:
+        print("\nStep summary:")
+        for summary in results:
+            print(f"  {summary['offered_rate']:>8g} offered -> {format_summary(summary)}")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"url": args.url, "mix": args.mix, "threads": args.threads,
+                       "buffered": args.buffered, "steps": results}, f, indent=2)
+        print(f"📁 Saved results to {args.json}")
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,7 @@
 import os
-from log_visualizer import fetch_data, export_to_csv, print_summary_report
+from utils.db_utils import fetch_data
+from utils.export_utils import export_to_csv
+from utils.stats_utils import compute_summary_stats, print_summary_report
 
 MENU = """
 SearchRPI Log CLI
@@ -16,18 +18,7 @@ def cli_loop():
 
         if choice == "1":
             user_data, query_data, time_data, avg_data, hour_data, response_times = fetch_data()
-            print_summary_report({
-                "total_logs": sum([count for _, count in time_data]),
-                "total_users": len(user_data),
-                "total_queries": len(query_data),
-                "active_days": len(time_data),
-                "peak_hour": max(hour_data, key=lambda x: x[1])[0] if hour_data else None,
-                "most_active_user": max(user_data, key=lambda x: x[1])[0] if user_data else None,
-                "top_query": max(query_data, key=lambda x: x[1])[0] if query_data else None,
-                "fastest_response": min(response_times) if response_times else None,
-                "slowest_response": max(response_times) if response_times else None,
-                "mean_response": sum(response_times) / len(response_times) if response_times else None
-            })
+            print_summary_report(compute_summary_stats(user_data, query_data, time_data, hour_data, response_times))
 
         elif choice == "2":
             filename = input("Enter CSV filename: ").strip()
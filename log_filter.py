@@ -1,83 +1,163 @@
 import argparse
 import sqlite3
-import csv
+import os
 from datetime import datetime
+from utils.columnar import ROW_GROUP_ROWS, columnar_format, write_columnar
+from utils.db_utils import query_filter
+from utils.log_stream import STREAM_BATCH_ROWS, count_rows, cursor_batches, limited, matching, write_csv
+from utils.partitions import is_partitioned, select_partitions
 
-def filter_logs(db_path, user=None, query=None, start=None, end=None, flagged=None, only_flagged=False):
-    conn = sqlite3.connect(db_path)
-    cursor = conn.cursor()
+COLUMNS = "timestamp, user_id, search_query, response_time"
 
-    sql = "SELECT timestamp, user_id, search_query, response_time FROM search_logs WHERE 1=1"
+def log_filters(conn, user=None, query=None, start=None, end=None):
+    """The " AND ..." clauses and params for the user/query/time filters; conn is None for partitions."""
+    where = ""
     params = []
 
     if user:
-        sql += " AND user_id = ?"
+        where += " AND user_id = ?"
         params.append(user)
     if query:
-        sql += " AND search_query LIKE ?"
-        params.append(f"%{query}%")
+        # Partitions are attached to a scratch connection, so they use the plain LIKE filter.
+        clause, param = (" AND search_query LIKE ?", f"%{query}%") if conn is None else query_filter(conn, query)
+        where += clause
+        params.append(param)
     if start:
-        sql += " AND timestamp >= ?"
+        where += " AND timestamp >= ?"
         params.append(start)
     if end:
-        sql += " AND timestamp <= ?"
+        where += " AND timestamp <= ?"
         params.append(end)
+    return where, params
 
-    cursor.execute(sql, params)
-    results = cursor.fetchall()
-    conn.close()
+def select_logs(db_path, user=None, query=None, start=None, end=None, limit=None, arraysize=STREAM_BATCH_ROWS):
+    """Yield the SQL-filtered (timestamp, user_id, search_query, response_time) rows in lists of up to arraysize."""
+    if is_partitioned(db_path):
+        where, params = log_filters(None, user, query, start, end)
+        # Only the months overlapping start..end are attached.
+        yield from limited(select_partitions(db_path, COLUMNS, where, params, start, end, arraysize=arraysize), limit)
+        return
 
-    if flagged:
-        results = [r for r in results if flagged.lower() in r[2].lower() or not only_flagged]
-        if only_flagged:
-            results = [r for r in results if flagged.lower() in r[2].lower()]
+    conn = sqlite3.connect(db_path)
+    try:
+        where, params = log_filters(conn, user, query, start, end)
+        sql = f"SELECT {COLUMNS} FROM search_logs WHERE 1=1{where}"
+        if limit is not None:
+            sql += " LIMIT ?"
+            params.append(limit)
+        yield from cursor_batches(conn.execute(sql, params), arraysize)
+    finally:
+        conn.close()
 
-    return results
+def count_logs(db_path, user=None, query=None, start=None, end=None, limit=None):
+    """How many rows select_logs would return, counted by SQLite without fetching them."""
+    if is_partitioned(db_path):
+        where, params = log_filters(None, user, query, start, end)
+        counts = select_partitions(db_path, "COUNT(*)", where, params, start, end)
+        total = sum(count for rows in counts for (count,) in rows)
+        return total if limit is None else min(total, limit)
 
-def print_logs(logs, flagged=None):
+    conn = sqlite3.connect(db_path)
+    try:
+        where, params = log_filters(conn, user, query, start, end)
+        sql = f"SELECT 1 FROM search_logs WHERE 1=1{where}"
+        if limit is not None:
+            sql += " LIMIT ?"
+            params.append(limit)
+        return conn.execute(f"SELECT COUNT(*) FROM ({sql})", params).fetchone()[0]
+    finally:
+        conn.close()
+
+def is_flagged(flagged):
+    term = flagged.lower()
+    return lambda row: term in row[2].lower()
+
+def log_batches(db_path, user=None, query=None, start=None, end=None, flagged=None, only_flagged=False,
+                limit=None, arraysize=STREAM_BATCH_ROWS):
+    """Yield the matching rows in lists of up to arraysize: SQL filters, then the flag filter, then the limit."""
+    if not (flagged and only_flagged):
+        return select_logs(db_path, user, query, start, end, limit, arraysize)
+    batches = select_logs(db_path, user, query, start, end, arraysize=arraysize)
+    return limited(matching(batches, is_flagged(flagged)), limit)
+
+def filter_logs(db_path, user=None, query=None, start=None, end=None, flagged=None, only_flagged=False, limit=None):
+    batches = log_batches(db_path, user, query, start, end, flagged, only_flagged, limit)
+    return [row for rows in batches for row in rows]
+
+def format_log(row, flagged=None):
+    timestamp, user_id, query, resp_time = row
+    flag = " 🚩" if flagged and flagged.lower() in query.lower() else ""
+    resp = f"{resp_time:.3f}s" if resp_time is not None else "n/a"
+    return f"[{timestamp}] user='{user_id}' query='{query}' time={resp}{flag}"
+
+def echo_logs(batches, flagged=None):
+    """Print each batch of logs as it streams past and hand it on to the next stage."""
     print("\n📄 Filtered Logs:")
-    if not logs:
+    shown = 0
+    for rows in batches:
+        print("\n".join(format_log(row, flagged) for row in rows))
+        shown += len(rows)
+        yield rows
+    if not shown:
         print("No logs match the given criteria.")
-        return
 
-    for timestamp, user_id, query, resp_time in logs:
-        flag = " 🚩" if flagged and flagged.lower() in query.lower() else ""
-        print(f"[{timestamp}] user='{user_id}' query='{query}' time={resp_time:.3f}s{flag}")
+def print_logs(logs, flagged=None):
+    count_rows(echo_logs([logs], flagged))
 
 def export_logs_to_csv(logs, filename):
-    with open(filename, "w", newline="", encoding="utf-8") as f:
-        writer = csv.writer(f)
-        writer.writerow(["timestamp", "user_id", "search_query", "response_time"])
-        writer.writerows(logs)
-    print(f"\n✅ Exported {len(logs)} logs to '{filename}'")
+    count = write_csv([logs], filename)
+    print(f"\n✅ Exported {count} logs to '{filename}'")
+
+def export_format(filename):
+    return columnar_format(filename) or ("csv.gz" if filename.endswith(".gz") else "csv")
+
+def export_logs(batches, filename, chunk_size=ROW_GROUP_ROWS):
+    """Stream row batches into CSV, gzip-CSV (.gz), Parquet or Arrow IPC, chosen by the file suffix."""
+    if columnar_format(filename):
+        count = write_columnar(batches, filename, chunk_size=chunk_size)
+    else:
+        count = write_csv(batches, filename)
+    size_kb = os.path.getsize(filename) / 1024
+    print(f"\n✅ Exported {count} logs to '{filename}' ({export_format(filename)}, {size_kb:.1f} KB)")
 
 def main():
     parser = argparse.ArgumentParser(description="Filter and view logs from logs.db")
-    parser.add_argument("--db", type=str, default="logs.db", help="Path to SQLite database")
+    parser.add_argument("--db", type=str, default="logs.db", help="Path to SQLite database or partition directory")
     parser.add_argument("--user", help="Filter by user ID")
     parser.add_argument("--query", help="Search by query keyword")
     parser.add_argument("--start", help="Start timestamp (YYYY-MM-DD or full ISO format)")
     parser.add_argument("--end", help="End timestamp (YYYY-MM-DD or full ISO format)")
     parser.add_argument("--flagged", help="Flag specific search terms of interest")
     parser.add_argument("--only-flagged", action="store_true", help="Only show logs that include flagged terms")
-    parser.add_argument("--export", type=str, help="Export filtered logs to a CSV file")
+    parser.add_argument("--limit", type=int, help="Stop after this many matching logs")
+    parser.add_argument("--count-only", action="store_true", help="Only print how many logs match")
+    parser.add_argument("--export", type=str,
+                        help="Export filtered logs to .csv or .csv.gz, or to .parquet / .arrow without listing them")
+    parser.add_argument("--row-group-size", type=int, default=ROW_GROUP_ROWS,
+                        help=f"Rows per Parquet row group / Arrow batch (default: {ROW_GROUP_ROWS})")
 
     args = parser.parse_args()
+    filters = (args.db, args.user, args.query, args.start, args.end)
 
-    logs = filter_logs(
-        db_path=args.db,
-        user=args.user,
-        query=args.query,
-        start=args.start,
-        end=args.end,
-        flagged=args.flagged,
-        only_flagged=args.only_flagged
-    )
+    if args.count_only:
+        if args.flagged and args.only_flagged:
+            count = count_rows(log_batches(*filters, args.flagged, True, args.limit))
+        else:
+            count = count_logs(*filters, limit=args.limit)
+        print(f"🔢 {count} logs match the given criteria.")
+        return
 
-    print_logs(logs, flagged=args.flagged)
+    # Every stage below holds one batch at a time, however many rows match.
+    columnar = bool(args.export and columnar_format(args.export))
+    batches = log_batches(*filters, args.flagged, args.only_flagged, args.limit,
+                          arraysize=args.row_group_size if columnar else STREAM_BATCH_ROWS)
+    if not columnar:
+        batches = echo_logs(batches, flagged=args.flagged)
 
     if args.export:
-        export_logs_to_csv(logs, args.export)
+        export_logs(batches, args.export, args.row_group_size)
+    else:
+        count_rows(batches)
 
 if __name__ == "__main__":
     main()
@@ -1,47 +1,297 @@
 import sqlite3
+import argparse
+import math
 from datetime import datetime
+from functools import partial
+from utils.compact import base_table, next_id_chunk
+from utils.multi_db import expand_paths, map_databases
 
-def generate_report(db_path='logs.db'):
-    conn = sqlite3.connect(db_path)
-    cursor = conn.cursor()
+# Rows folded into the persisted report state per transaction.
+REPORT_CHUNK = 100000
 
-    print("\nLog System Summary Report")
-    print("-------------------------")
+STATE_SQL = [
+    """CREATE TABLE IF NOT EXISTS report_state (
+        name TEXT PRIMARY KEY,
+        last_id INTEGER NOT NULL DEFAULT 0,
+        stale INTEGER NOT NULL DEFAULT 0,
+        total_logs INTEGER NOT NULL DEFAULT 0,
+        rt_count INTEGER NOT NULL DEFAULT 0,
+        rt_sum REAL NOT NULL DEFAULT 0,
+        rt_min REAL,
+        rt_max REAL,
+        ts_min TEXT,
+        ts_max TEXT
+    )""",
+    "CREATE TABLE IF NOT EXISTS report_user_counts (user_id TEXT PRIMARY KEY, searches INTEGER NOT NULL) WITHOUT ROWID",
+    "CREATE TABLE IF NOT EXISTS report_query_counts (search_query TEXT PRIMARY KEY, searches INTEGER NOT NULL) WITHOUT ROWID",
+    "CREATE INDEX IF NOT EXISTS idx_report_user_searches ON report_user_counts(searches DESC, user_id)",
+    "CREATE INDEX IF NOT EXISTS idx_report_query_searches ON report_query_counts(searches DESC, search_query)",
+    "INSERT OR IGNORE INTO report_state (name) VALUES ('search_logs')",
+]
+
+def ensure_report_state(conn):
+    for sql in STATE_SQL:
+        conn.execute(sql)
+    # New rows are found by id; deleting or editing rows that were already
+    # counted marks the state stale so the next run rebuilds it.
+    table = base_table(conn)
+    for event in ("DELETE", "UPDATE"):
+        conn.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS report_stale_{event.lower()} AFTER {event} ON {table}
+            WHEN old.id <= (SELECT last_id FROM report_state WHERE name = 'search_logs')
+            BEGIN
+                UPDATE report_state SET stale = 1 WHERE name = 'search_logs' AND stale = 0;
+            END
+        """)
+    conn.commit()
+
+def reset_report_state(conn):
+    with conn:
+        conn.execute("DELETE FROM report_user_counts")
+        conn.execute("DELETE FROM report_query_counts")
+        conn.execute("DELETE FROM report_state")
+        conn.execute("INSERT INTO report_state (name) VALUES ('search_logs')")
+
+def _keep(current, new, pick):
+    if current is None:
+        return new
+    if new is None:
+        return current
+    return pick(current, new)
+
+def _fold(conn, low, high):
+    """Fold search_logs rows with low < id <= high into the report state."""
+    count, rt_count, rt_sum, rt_min, rt_max, ts_min, ts_max = conn.execute("""
+        SELECT COUNT(*), COUNT(response_time), TOTAL(response_time), MIN(response_time), MAX(response_time),
+               MIN(timestamp), MAX(timestamp)
+        FROM search_logs WHERE id > ? AND id <= ?
+    """, (low, high)).fetchone()
+
+    state = conn.execute("SELECT rt_min, rt_max, ts_min, ts_max FROM report_state WHERE name = 'search_logs'").fetchone()
+    conn.execute("""
+        UPDATE report_state SET last_id = ?, total_logs = total_logs + ?, rt_count = rt_count + ?,
+            rt_sum = rt_sum + ?, rt_min = ?, rt_max = ?, ts_min = ?, ts_max = ?
+        WHERE name = 'search_logs'
+    """, (high, count, rt_count, rt_sum,
+          _keep(state[0], rt_min, min), _keep(state[1], rt_max, max),
+          _keep(state[2], ts_min, min), _keep(state[3], ts_max, max)))
+
+    for table, column in (("report_user_counts", "user_id"), ("report_query_counts", "search_query")):
+        conn.execute(f"""
+            INSERT INTO {table} ({column}, searches)
+            SELECT {column}, COUNT(*) FROM search_logs WHERE id > ? AND id <= ? GROUP BY {column}
+            ON CONFLICT ({column}) DO UPDATE SET searches = searches + excluded.searches
+        """, (low, high))
 
+def update_report_state(conn, full=False, chunk=REPORT_CHUNK):
+    """Bring the persisted report state up to date; returns the number of rows folded in."""
+    ensure_report_state(conn)
+    last_id, stale = conn.execute("SELECT last_id, stale FROM report_state WHERE name = 'search_logs'").fetchone()
+    max_id = conn.execute("SELECT MAX(id) FROM search_logs").fetchone()[0] or 0
+    if full or stale or max_id < last_id:
+        reset_report_state(conn)
+        last_id = 0
+
+    folded = 0
+    while last_id < max_id:
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            # Re-read under the write lock: a concurrent run may have counted this range.
+            last_id = conn.execute("SELECT last_id FROM report_state WHERE name = 'search_logs'").fetchone()[0]
+            high, rows = next_id_chunk(conn, last_id, max_id, chunk)
+            if high is None:
+                break
+            _fold(conn, last_id, high)
+        folded += rows
+        last_id = high
+    return folded
+
+def read_report(conn):
+    """The report figures from the persisted state."""
+    total_logs, rt_count, rt_sum, rt_min, rt_max, ts_min, ts_max = conn.execute("""
+        SELECT total_logs, rt_count, rt_sum, rt_min, rt_max, ts_min, ts_max FROM report_state WHERE name = 'search_logs'
+    """).fetchone()
+    return {
+        "total_logs": total_logs,
+        "total_users": conn.execute("SELECT COUNT(*) FROM report_user_counts").fetchone()[0],
+        "total_queries": conn.execute("SELECT COUNT(*) FROM report_query_counts").fetchone()[0],
+        "start": ts_min,
+        "end": ts_max,
+        "avg_rt": rt_sum / rt_count if rt_count else None,
+        "min_rt": rt_min,
+        "max_rt": rt_max,
+        "top_user": conn.execute(
+            "SELECT user_id, searches FROM report_user_counts ORDER BY searches DESC, user_id LIMIT 1").fetchone(),
+        "top_query": conn.execute(
+            "SELECT search_query, searches FROM report_query_counts ORDER BY searches DESC, search_query LIMIT 1").fetchone(),
+    }
+
+def compute_full_report(conn):
+    """The report figures straight from search_logs, without any saved state."""
+    cursor = conn.cursor()
     cursor.execute("SELECT COUNT(*) FROM search_logs")
     total_logs = cursor.fetchone()[0]
-    print(f"Total logs: {total_logs}")
-
     cursor.execute("SELECT COUNT(DISTINCT user_id) FROM search_logs")
     total_users = cursor.fetchone()[0]
-    print(f"Total unique users: {total_users}")
-
     cursor.execute("SELECT COUNT(DISTINCT search_query) FROM search_logs")
     total_queries = cursor.fetchone()[0]
-    print(f"Total unique queries: {total_queries}")
-
-    cursor.execute("SELECT MIN(timestamp), MAX(timestamp) FROM search_logs")
+    # Separate subqueries so each can be answered from one end of idx_timestamp.
+    cursor.execute("SELECT (SELECT MIN(timestamp) FROM search_logs), (SELECT MAX(timestamp) FROM search_logs)")
     start, end = cursor.fetchone()
-    print(f"Time range: {start} to {end}")
-
     cursor.execute("SELECT AVG(response_time), MIN(response_time), MAX(response_time) FROM search_logs")
     avg_rt, min_rt, max_rt = cursor.fetchone()
-    print(f"Avg response time: {avg_rt:.3f}s")
-    print(f"Min response time: {min_rt:.3f}s")
-    print(f"Max response time: {max_rt:.3f}s")
-
-    cursor.execute("SELECT user_id, COUNT(*) as c FROM search_logs GROUP BY user_id ORDER BY c DESC LIMIT 1")
+    cursor.execute("SELECT user_id, COUNT(*) as c FROM search_logs GROUP BY user_id ORDER BY c DESC, user_id LIMIT 1")
     top_user = cursor.fetchone()
-    print(f"Most active user: {top_user[0]} with {top_user[1]} searches")
-
-    cursor.execute("SELECT search_query, COUNT(*) as c FROM search_logs GROUP BY search_query ORDER BY c DESC LIMIT 1")
+    cursor.execute("SELECT search_query, COUNT(*) as c FROM search_logs GROUP BY search_query ORDER BY c DESC, search_query LIMIT 1")
     top_query = cursor.fetchone()
-    print(f"Most common query: '{top_query[0]}' ({top_query[1]} times)")
+    return {
+        "total_logs": total_logs,
+        "total_users": total_users,
+        "total_queries": total_queries,
+        "start": start,
+        "end": end,
+        "avg_rt": avg_rt,
+        "min_rt": min_rt,
+        "max_rt": max_rt,
+        "top_user": top_user,
+        "top_query": top_query,
+    }
+
+def report_partial(db_path, full=False):
+    """One database's share of a combined report: its updated state plus its per-user and per-query counts."""
+    conn = sqlite3.connect(db_path)
+    try:
+        update_report_state(conn, full=full)
+        part = dict(zip(("total_logs", "rt_count", "rt_sum", "rt_min", "rt_max", "ts_min", "ts_max"), conn.execute("""
+            SELECT total_logs, rt_count, rt_sum, rt_min, rt_max, ts_min, ts_max FROM report_state WHERE name = 'search_logs'
+        """).fetchone()))
+        part["users"] = dict(conn.execute("SELECT user_id, searches FROM report_user_counts"))
+        part["queries"] = dict(conn.execute("SELECT search_query, searches FROM report_query_counts"))
+    finally:
+        conn.close()
+    return part
+
+def _top(counts):
+    # Same tie-break as read_report: most searches, then the smallest key.
+    return min(counts.items(), key=lambda item: (-item[1], item[0])) if counts else None
+
+def merge_partials(parts):
+    """Combine report_partial results into one report in read_report's format.
+
+    Counts and sums add up, the extremes take the min/max, and the user and
+    query counts are added key by key, so distinct totals and the top user
+    and query are exact across databases.
+    """
+    total_logs = rt_count = 0
+    rt_sum = 0.0
+    rt_min = rt_max = ts_min = ts_max = None
+    users, queries = {}, {}
+    for part in parts:
+        total_logs += part["total_logs"]
+        rt_count += part["rt_count"]
+        rt_sum += part["rt_sum"]
+        rt_min = _keep(rt_min, part["rt_min"], min)
+        rt_max = _keep(rt_max, part["rt_max"], max)
+        ts_min = _keep(ts_min, part["ts_min"], min)
+        ts_max = _keep(ts_max, part["ts_max"], max)
+        for mine, theirs in ((users, part["users"]), (queries, part["queries"])):
+            for key, count in theirs.items():
+                mine[key] = mine.get(key, 0) + count
+    top_user, top_query = _top(users), _top(queries)
+    return {
+        "total_logs": total_logs,
+        "total_users": len(users),
+        "total_queries": len(queries),
+        "start": ts_min,
+        "end": ts_max,
+        "avg_rt": rt_sum / rt_count if rt_count else None,
+        "min_rt": rt_min,
+        "max_rt": rt_max,
+        "top_user": top_user,
+        "top_query": top_query,
+    }
+
+def print_report(report):
+    print("\nLog System Summary Report")
+    print("-------------------------")
+    print(f"Total logs: {report['total_logs']}")
+    print(f"Total unique users: {report['total_users']}")
+    print(f"Total unique queries: {report['total_queries']}")
+    print(f"Time range: {report['start']} to {report['end']}")
+    if report["avg_rt"] is not None:
+        print(f"Avg response time: {report['avg_rt']:.3f}s")
+        print(f"Min response time: {report['min_rt']:.3f}s")
+        print(f"Max response time: {report['max_rt']:.3f}s")
+    else:
+        print("No response time data available.")
+    if report["top_user"]:
+        print(f"Most active user: {report['top_user'][0]} with {report['top_user'][1]} searches")
+    if report["top_query"]:
+        print(f"Most common query: '{report['top_query'][0]}' ({report['top_query'][1]} times)")
 
+def reports_match(a, b):
+    for key in a:
+        x, y = a[key], b[key]
+        if isinstance(x, float) and isinstance(y, float):
+            if not math.isclose(x, y, rel_tol=1e-9, abs_tol=1e-12):
+                return False
+        elif x != y:
+            return False
+    return True
+
+def generate_report(db_path='logs.db', full=False):
+    """Print the summary, folding in only rows added since the last run unless full=True."""
+    conn = sqlite3.connect(db_path)
+    update_report_state(conn, full=full)
+    report = read_report(conn)
     conn.close()
+    print_report(report)
+    return report
+
+def generate_multi_report(db_paths, full=False, workers=None):
+    """Print one summary across several databases, updating each one's report state in a worker process."""
+    report = merge_partials(map_databases(partial(report_partial, full=full), db_paths, workers))
+    print(f"\n📚 Combined report for {len(db_paths)} databases")
+    print_report(report)
+    return report
+
+def verify_report(db_path='logs.db'):
+    """Check the incremental state against a from-scratch computation."""
+    conn = sqlite3.connect(db_path)
+    update_report_state(conn)
+    incremental = read_report(conn)
+    full = compute_full_report(conn)
+    conn.close()
+
+    if reports_match(incremental, full):
+        print("\n✅ Incremental report matches a full recomputation.")
+        return True
+    print("\n⚠️ Incremental report differs from a full recomputation:")
+    for key in full:
+        if not reports_match({key: incremental[key]}, {key: full[key]}):
+            print(f"  {key}: incremental={incremental[key]!r} full={full[key]!r}")
+    return False
 
 def main():
-    generate_report()
+    parser = argparse.ArgumentParser(description="Print a summary report of logs.db")
+    parser.add_argument("--db", nargs="+", default=["logs.db"],
+                        help="SQLite databases or glob patterns (e.g. 'archive/*.db'); several are reported together")
+    parser.add_argument("--full", action="store_true", help="Rebuild the saved report state from scratch")
+    parser.add_argument("--verify", action="store_true", help="Check the incremental report against a full recomputation")
+    parser.add_argument("--workers", type=int, help="Processes reading databases in parallel (default: one per core)")
+    args = parser.parse_args()
+
+    try:
+        paths = expand_paths(args.db)
+    except FileNotFoundError as e:
+        parser.error(str(e))
+
+    if len(paths) == 1:
+        generate_report(paths[0], full=args.full)
+    else:
+        generate_multi_report(paths, full=args.full, workers=args.workers)
+    if args.verify and not all([verify_report(path) for path in paths]):
+        raise SystemExit(1)
 
 if __name__ == "__main__":
     main()
@@ -1,23 +1,130 @@
-from flask import Flask, request, jsonify
-import sqlite3
+from flask import Flask, Response, request, jsonify
+import atexit
+import base64
+import gzip
+import json
+import math
+import os
+import signal
+import threading
+from utils.db_utils import connect, init_schema, is_valid_timestamp
+from utils.partitions import PartitionWriter, select_partitions, select_partitions_page, utc_timestamp
+from utils.write_buffer import WriteBehindBuffer
 
 app = Flask(__name__)
 DB_FILE = "logs.db"
 
+# Opt-in buffered ingest: POST /log only queues the record and a single
+# writer thread commits batches, trading up to LOG_FLUSH_MS of durability
+# for one fsync per batch instead of one per search.
+BUFFERED_INGEST = os.environ.get("LOG_BUFFERED", "0") == "1"
+FLUSH_ROWS = int(os.environ.get("LOG_FLUSH_ROWS", "500"))
+FLUSH_MS = int(os.environ.get("LOG_FLUSH_MS", "200"))
+
+# Opt-in month-partitioned storage (utils/partitions.py): when set, logs are
+# routed to one database per month in this directory instead of DB_FILE,
+# and GET /logs only reads the months its time range overlaps.
+PARTITION_DIR = os.environ.get("LOG_PARTITION_DIR") or None
+
+INSERT_SQL = """
+    INSERT INTO search_logs (user_id, search_query, response_time)
+    VALUES (?, ?, ?)
+"""
+
+# Bulk ingest: rows per transaction and how many per-line errors to echo back.
+BULK_CHUNK_ROWS = 1000
+BULK_MAX_ERRORS = 100
+
+BULK_INSERT_SQL = """
+    INSERT INTO search_logs (timestamp, user_id, search_query, response_time)
+    VALUES (COALESCE(?, CURRENT_TIMESTAMP), ?, ?, ?)
+"""
+
+# GET /logs paging and streaming; LOG_COLUMNS is search_logs' SELECT * order.
+LOG_COLUMNS = "id, timestamp, user_id, search_query, response_time"
+DEFAULT_PAGE_SIZE = 1000
+MAX_PAGE_SIZE = 10000
+STREAM_BATCH_ROWS = 1000
+
+write_buffer = None
+
+# One connection per worker thread (waitress serves requests from a fixed
+# thread pool), reused across requests instead of reconnecting every time.
+_local = threading.local()
+_connections = []
+_connections_lock = threading.Lock()
+_generation = 0
+
 # Ensure the database is set up
 def init_db():
-    with sqlite3.connect(DB_FILE) as conn:
-        cursor = conn.cursor()
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS search_logs (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
-                user_id TEXT NOT NULL,
-                search_query TEXT NOT NULL,
-                response_time REAL
-            )
-        """)
-        conn.commit()
+    if PARTITION_DIR:
+        os.makedirs(PARTITION_DIR, exist_ok=True)
+        return
+    conn = connect(DB_FILE)
+    init_schema(conn)
+    conn.close()
+
+def get_db():
+    """Return this thread's connection to DB_FILE, opening it on first use."""
+    conn = getattr(_local, "conn", None)
+    if conn is None or _local.key != (DB_FILE, _generation):
+        conn = connect(DB_FILE, check_same_thread=False)
+        _local.conn = conn
+        _local.key = (DB_FILE, _generation)
+        with _connections_lock:
+            _connections.append(conn)
+    return conn
+
+def get_writer():
+    """Return this thread's PartitionWriter for PARTITION_DIR."""
+    writer = getattr(_local, "writer", None)
+    if writer is None or _local.writer_key != (PARTITION_DIR, _generation):
+        writer = PartitionWriter(PARTITION_DIR)
+        _local.writer = writer
+        _local.writer_key = (PARTITION_DIR, _generation)
+        with _connections_lock:
+            _connections.append(writer)
+    return writer
+
+def store_rows(rows):
+    """Insert (timestamp, user_id, search_query, response_time) rows; a None timestamp means now."""
+    if PARTITION_DIR:
+        get_writer().insert(rows)
+        return
+    conn = get_db()
+    with conn:
+        conn.executemany(BULK_INSERT_SQL, rows)
+
+def close_connections():
+    """Close every per-thread connection and partition writer; threads reconnect on their next request."""
+    global _generation
+    with _connections_lock:
+        for conn in _connections:
+            conn.close()
+        _connections.clear()
+        _generation += 1
+
+atexit.register(close_connections)
+
+def start_write_buffer(max_rows=FLUSH_ROWS, max_delay_ms=FLUSH_MS):
+    """Switch POST /log to buffered mode and flush on interpreter shutdown."""
+    global write_buffer
+    if write_buffer is None:
+        write_buffer = WriteBehindBuffer(DB_FILE, INSERT_SQL, max_rows=max_rows, max_delay_ms=max_delay_ms,
+                                         partition_dir=PARTITION_DIR)
+        atexit.register(stop_write_buffer)
+    return write_buffer
+
+def stop_write_buffer():
+    """Flush queued logs and return to synchronous inserts."""
+    global write_buffer
+    if write_buffer is not None:
+        write_buffer.close()
+        write_buffer = None
+
+def _exit_on_sigterm(signum, frame):
+    # Turn SIGTERM into a normal exit so atexit gets to flush the buffer.
+    raise SystemExit(0)
 
 @app.route('/log', methods=['POST'])
 def log_search():
@@ -25,49 +132,238 @@ def log_search():
     data = request.json
 
     # Validate required fields
-    if not data or "user_id" not in data or "search_query" not in data:
+    if not isinstance(data, dict) or "user_id" not in data or "search_query" not in data:
         return jsonify({"error": "Missing required fields: user_id, search_query"}), 400
 
     user_id = data["user_id"]
     search_query = data["search_query"]
     response_time = data.get("response_time")  # Optional
 
-    with sqlite3.connect(DB_FILE) as conn:
-        cursor = conn.cursor()
-        cursor.execute("""
-            INSERT INTO search_logs (user_id, search_query, response_time) 
-            VALUES (?, ?, ?)
-        """, (user_id, search_query, response_time))
-        conn.commit()
+    # Checked before queueing: a buffered row is acknowledged before it is written.
+    try:
+        check_log_fields(user_id, search_query, response_time)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    if PARTITION_DIR:
+        # Stamped on arrival so the row is routed to the month it was received in.
+        row = (utc_timestamp(), user_id, search_query, response_time)
+    else:
+        row = (user_id, search_query, response_time)
+
+    if write_buffer is not None:
+        write_buffer.put(row)
+        return jsonify({"message": "Log queued"}), 202
+
+    if PARTITION_DIR:
+        store_rows([row])
+    else:
+        conn = get_db()
+        with conn:
+            conn.execute(INSERT_SQL, row)
 
     return jsonify({"message": "Log stored successfully"}), 201
 
+def check_log_fields(user_id, search_query, response_time):
+    """Raise ValueError unless the fields have the types search_logs stores."""
+    if not isinstance(user_id, str) or not isinstance(search_query, str):
+        raise ValueError("user_id and search_query must be strings")
+    if response_time is not None and (isinstance(response_time, bool) or not isinstance(response_time, (int, float))):
+        raise ValueError("response_time must be a number")
+    if response_time is not None and not math.isfinite(response_time):
+        raise ValueError("response_time must be finite")
+
+def parse_bulk_record(line):
+    """Validate one NDJSON line and return the row to insert, or raise ValueError."""
+    try:
+        data = json.loads(line)
+    except ValueError as e:
+        raise ValueError(f"Invalid JSON: {e}")
+    if not isinstance(data, dict):
+        raise ValueError("Record must be a JSON object")
+    if "user_id" not in data or "search_query" not in data:
+        raise ValueError("Missing required fields: user_id, search_query")
+
+    user_id = data["user_id"]
+    search_query = data["search_query"]
+    response_time = data.get("response_time")
+    timestamp = data.get("timestamp")
+
+    check_log_fields(user_id, search_query, response_time)
+    if timestamp is not None and not is_valid_timestamp(timestamp):
+        raise ValueError("timestamp must be a string formatted as YYYY-MM-DD HH:MM:SS or YYYY-MM-DD")
+
+    return (timestamp, user_id, search_query, response_time)
+
+@app.route('/log/bulk', methods=['POST'])
+def log_bulk():
+    """Endpoint to store newline-delimited JSON logs, optionally gzip-compressed"""
+    stream = request.stream
+    if request.headers.get("Content-Encoding", "").lower() == "gzip":
+        stream = gzip.GzipFile(fileobj=stream, mode="rb")
+
+    inserted = 0
+    error_count = 0
+    errors = []
+    chunk = []
+
+    try:
+        for line_no, raw in enumerate(stream, start=1):
+            line = raw.strip()
+            if not line:
+                continue
+            try:
+                chunk.append(parse_bulk_record(line))
+            except ValueError as e:
+                error_count += 1
+                if len(errors) < BULK_MAX_ERRORS:
+                    errors.append({"line": line_no, "error": str(e)})
+                continue
+
+            if len(chunk) >= BULK_CHUNK_ROWS:
+                store_rows(chunk)
+                inserted += len(chunk)
+                chunk = []
+    except (OSError, EOFError) as e:
+        # Corrupt or truncated gzip body: keep what was already committed.
+        error_count += 1
+        errors.append({"line": None, "error": f"Could not read request body: {e}"})
+
+    if chunk:
+        store_rows(chunk)
+        inserted += len(chunk)
+
+    return jsonify({"inserted": inserted, "error_count": error_count, "errors": errors}), 200
+
+def encode_cursor(timestamp, row_id):
+    """Opaque next-page token for keyset pagination on (timestamp, id)."""
+    raw = json.dumps([timestamp, row_id]).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii")
+
+def decode_cursor(token):
+    try:
+        timestamp, row_id = json.loads(base64.urlsafe_b64decode(token.encode("ascii")))
+    except (ValueError, TypeError):
+        raise ValueError("Invalid cursor")
+    if isinstance(row_id, bool) or not isinstance(row_id, int):
+        raise ValueError("Invalid cursor")
+    if timestamp is not None and not isinstance(timestamp, str):
+        raise ValueError("Invalid cursor")
+    return timestamp, row_id
+
+def query_batches(query, params):
+    """Yield the rows of a query against DB_FILE in lists of STREAM_BATCH_ROWS."""
+    conn = connect(DB_FILE)
+    try:
+        cursor = conn.cursor()
+        cursor.arraysize = STREAM_BATCH_ROWS
+        cursor.execute(query, params)
+        while True:
+            rows = cursor.fetchmany()
+            if not rows:
+                break
+            yield rows
+    finally:
+        conn.close()
+
+def stream_rows(batches, fmt):
+    """Yield the result set as a JSON array or NDJSON without materializing it."""
+    if fmt != "ndjson":
+        yield "["
+    first = True
+    for rows in batches:
+        if fmt == "ndjson":
+            yield "".join(json.dumps(row) + "\n" for row in rows)
+        else:
+            chunk = ",".join(json.dumps(row) for row in rows)
+            yield chunk if first else "," + chunk
+            first = False
+    if fmt != "ndjson":
+        yield "]\n"
+
 @app.route('/logs', methods=['GET'])
 def get_logs():
-    """Retrieve stored logs, with optional filtering by user_id and timestamp"""
+    """Retrieve stored logs, with optional filtering by user_id and timestamp.
+
+    With ``limit`` (and ``cursor`` from the previous page) results are paged
+    in (timestamp, id) order; otherwise the full result is streamed as a JSON
+    array, or as NDJSON with ``format=ndjson``.
+    """
     user_id = request.args.get("user_id")
     start_time = request.args.get("start_time")  # Optional filter by timestamp
     end_time = request.args.get("end_time")
+    limit = request.args.get("limit")
+    cursor_token = request.args.get("cursor")
+    fmt = request.args.get("format", "json")
+
+    if fmt not in ("json", "ndjson"):
+        return jsonify({"error": "format must be 'json' or 'ndjson'"}), 400
 
-    query = "SELECT * FROM search_logs WHERE 1=1"
+    where = ""
     params = []
 
     if user_id:
-        query += " AND user_id = ?"
+        where += " AND user_id = ?"
         params.append(user_id)
     if start_time:
-        query += " AND timestamp >= ?"
+        where += " AND timestamp >= ?"
         params.append(start_time)
     if end_time:
-        query += " AND timestamp <= ?"
+        where += " AND timestamp <= ?"
         params.append(end_time)
 
-    with sqlite3.connect(DB_FILE) as conn:
-        cursor = conn.cursor()
-        cursor.execute(query, params)
-        logs = cursor.fetchall()
+    if limit is None and cursor_token is None:
+        mimetype = "application/x-ndjson" if fmt == "ndjson" else "application/json"
+        if PARTITION_DIR:
+            batches = select_partitions(PARTITION_DIR, LOG_COLUMNS, where, params, start_time, end_time,
+                                        arraysize=STREAM_BATCH_ROWS)
+        else:
+            batches = query_batches(f"SELECT * FROM search_logs WHERE 1=1{where}", params)
+        return Response(stream_rows(batches, fmt), mimetype=mimetype), 200
+
+    try:
+        limit = min(int(limit or DEFAULT_PAGE_SIZE), MAX_PAGE_SIZE)
+        if limit <= 0:
+            raise ValueError
+    except ValueError:
+        return jsonify({"error": "limit must be a positive integer"}), 400
+
+    prune_start = start_time
+    if cursor_token:
+        try:
+            after_ts, after_id = decode_cursor(cursor_token)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        if after_ts is None:
+            # (NULL, id) > ... is NULL, never true; NULL timestamps sort first.
+            where += " AND ((timestamp IS NULL AND id > ?) OR timestamp IS NOT NULL)"
+            params.append(after_id)
+        else:
+            where += " AND (timestamp, id) > (?, ?)"
+            params.extend([after_ts, after_id])
+        # Months before the cursor cannot hold the next page.
+        if isinstance(after_ts, str) and (prune_start is None or after_ts > prune_start):
+            prune_start = after_ts
+
+    # Fetch one extra row to learn whether another page exists.
+    if PARTITION_DIR:
+        logs = select_partitions_page(PARTITION_DIR, where, params, prune_start, end_time, limit + 1)
+    else:
+        query = f"SELECT * FROM search_logs WHERE 1=1{where} ORDER BY timestamp, id LIMIT ?"
+        logs = get_db().execute(query, params + [limit + 1]).fetchall()
+
+    next_cursor = None
+    if len(logs) > limit:
+        logs = logs[:limit]
+        last = logs[-1]
+        next_cursor = encode_cursor(last[1], last[0])
+
+    return jsonify({"logs": logs, "next_cursor": next_cursor}), 200
 
-    return jsonify(logs), 200
+if BUFFERED_INGEST:
+    start_write_buffer()
+    if threading.current_thread() is threading.main_thread():
+        signal.signal(signal.SIGTERM, _exit_on_sigterm)
 
 if __name__ == "__main__":
     init_db()
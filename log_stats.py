@@ -1,15 +1,26 @@
 import argparse
-from utils.db_utils import fetch_data
+from utils.multi_db import expand_paths, fetch_many
 from utils.stats_utils import compute_summary_stats, print_summary_report
 
 def main():
     parser = argparse.ArgumentParser(description="Quickly summarize logs.db search data")
-    parser.add_argument("--db", type=str, default="logs.db", help="Path to SQLite database")
+    parser.add_argument("--db", nargs="+", default=["logs.db"],
+                        help="SQLite databases, partition directories or glob patterns (e.g. 'nodes/*.db'); "
+                             "several are summarized together")
+    parser.add_argument("--start", help="Only count logs from this timestamp on (YYYY-MM-DD or full ISO format)")
+    parser.add_argument("--end", help="Only count logs up to this timestamp")
+    parser.add_argument("--workers", type=int, help="Processes reading databases in parallel (default: one per core)")
     args = parser.parse_args()
 
-    print("\n🔍 Running log_stats on:", args.db)
+    try:
+        paths = expand_paths(args.db)
+    except FileNotFoundError as e:
+        parser.error(str(e))
 
-    user_data, query_data, time_data, avg_data, hour_data, response_times = fetch_data(args.db)
+    print("\n🔍 Running log_stats on:", paths[0] if len(paths) == 1 else f"{len(paths)} databases")
+
+    user_data, query_data, time_data, avg_data, hour_data, response_times = fetch_many(
+        paths, args.start, args.end, args.workers)
     stats = compute_summary_stats(user_data, query_data, time_data, hour_data, response_times)
 
     print_summary_report(stats)
@@ -2,15 +2,13 @@ import argparse
 import os
 import textwrap
 from utils.db_utils import fetch_data
-from utils.plot_utils import plot_bar_chart, plot_line_chart
 from utils.export_utils import export_to_csv, print_summary_report, print_usage_tips
 
 # Default database path
 DEFAULT_DB = 'logs.db'
 
-# Create an output folder for saving files
+# Output folder for saved graphs and CSV files (created on first use)
 EXPORT_DIR = "exports"
-os.makedirs(EXPORT_DIR, exist_ok=True)
 
 BANNER = textwrap.dedent("""
     ==========================================
@@ -32,51 +30,81 @@ if __name__ == "__main__":
     parser.add_argument("--csv", action="store_true", help="Export selected data to CSV")
     parser.add_argument("--top", type=int, help="Only show top N results in graphs")
     parser.add_argument("--db", type=str, default=DEFAULT_DB, help="Specify an alternate database path")
+    parser.add_argument("--jobs", type=int, help="Worker processes for rendering saved graphs (default: one per CPU)")
+    parser.add_argument("--no-graphs", action="store_true", help="Skip charts (e.g. with --csv) and never load matplotlib")
 
     args = parser.parse_args()
     print("📊Log Visualizer starting with options:")
     for arg, val in vars(args).items():
         print(f"  --{arg}: {val}")
 
+    if args.save or args.csv:
+        os.makedirs(EXPORT_DIR, exist_ok=True)
+
     user_data, query_data, time_data, avg_data, hour_data, response_times = fetch_data(args.db)
 
+    # (kind, data, title, xlabel, ylabel) for every chart requested
+    charts = []
+
     if args.user:
-        plot_bar_chart(user_data, "Searches Per User", "User ID", "Search Count", save=args.save, top_n=args.top)
+        charts.append(("bar", user_data, "Searches Per User", "User ID", "Search Count"))
         if args.csv:
             export_to_csv(user_data, "searches_per_user.csv")
 
     if args.query:
-        plot_bar_chart(query_data, "Searches Per Query", "Search Query", "Count", save=args.save, top_n=args.top)
+        charts.append(("bar", query_data, "Searches Per Query", "Search Query", "Count"))
         if args.csv:
             export_to_csv(query_data, "searches_per_query.csv")
 
     if args.time:
-        plot_bar_chart(time_data, "Searches Per Day", "Date", "Count", save=args.save, top_n=args.top)
+        charts.append(("bar", time_data, "Searches Per Day", "Date", "Count"))
         if args.csv:
             export_to_csv(time_data, "searches_per_day.csv")
 
     if args.hour:
-        plot_bar_chart(hour_data, "Searches by Hour of Day", "Hour", "Count", save=args.save, top_n=args.top)
+        charts.append(("bar", hour_data, "Searches by Hour of Day", "Hour", "Count"))
         if args.csv:
             export_to_csv(hour_data, "searches_per_hour.csv")
 
     if args.avg:
-        plot_bar_chart(avg_data, "Average Response Time Per User", "User ID", "Avg Response Time (s)", save=args.save, top_n=args.top)
+        charts.append(("bar", avg_data, "Average Response Time Per User", "User ID", "Avg Response Time (s)"))
         if args.csv:
             export_to_csv(avg_data, "avg_response_time.csv")
 
     if args.trend:
-        plot_line_chart(time_data, "Searches Per Day (Line Chart)", "Date", "Count", save=args.save)
+        charts.append(("line", time_data, "Searches Per Day (Line Chart)", "Date", "Count"))
         if args.csv:
             export_to_csv(time_data, "searches_per_day.csv")
 
     if not any([args.user, args.query, args.time, args.avg, args.trend, args.hour]):
-        plot_bar_chart(user_data, "Searches Per User", "User ID", "Search Count", save=args.save, top_n=args.top)
-        plot_bar_chart(query_data, "Searches Per Query", "Search Query", "Count", save=args.save, top_n=args.top)
-        plot_bar_chart(time_data, "Searches Per Day", "Date", "Count", save=args.save, top_n=args.top)
-        plot_bar_chart(avg_data, "Average Response Time Per User", "User ID", "Avg Response Time (s)", save=args.save, top_n=args.top)
-        plot_bar_chart(hour_data, "Searches by Hour of Day", "Hour", "Search Count", save=args.save, top_n=args.top)
-        plot_line_chart(time_data, "Searches Per Day", "Date", "Count", save=args.save)
+        charts = [
+            ("bar", user_data, "Searches Per User", "User ID", "Search Count"),
+            ("bar", query_data, "Searches Per Query", "Search Query", "Count"),
+            ("bar", time_data, "Searches Per Day", "Date", "Count"),
+            ("bar", avg_data, "Average Response Time Per User", "User ID", "Avg Response Time (s)"),
+            ("bar", hour_data, "Searches by Hour of Day", "Hour", "Search Count"),
+            ("line", time_data, "Searches Per Day (Line Chart)", "Date", "Count"),
+        ]
+
+    if args.no_graphs:
+        charts = []
+    elif charts:
+        # matplotlib is only loaded when there is something to draw.
+        from utils.plot_utils import chart_spec, plot_bar_chart, plot_line_chart, render_charts
+
+    if args.save and charts:
+        # Headless batch: every chart rendered in parallel across a process pool.
+        specs = [chart_spec(kind, data, title, xlabel, ylabel, top_n=args.top if kind == "bar" else None)
+                 for kind, data, title, xlabel, ylabel in charts]
+        for path in render_charts(specs, processes=args.jobs):
+            if path:
+                print(f"📁 Saved graph to {path}")
+    else:
+        for kind, data, title, xlabel, ylabel in charts:
+            if kind == "line":
+                plot_line_chart(data, title, xlabel, ylabel)
+            else:
+                plot_bar_chart(data, title, xlabel, ylabel, top_n=args.top)
 
     print_summary_report(user_data, query_data, time_data, response_times)
     print_usage_tips()
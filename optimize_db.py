@@ -1,6 +1,13 @@
 import sqlite3
 import argparse
+import re
 import time
+from datetime import datetime, timedelta
+from utils.aggregator import LogAggregates
+from utils.compact import COMPACT_TABLE, MIGRATION_CHUNK, is_compact, migrate_to_compact, scan_compact
+from utils.db_utils import FTS_TABLE, has_fts_index, query_filter
+from utils.partitions import SPLIT_CHUNK, list_partitions, split_database
+from utils.rollups import create_rollups, rebuild_rollups, refresh_rollups
 
 INDEXES = [
     ("idx_timestamp", "timestamp"),
@@ -10,6 +17,10 @@ INDEXES = [
 
 def add_indexes(db_file):
     conn = sqlite3.connect(db_file)
+    if is_compact(conn):
+        print("search_logs uses the compact schema, which carries its own indexes.")
+        conn.close()
+        return
     cursor = conn.cursor()
     for idx_name, col in INDEXES:
         print(f"Adding index on '{col}'...")
@@ -21,38 +32,441 @@ def add_indexes(db_file):
     conn.close()
     print("Index optimization complete.")
 
+# Trigram FTS5 shadow index over search_query. It is an external-content
+# table (no second copy of the text) kept in sync by triggers, and SQLite
+# answers LIKE '%...%' against it from the trigram index.
+FTS_SQL = [
+    f"""CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(
+        search_query, content='search_logs', content_rowid='id', tokenize='trigram'
+    )""",
+    f"""CREATE TRIGGER IF NOT EXISTS search_logs_fts_ai AFTER INSERT ON search_logs BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, search_query) VALUES (new.id, new.search_query);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS search_logs_fts_ad AFTER DELETE ON search_logs BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, search_query) VALUES ('delete', old.id, old.search_query);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS search_logs_fts_au AFTER UPDATE OF search_query ON search_logs BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, search_query) VALUES ('delete', old.id, old.search_query);
+        INSERT INTO {FTS_TABLE}(rowid, search_query) VALUES (new.id, new.search_query);
+    END""",
+]
+
+def add_fts_index(db_file):
+    conn = sqlite3.connect(db_file)
+    if is_compact(conn):
+        print("The full-text index is not supported on the compact schema.")
+        conn.close()
+        return
+    print("Building full-text index on 'search_query'...")
+    try:
+        for sql in FTS_SQL:
+            conn.execute(sql)
+        conn.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')")
+        conn.commit()
+        print("Full-text index ready.")
+    except sqlite3.OperationalError as e:
+        print(f"Failed to build full-text index (needs SQLite FTS5 with the trigram tokenizer): {e}")
+    conn.close()
+
+def drop_fts_index(db_file):
+    conn = sqlite3.connect(db_file)
+    for trigger in ("search_logs_fts_ai", "search_logs_fts_ad", "search_logs_fts_au"):
+        conn.execute(f"DROP TRIGGER IF EXISTS {trigger}")
+    conn.execute(f"DROP TABLE IF EXISTS {FTS_TABLE}")
+    conn.commit()
+    conn.close()
+    print("Full-text index removed.")
+
+def update_rollups(db_file, rebuild=False):
+    """Create the dashboard rollup tables if needed and fold in new rows."""
+    conn = sqlite3.connect(db_file)
+    create_rollups(conn)
+    start = time.time()
+    if rebuild:
+        folded = rebuild_rollups(conn)
+    else:
+        folded = refresh_rollups(conn)
+    conn.close()
+    print(f"Rollups up to date ({folded} new rows folded in {round(time.time() - start, 4)} s).")
+
 def benchmark_query(db_file):
     conn = sqlite3.connect(db_file)
     cursor = conn.cursor()
 
     print("\n⏱Benchmarking common queries:")
 
-    start = time.time()
+    start = time.perf_counter()
     cursor.execute("SELECT COUNT(*) FROM search_logs")
     print("Total entries:", cursor.fetchone()[0])
-    print("Query 1 time:", round(time.time() - start, 4), "s")
+    print("Query 1 time:", round(time.perf_counter() - start, 4), "s")
 
-    start = time.time()
+    start = time.perf_counter()
     cursor.execute("SELECT COUNT(*) FROM search_logs WHERE user_id = 'test_user_1'")
-    print("Query 2 time:", round(time.time() - start, 4), "s")
+    print("Query 2 time:", round(time.perf_counter() - start, 4), "s")
 
-    start = time.time()
-    cursor.execute("SELECT COUNT(*) FROM search_logs WHERE search_query LIKE '%flask%'")
-    print("Query 3 time:", round(time.time() - start, 4), "s")
+    start = time.perf_counter()
+    clause, param = query_filter(conn, "flask")
+    cursor.execute("SELECT COUNT(*) FROM search_logs WHERE 1=1" + clause, (param,))
+    print("Query 3 time:", round(time.perf_counter() - start, 4), "s")
+
+    conn.close()
+
+# Statements the tools issue against search_logs, for the --advise index
+# advisor. "key" is the index that would serve the statement; "search" lists
+# the columns its plan should constrain through an index ([] = any index
+# SEARCH, None = a covering or ordered scan is fine). Parameters named by a
+# string are filled from the newest row in the database.
+ADVISOR_WORKLOAD = [
+    {"label": "GET /logs user + time page", "source": "log_service.get_logs",
+     "sql": "SELECT * FROM search_logs WHERE 1=1 AND user_id = ? AND timestamp >= ? AND timestamp <= ? "
+            "ORDER BY timestamp, id LIMIT ?",
+     "params": ("user", "start", "end", 1000), "key": ["user_id", "timestamp"], "search": ["user_id", "timestamp"]},
+    {"label": "filter_logs user + time", "source": "log_filter.filter_logs",
+     "sql": "SELECT timestamp, user_id, search_query, response_time FROM search_logs WHERE 1=1 "
+            "AND user_id = ? AND timestamp >= ? AND timestamp <= ?",
+     "params": ("user", "start", "end"), "key": ["user_id", "timestamp"], "search": ["user_id", "timestamp"]},
+    {"label": "filter_logs time range", "source": "log_filter.filter_logs",
+     "sql": "SELECT timestamp, user_id, search_query, response_time FROM search_logs WHERE 1=1 "
+            "AND timestamp >= ? AND timestamp <= ?",
+     "params": ("start", "end"), "key": ["timestamp"], "search": ["timestamp"]},
+    {"label": "searches per day", "source": "log_visualizer / rollups",
+     "sql": "SELECT DATE(timestamp), COUNT(*) FROM search_logs GROUP BY DATE(timestamp)",
+     "params": (), "key": ["DATE(timestamp)"], "search": None},
+    {"label": "searches per hour", "source": "log_stats / rollups",
+     "sql": "SELECT strftime('%H', timestamp), COUNT(*) FROM search_logs GROUP BY strftime('%H', timestamp)",
+     "params": (), "key": ["strftime('%H', timestamp)"], "search": None},
+    {"label": "avg response time per user", "source": "log_visualizer",
+     "sql": "SELECT user_id, AVG(response_time) FROM search_logs GROUP BY user_id",
+     "params": (), "key": ["user_id", "response_time"], "search": None},
+    {"label": "most active user", "source": "log_reporter",
+     "sql": "SELECT user_id, COUNT(*) as c FROM search_logs GROUP BY user_id ORDER BY c DESC, user_id LIMIT 1",
+     "params": (), "key": ["user_id"], "search": None},
+    {"label": "most common query", "source": "log_reporter",
+     "sql": "SELECT search_query, COUNT(*) as c FROM search_logs GROUP BY search_query ORDER BY c DESC, search_query LIMIT 1",
+     "params": (), "key": ["search_query"], "search": None},
+    {"label": "time span", "source": "log_reporter",
+     "sql": "SELECT (SELECT MIN(timestamp) FROM search_logs), (SELECT MAX(timestamp) FROM search_logs)",
+     "params": (), "key": ["timestamp"], "search": []},
+]
+
+ADVISOR_REPEAT = 3
+
+def _normalize(expr):
+    return re.sub(r"\s+", "", expr).lower()
+
+def index_name(key):
+    return "idx_" + "_".join(re.sub(r"\W+", "_", part.lower()).strip("_") for part in key)
+
+def existing_index_keys(conn):
+    """{index name: normalized key list} for the indexes on search_logs."""
+    keys = {}
+    for name, sql in conn.execute("SELECT name, sql FROM sqlite_master WHERE type = 'index' AND tbl_name = 'search_logs'"):
+        if sql:  # autoindexes have no SQL
+            columns = sql[sql.index("(") + 1:sql.rindex(")")]
+            keys[name] = [_normalize(part) for part in re.split(r",(?![^(]*\))", columns)]
+    return keys
+
+def explain(conn, sql, params):
+    return [row[3] for row in conn.execute("EXPLAIN QUERY PLAN " + sql, params)]
+
+def plan_problems(plan, entry):
+    """Reasons the plan for a workload statement could use a better index."""
+    problems = []
+    if "SCAN search_logs" in plan:
+        problems.append("full table scan")
+    if any("TEMP B-TREE FOR GROUP BY" in line or "TEMP B-TREE FOR DISTINCT" in line for line in plan):
+        problems.append("groups through a temp b-tree")
+    if entry["search"] is not None:
+        searches = [line for line in plan if line.startswith("SEARCH search_logs USING")]
+        if not searches:
+            problems.append("no index search")
+        else:
+            missing = [col for col in entry["search"] if not any(re.search(rf"\b{col}[=<>]", line) for line in searches)]
+            if missing:
+                problems.append(f"index does not constrain {', '.join(missing)}")
+    return problems
+
+def time_statement(conn, sql, params, repeat=ADVISOR_REPEAT):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        conn.execute(sql, params).fetchall()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+def used_bytes(conn):
+    """Bytes in pages that hold data (the file size minus its free pages)."""
+    pages = conn.execute("PRAGMA page_count").fetchone()[0] - conn.execute("PRAGMA freelist_count").fetchone()[0]
+    return pages * conn.execute("PRAGMA page_size").fetchone()[0]
+
+def index_bytes(conn, name):
+    """On-disk size of one index from the dbstat table, or None if SQLite was built without it."""
+    try:
+        return conn.execute("SELECT SUM(pgsize) FROM dbstat WHERE name = ?", (name,)).fetchone()[0] or 0
+    except sqlite3.OperationalError:
+        return None
+
+def log_storage_bytes(conn):
+    """(row bytes, index bytes) of the log tables, including the compact dictionaries, or None without dbstat."""
+    tables = ("search_logs", COMPACT_TABLE, "log_users", "log_queries")
+    marks = ", ".join("?" * len(tables))
+    try:
+        rows = conn.execute(f"""
+            SELECT m.type, SUM(d.pgsize) FROM dbstat d JOIN sqlite_master m ON m.name = d.name
+            WHERE m.tbl_name IN ({marks}) GROUP BY m.type
+        """, tables).fetchall()
+    except sqlite3.OperationalError:
+        return None
+    sizes = dict(rows)
+    return sizes.get("table", 0), sizes.get("index", 0)
+
+def advisor_params(conn):
+    """Sample parameters from the newest row: its user and the week up to its timestamp."""
+    row = conn.execute("SELECT user_id, timestamp FROM search_logs ORDER BY id DESC LIMIT 1").fetchone()
+    if row is None:
+        return None
+    user, end = row
+    try:
+        start = (datetime.strptime(end[:10], "%Y-%m-%d") - timedelta(days=7)).strftime("%Y-%m-%d %H:%M:%S")
+    except (TypeError, ValueError):
+        start = ""
+    return {"user": user, "start": start, "end": end}
 
+def advise_indexes(db_file, apply=True):
+    """Propose indexes for ADVISOR_WORKLOAD from its query plans and, if apply, build and measure them.
+
+    Returns one dict per statement (label, plans, problems, timings) and a
+    {index name: bytes} dict of the indexes that were kept.
+    """
+    conn = sqlite3.connect(db_file)
+    if is_compact(conn):
+        print("search_logs uses the compact schema, which carries its own indexes; nothing to advise.")
+        conn.close()
+        return [], {}
+    samples = advisor_params(conn)
+    if samples is None:
+        print("search_logs is empty; nothing to advise.")
+        conn.close()
+        return [], {}
+
+    results = []
+    for entry in ADVISOR_WORKLOAD:
+        params = [samples.get(p, p) if isinstance(p, str) else p for p in entry["params"]]
+        plan = explain(conn, entry["sql"], params)
+        results.append({"label": entry["label"], "source": entry["source"], "sql": entry["sql"], "params": params,
+                        "plan_before": plan, "problems": plan_problems(plan, entry),
+                        "before": time_statement(conn, entry["sql"], params)})
+
+    # A proposal is redundant if an existing or already-proposed index starts with its key.
+    keys = list(existing_index_keys(conn).values())
+    proposals = {}
+    print("\n🔎 Workload query plans:")
+    for entry, result in zip(ADVISOR_WORKLOAD, results):
+        print(f"- {entry['label']} ({entry['source']}): {'; '.join(result['plan_before'])}")
+        if not result["problems"]:
+            continue
+        key = [_normalize(part) for part in entry["key"]]
+        if any(existing[:len(key)] == key for existing in keys):
+            continue
+        # A longer key makes an earlier proposal for its prefix unnecessary.
+        for name, proposed in list(proposals.items()):
+            if [_normalize(part) for part in proposed[:len(key)]] == key[:len(proposed)] and len(proposed) < len(key):
+                del proposals[name]
+        if any([_normalize(part) for part in proposed[:len(key)]] == key for proposed in proposals.values()):
+            continue
+        proposals[index_name(entry["key"])] = entry["key"]
+        print(f"  ⚠️ {', '.join(result['problems'])} -> propose {index_name(entry['key'])}({', '.join(entry['key'])})")
+
+    if not proposals:
+        print("\n✅ Every workload statement already has a suitable index.")
+        conn.close()
+        return results, {}
+
+    print("\nProposed indexes:")
+    for name, key in proposals.items():
+        print(f"  CREATE INDEX {name} ON search_logs({', '.join(key)})")
+    if not apply:
+        conn.close()
+        return results, {}
+
+    sizes = {}
+    for name, key in proposals.items():
+        before = used_bytes(conn)
+        start = time.perf_counter()
+        conn.execute(f"CREATE INDEX IF NOT EXISTS {name} ON search_logs({', '.join(key)})")
+        conn.commit()
+        size = index_bytes(conn, name)
+        sizes[name] = size if size is not None else used_bytes(conn) - before
+        print(f"Built {name} in {time.perf_counter() - start:.2f}s (+{sizes[name] / 1e6:.2f} MB)")
+    conn.execute("ANALYZE")
+    conn.commit()
+
+    for entry, result in zip(ADVISOR_WORKLOAD, results):
+        result["plan_after"] = explain(conn, entry["sql"], result["params"])
+        result["after"] = time_statement(conn, entry["sql"], result["params"])
+
+    # Drop proposals the planner never picked once real statistics were available.
+    for name in list(sizes):
+        if not any(re.search(rf"\b{name}\b", line) for result in results for line in result["plan_after"]):
+            conn.execute(f"DROP INDEX {name}")
+            print(f"Dropped {name}: no workload statement uses it")
+            del sizes[name]
+    conn.commit()
+
+    print(f"\n{'statement':<28} {'before':>10} {'after':>10} {'speedup':>8}")
+    for result in results:
+        speedup = result["before"] / result["after"] if result["after"] > 0 else float("inf")
+        print(f"{result['label']:<28} {result['before'] * 1000:>8.2f}ms {result['after'] * 1000:>8.2f}ms {speedup:>7.1f}x")
+
+    table = index_bytes(conn, "search_logs")
+    print("\nDisk cost:")
+    for name, size in sizes.items():
+        share = f" ({size / table:.0%} of the table)" if table else ""
+        print(f"  {name}: {size / 1e6:.2f} MB{share}")
+    keys = existing_index_keys(conn)
+    for name, key in keys.items():
+        longer = [new for new in sizes if len(key) < len(keys[new]) and keys[new][:len(key)] == key]
+        if name not in sizes and longer:
+            print(f"  {name} is now redundant with {longer[0]}; dropping it saves space and insert time")
     conn.close()
+    return results, sizes
+
+def _best_of(fn, repeat=ADVISOR_REPEAT):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+def _insert_probe(conn, rows=1000):
+    """Insert rows through search_logs in a transaction that is rolled back."""
+    conn.execute("BEGIN")
+    conn.executemany("INSERT INTO search_logs (timestamp, user_id, search_query, response_time) VALUES (?, ?, ?, ?)",
+                     [("2000-01-01 00:00:00", f"probe_user_{i % 50}", f"probe query {i}", 0.1) for i in range(rows)])
+    conn.rollback()
+
+def compact_timings(conn, user):
+    """Times for the operations the compact schema changes: the fetch_data scan, a user filter and inserts."""
+    scan = scan_compact if is_compact(conn) else LogAggregates.scan
+    return {
+        "fetch_data scan": _best_of(lambda: scan(conn)),
+        "filter by user": _best_of(lambda: conn.execute(
+            "SELECT timestamp, user_id, search_query, response_time FROM search_logs WHERE user_id = ?", (user,)).fetchall()),
+        "insert 1000 rows": _best_of(lambda: _insert_probe(conn)),
+    }
+
+def compact_db(db_file, chunk_size=MIGRATION_CHUNK, vacuum=False):
+    """Migrate search_logs to the compact schema and report the size and speed difference."""
+    conn = sqlite3.connect(db_file)
+    if is_compact(conn):
+        print("search_logs already uses the compact schema.")
+        conn.close()
+        return None
+    if has_fts_index(conn):
+        print("The full-text index would not survive the migration; run optimize_db.py --drop-fts first.")
+        conn.close()
+        return None
+    row = conn.execute("SELECT user_id FROM search_logs ORDER BY id DESC LIMIT 1").fetchone()
+    user = row[0] if row else ""
+
+    size_before = log_storage_bytes(conn)
+    before = compact_timings(conn, user)
+
+    def progress(done, total):
+        print(f"  copied ids up to {done} of {total}")
+
+    print("Migrating search_logs to the compact schema...")
+    start = time.perf_counter()
+    copied = migrate_to_compact(conn, chunk=chunk_size, progress=progress)
+    print(f"Copied {copied} rows in {time.perf_counter() - start:.2f}s")
+    if vacuum:
+        print("Vacuuming...")
+        conn.execute("VACUUM")
+    conn.execute("ANALYZE")
+    conn.commit()
+
+    size_after = log_storage_bytes(conn)
+    after = compact_timings(conn, user)
+    conn.close()
+
+    if size_before and size_after:
+        print(f"\n{'storage':<18} {'before':>10} {'after':>10}")
+        for label, old, new in (("log rows", size_before[0], size_after[0]),
+                                ("indexes", size_before[1], size_after[1])):
+            print(f"{label:<18} {old / 1e6:>8.2f}MB {new / 1e6:>8.2f}MB")
+    if not vacuum:
+        print("Freed pages stay in the file until VACUUM (optimize_db.py --compact --vacuum).")
+    print(f"\n{'operation':<18} {'before':>10} {'after':>10} {'speedup':>8}")
+    for label in before:
+        speedup = before[label] / after[label] if after[label] > 0 else float("inf")
+        print(f"{label:<18} {before[label] * 1000:>8.2f}ms {after[label] * 1000:>8.2f}ms {speedup:>7.1f}x")
+    return {"rows": copied, "size_before": size_before, "size_after": size_after, "before": before, "after": after}
+
+def partition_db(db_file, directory, chunk_size=SPLIT_CHUNK):
+    """Split db_file into month partitions (utils/partitions.py) under directory."""
+    if list_partitions(directory):
+        print(f"{directory} already holds partitions; split into an empty directory.")
+        return None
+    print(f"Splitting {db_file} into month partitions under {directory}...")
+    start = time.perf_counter()
+    copied = split_database(db_file, directory, chunk=chunk_size,
+                            progress=lambda done: print(f"  copied {done} rows"))
+    elapsed = time.perf_counter() - start
+    rate = copied / elapsed if elapsed > 0 else 0
+    partitions = list_partitions(directory)
+    print(f"Copied {copied} rows into {len(partitions)} partitions in {elapsed:.2f}s ({rate:,.0f} rows/s)")
+    print(f"Point the tools at it with --db {directory}, or the service with LOG_PARTITION_DIR={directory}.")
+    return copied
 
 def main():
     parser = argparse.ArgumentParser(description="Add indexes to logs.db for query performance optimization")
     parser.add_argument("--db", default="logs.db", help="Path to the SQLite database")
     parser.add_argument("--benchmark", action="store_true", help="Run benchmark queries before and after")
+    parser.add_argument("--fts", action="store_true", help="Also build the FTS5 trigram index used by --query filters")
+    parser.add_argument("--drop-fts", action="store_true", help="Remove the FTS5 index and its triggers")
+    parser.add_argument("--rollups", action="store_true", help="Create/catch up the dashboard rollup tables and exit")
+    parser.add_argument("--rebuild-rollups", action="store_true", help="Rebuild the rollup tables from scratch and exit")
+    parser.add_argument("--advise", action="store_true",
+                        help="Propose indexes for the tools' queries from their plans, build them and report the gains")
+    parser.add_argument("--dry-run", action="store_true", help="With --advise, only print the proposals")
+    parser.add_argument("--compact", action="store_true",
+                        help="Migrate search_logs to the compact schema (integer timestamps, user/query dictionaries)")
+    parser.add_argument("--chunk-size", type=int, default=MIGRATION_CHUNK, help="Rows copied per transaction by --compact and --partition")
+    parser.add_argument("--vacuum", action="store_true", help="With --compact, VACUUM afterwards to shrink the file")
+    parser.add_argument("--partition", metavar="DIR",
+                        help="Copy the database into one file per month under DIR (the original is left in place)")
     args = parser.parse_args()
 
+    if args.partition:
+        partition_db(args.db, args.partition, chunk_size=args.chunk_size)
+        return
+
+    if args.compact:
+        compact_db(args.db, chunk_size=args.chunk_size, vacuum=args.vacuum)
+        return
+
+    if args.advise:
+        advise_indexes(args.db, apply=not args.dry_run)
+        return
+
+    if args.drop_fts:
+        drop_fts_index(args.db)
+        return
+
+    if args.rollups or args.rebuild_rollups:
+        update_rollups(args.db, rebuild=args.rebuild_rollups)
+        return
+
     if args.benchmark:
         print("\nBEFORE INDEXES:")
         benchmark_query(args.db)
 
     add_indexes(args.db)
+    if args.fts:
+        add_fts_index(args.db)
 
     if args.benchmark:
         print("\nAFTER INDEXES:")
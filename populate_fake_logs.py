@@ -1,10 +1,16 @@
 import sqlite3
-from datetime import datetime, timedelta
+import argparse
+import csv
+import gzip
+import json
+import math
 import random
-
-# Connect to your logs database
-conn = sqlite3.connect("logs.db")
-cursor = conn.cursor()
+import time
+from datetime import datetime, timedelta
+from functools import lru_cache
+from itertools import accumulate, islice
+from utils.db_utils import init_schema
+from utils.partitions import PartitionWriter, is_partitioned
 
 # List of fake users and queries
 users = ["test_user_1", "test_user_2", "test_user_3"]
@@ -16,21 +22,210 @@ queries = [
     "visualize sqlite data"
 ]
 
-# Generate 20 fake logs
-for _ in range(20):
-    user_id = random.choice(users)
-    search_query = random.choice(queries)
-    response_time = round(random.uniform(0.1, 1.0), 3)
+# Popularity of the k-th most popular user/query is proportional to 1 / k**ZIPF_S.
+ZIPF_S = 1.1
+
+# Traffic shape: a daily cosine peaking at PEAK_HOUR, and quieter weekends.
+PEAK_HOUR = 14
+DIURNAL_AMPLITUDE = 0.8
+WEEKEND_FACTOR = 0.6
+
+# Response times are log-normal around MEDIAN_RT seconds; SLOW_FRACTION of
+# requests are additionally SLOW_MIN..SLOW_MAX times slower.
+MEDIAN_RT = 0.25
+RT_SIGMA = 0.5
+SLOW_FRACTION = 0.01
+SLOW_MIN = 5
+SLOW_MAX = 40
+
+# Rows produced per batch of random draws, and per transaction when inserting.
+BATCH_ROWS = 10000
+
+# "MM:SS" suffixes appended to the cached "YYYY-MM-DD HH:" prefix of each hour.
+MINUTE_SECONDS = [f"{m:02d}:{s:02d}" for m in range(60) for s in range(60)]
+
+# Fixed vocabulary for synthetic query text, so query N reads the same for every seed.
+_vocab_rng = random.Random(0)
+VOCABULARY = sorted({"".join(_vocab_rng.choice("bcdfghjklmnprstvwz") + _vocab_rng.choice("aeiou")
+                             for _ in range(_vocab_rng.randint(2, 4))) for _ in range(3000)})
+
+user_name = "user_{}".format
+
+@lru_cache(maxsize=262144)
+def query_text(rank):
+    """Distinct two-or-more word query text for a popularity rank."""
+    size = len(VOCABULARY)
+    first, rest = rank % size, rank // size
+    # The second word mixes in the first so popular queries don't share a word.
+    words = [VOCABULARY[first], VOCABULARY[(rest + first * 7 + 1) % size]]
+    rest //= size
+    while rest:
+        rest, digit = divmod(rest, size)
+        words.append(VOCABULARY[digit])
+    return " ".join(words)
+
+def zipf_cum_weights(n, s=ZIPF_S):
+    return list(accumulate(k ** -s for k in range(1, n + 1)))
+
+def hour_slots(days, end):
+    """Timestamp prefixes of every hour in the `days` days before end, with their traffic weights."""
+    last = end.replace(minute=0, second=0, microsecond=0)
+    first = last - timedelta(hours=days * 24)
+    prefixes, weights = [], []
+    for i in range(days * 24):
+        hour = first + timedelta(hours=i)
+        diurnal = 1 + DIURNAL_AMPLITUDE * math.cos(2 * math.pi * (hour.hour - PEAK_HOUR) / 24)
+        weekly = WEEKEND_FACTOR if hour.weekday() >= 5 else 1.0
+        prefixes.append(hour.strftime("%Y-%m-%d %H:"))
+        weights.append(diurnal * weekly)
+    return prefixes, weights
+
+def slot_counts(count, weights, rng):
+    """Split count rows across the hour slots in proportion to their weights."""
+    total = sum(weights)
+    counts = [int(count * w / total) for w in weights]
+    remainder = count - sum(counts)
+    for slot in rng.choices(range(len(weights)), weights=weights, k=remainder):
+        counts[slot] += 1
+    return counts
+
+def generate_logs(count, seed=None, user_pool=None, query_pool=None, num_users=None, num_queries=None,
+                  days=7, end=None, zipf_s=ZIPF_S, slow_fraction=SLOW_FRACTION):
+    """Yield (timestamp, user_id, search_query, response_time) rows in timestamp order.
+
+    Users and queries come from the given pools, or are synthesized for
+    num_users/num_queries, with Zipf popularity. Output is deterministic for
+    a given seed and end.
+    """
+    rng = random.Random(seed)
+    end = end or datetime.now()
+
+    if num_users:
+        user_population, user_label = range(num_users), user_name
+    else:
+        user_population, user_label = user_pool or users, None
+    if num_queries:
+        query_population, query_label = range(num_queries), query_text
+    else:
+        query_population, query_label = query_pool or queries, None
+    user_weights = zipf_cum_weights(len(user_population), zipf_s)
+    query_weights = zipf_cum_weights(len(query_population), zipf_s)
+
+    prefixes, weights = hour_slots(days, end)
+    mu = math.log(MEDIAN_RT)
+    choices, gauss, uniform, chance, exp = rng.choices, rng.gauss, rng.uniform, rng.random, math.exp
+
+    for prefix, slot_rows in zip(prefixes, slot_counts(count, weights, rng)):
+        for start in range(0, slot_rows, BATCH_ROWS):
+            n = min(BATCH_ROWS, slot_rows - start)
+            user_ids = choices(user_population, cum_weights=user_weights, k=n)
+            if user_label:
+                user_ids = list(map(user_label, user_ids))
+            search_queries = choices(query_population, cum_weights=query_weights, k=n)
+            if query_label:
+                search_queries = list(map(query_label, search_queries))
+            seconds = sorted(choices(MINUTE_SECONDS, k=n))
+            response_times = [
+                round(exp(mu + RT_SIGMA * gauss()) * (uniform(SLOW_MIN, SLOW_MAX) if chance() < slow_fraction else 1), 3)
+                for _ in range(n)
+            ]
+            yield from zip([prefix + s for s in seconds], user_ids, search_queries, response_times)
+
+def insert_logs(db_path, rows, chunk_size=BATCH_ROWS):
+    """Insert rows into search_logs in chunked transactions; returns the number inserted.
+
+    db_path may be a partition directory, in which case rows are routed to their month.
+    """
+    if is_partitioned(db_path):
+        writer = PartitionWriter(db_path)
+        inserted = 0
+        rows = iter(rows)
+        while True:
+            chunk = list(islice(rows, chunk_size))
+            if not chunk:
+                break
+            inserted += writer.insert(chunk)
+        writer.close()
+        return inserted
+
+    conn = sqlite3.connect(db_path)
+    init_schema(conn)
+    inserted = 0
+    rows = iter(rows)
+    while True:
+        chunk = list(islice(rows, chunk_size))
+        if not chunk:
+            break
+        with conn:
+            conn.executemany("""
+                INSERT INTO search_logs (timestamp, user_id, search_query, response_time)
+                VALUES (?, ?, ?, ?)
+            """, chunk)
+        inserted += len(chunk)
+    conn.close()
+    return inserted
+
+def open_output(path):
+    if path.endswith(".gz"):
+        return gzip.open(path, "wt", compresslevel=6, newline="", encoding="utf-8")
+    return open(path, "w", newline="", encoding="utf-8")
+
+def write_csv(path, rows):
+    """Write rows as a CSV file that import_logs.py can load; returns the number written."""
+    written = 0
+    with open_output(path) as f:
+        writer = csv.writer(f)
+        writer.writerow(["timestamp", "user_id", "search_query", "response_time"])
+        rows = iter(rows)
+        while chunk := list(islice(rows, BATCH_ROWS)):
+            writer.writerows(chunk)
+            written += len(chunk)
+    return written
+
+def write_ndjson(path, rows):
+    """Write rows as newline-delimited JSON objects; returns the number written."""
+    encode = json.JSONEncoder().encode
+    written = 0
+    with open_output(path) as f:
+        rows = iter(rows)
+        while chunk := list(islice(rows, BATCH_ROWS)):
+            # Timestamps and numbers never need escaping, so only the strings go through the encoder.
+            f.writelines(f'{{"timestamp": "{timestamp}", "user_id": {encode(user_id)}, '
+                         f'"search_query": {encode(search_query)}, "response_time": {response_time}}}\n'
+                         for timestamp, user_id, search_query, response_time in chunk)
+            written += len(chunk)
+    return written
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate synthetic search logs into logs.db or a CSV/NDJSON file")
+    parser.add_argument("--db", default="logs.db", help="Path to SQLite database, or an existing partition directory")
+    parser.add_argument("--csv", help="Write a CSV file (.csv or .csv.gz) instead of the database")
+    parser.add_argument("--ndjson", help="Write an NDJSON file (.ndjson or .ndjson.gz) instead of the database")
+    parser.add_argument("--count", type=int, default=20, help="Number of fake logs to generate")
+    parser.add_argument("--seed", type=int, help="Random seed for reproducible data")
+    parser.add_argument("--users", type=int, help="Number of distinct users (default: 3 test users)")
+    parser.add_argument("--queries", type=int, help="Number of distinct queries (default: 5 sample queries)")
+    parser.add_argument("--days", type=int, default=7, help="Length of the time window in days")
+    parser.add_argument("--end", help="End of the time window, YYYY-MM-DD (default: now)")
+    parser.add_argument("--zipf", type=float, default=ZIPF_S, help="Zipf exponent for user/query popularity")
+    parser.add_argument("--slow-fraction", type=float, default=SLOW_FRACTION, help="Share of slow-tail requests")
+    args = parser.parse_args()
 
-    # Random timestamp in the last 7 days
-    timestamp = datetime.now() - timedelta(days=random.randint(0, 6), hours=random.randint(0, 23))
-    timestamp_str = timestamp.strftime("%Y-%m-%d %H:%M:%S")
+    end = datetime.strptime(args.end, "%Y-%m-%d") if args.end else None
+    rows = generate_logs(args.count, seed=args.seed, num_users=args.users, num_queries=args.queries,
+                         days=args.days, end=end, zipf_s=args.zipf, slow_fraction=args.slow_fraction)
 
-    cursor.execute("""
-        INSERT INTO search_logs (timestamp, user_id, search_query, response_time)
-        VALUES (?, ?, ?, ?)
-    """, (timestamp_str, user_id, search_query, response_time))
+    start = time.perf_counter()
+    if args.csv:
+        target, written = args.csv, write_csv(args.csv, rows)
+    elif args.ndjson:
+        target, written = args.ndjson, write_ndjson(args.ndjson, rows)
+    else:
+        target, written = args.db, insert_logs(args.db, rows)
+    elapsed = time.perf_counter() - start
+    rate = written / elapsed if elapsed > 0 else 0
+    verb = "Wrote" if args.csv or args.ndjson else "Inserted"
+    print(f"{verb} {written} fake log entries into {target} ({rate:,.0f} rows/s).")
 
-conn.commit()
-conn.close()
-print("Inserted 20 fake log entries into logs.db.")
\ No newline at end of file
+if __name__ == "__main__":
+    main()
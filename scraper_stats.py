@@ -1,16 +1,28 @@
+import argparse
 import time
 import json
+import threading
+from collections import deque
+from html.parser import HTMLParser
 from urllib.parse import urljoin, urlparse
-from selenium import webdriver
-from selenium.webdriver.chrome.options import Options
-from selenium.webdriver.chrome.service import Service
-from selenium.webdriver.common.by import By
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
-from bs4 import BeautifulSoup
+
+# selenium, bs4 and urllib.request are imported inside the functions that
+# use them, so importing this module (or running --help) stays fast.
+
+# Concurrent crawl defaults: pages in flight at once, and per host at most
+# PER_HOST_LIMIT requests with at least HOST_DELAY seconds between starts.
+CRAWL_WORKERS = 4
+PER_HOST_LIMIT = 2
+HOST_DELAY = 0.0
+FETCH_TIMEOUT = 10
+USER_AGENT = "SearchRPI-Evaluation-crawler"
 
 # Setup for headless crawling
 def create_driver():
+    from selenium import webdriver
+    from selenium.webdriver.chrome.options import Options
+    from selenium.webdriver.chrome.service import Service
+
     options = Options()
     options.add_argument("--headless")
     options.add_argument("--disable-gpu")
@@ -19,6 +31,10 @@ def create_driver():
     return webdriver.Chrome(service=Service("/opt/homebrew/bin/chromedriver"), options=options)
 
 def fetch_page_with_metrics(url, driver):
+    from selenium.webdriver.common.by import By
+    from selenium.webdriver.support.ui import WebDriverWait
+    from selenium.webdriver.support import expected_conditions as EC
+
     try:
         start_time = time.time()
         driver.get(url)
@@ -30,6 +46,8 @@ def fetch_page_with_metrics(url, driver):
         return None, None
 
 def extract_links(html, base_url):
+    from bs4 import BeautifulSoup
+
     soup = BeautifulSoup(html, "html.parser")
     links = set()
     for tag in soup.find_all("a", href=True):
@@ -38,55 +56,209 @@ def extract_links(html, base_url):
         links.add(full_url)
     return links
 
+class LinkExtractor(HTMLParser):
+    """Collects the href of every <a> tag; the standard-library stand-in for BeautifulSoup."""
+
+    def __init__(self):
+        super().__init__()
+        self.hrefs = []
+
+    def handle_starttag(self, tag, attrs):
+        if tag == "a":
+            for name, value in attrs:
+                if name == "href" and value is not None:
+                    self.hrefs.append(value)
+
+def extract_links_fast(html, base_url):
+    parser = LinkExtractor()
+    parser.feed(html)
+    parser.close()
+    return {urljoin(base_url, href) for href in parser.hrefs}
+
+def fetch_page_http(url, timeout=FETCH_TIMEOUT):
+    """Fetch a page without a browser; for sites that don't need JavaScript to render links."""
+    from urllib.request import Request, urlopen
+
+    try:
+        start_time = time.time()
+        with urlopen(Request(url, headers={"User-Agent": USER_AGENT}), timeout=timeout) as response:
+            body = response.read()
+            charset = response.headers.get_content_charset() or "utf-8"
+        elapsed_time = time.time() - start_time
+        return body.decode(charset, errors="replace"), elapsed_time
+    except Exception as e:
+        return None, None
+
+def page_stats(url, html, load_time, whitelist_domain, links):
+    """The per-page stats record and the internal links to follow."""
+    if not html:
+        return {"url": url, "status": "failed"}, []
+
+    internal_links = [link for link in links if urlparse(link).netloc.endswith(whitelist_domain)]
+    return {
+        "url": url,
+        "load_time": round(load_time, 3),
+        "content_size_bytes": len(html.encode('utf-8')),
+        "total_links": len(links),
+        "internal_links": len(internal_links),
+        "external_links": len(links) - len(internal_links)
+    }, internal_links
+
 def crawl_with_metrics(start_url, whitelist_domain, max_pages=10):
-    to_visit = [start_url]
-    visited = set()
+    # The frontier is a deque and `seen` holds every URL ever queued, so
+    # taking the next page and checking a link are both O(1).
+    to_visit = deque([start_url])
+    seen = {start_url}
+    visited = 0
     stats = []
 
     driver = create_driver()
 
-    while to_visit and len(visited) < max_pages:
-        url = to_visit.pop(0)
-        if url in visited:
-            continue
-        visited.add(url)
+    while to_visit and visited < max_pages:
+        url = to_visit.popleft()
+        visited += 1
 
         html, load_time = fetch_page_with_metrics(url, driver)
-        if not html:
-            stats.append({"url": url, "status": "failed"})
-            continue
-
-        content_size = len(html.encode('utf-8'))
-        links = extract_links(html, url)
-        internal_links = [link for link in links if urlparse(link).netloc.endswith(whitelist_domain)]
-
-        stats.append({
-            "url": url,
-            "load_time": round(load_time, 3),
-            "content_size_bytes": content_size,
-            "total_links": len(links),
-            "internal_links": len(internal_links),
-            "external_links": len(links) - len(internal_links)
-        })
+        record, internal_links = page_stats(url, html, load_time, whitelist_domain,
+                                            extract_links(html, url) if html else set())
+        stats.append(record)
 
         for link in internal_links:
-            if link not in visited and link not in to_visit:
+            if link not in seen:
+                seen.add(link)
                 to_visit.append(link)
 
     driver.quit()
     return stats
 
+class HostPoliteness:
+    """Per-host limits shared by the crawl workers.
+
+    At most ``max_per_host`` requests to one host are in flight at a time,
+    and consecutive requests to a host start at least ``delay`` seconds
+    apart, however many workers there are.
+    """
+
+    def __init__(self, max_per_host=PER_HOST_LIMIT, delay=HOST_DELAY):
+        self.max_per_host = max_per_host
+        self.delay = delay
+        self._lock = threading.Lock()
+        self._slots = {}
+        self._next_start = {}
+
+    def acquire(self, host):
+        with self._lock:
+            slot = self._slots.get(host)
+            if slot is None:
+                slot = self._slots[host] = threading.BoundedSemaphore(self.max_per_host)
+        slot.acquire()
+        if self.delay:
+            with self._lock:
+                now = time.monotonic()
+                start = max(now, self._next_start.get(host, now))
+                self._next_start[host] = start + self.delay
+            time.sleep(start - now)
+
+    def release(self, host):
+        self._slots[host].release()
+
+class DriverPool:
+    """One Selenium driver per crawl worker thread, created on first use."""
+
+    def __init__(self):
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._drivers = []
+
+    def fetch(self, url):
+        driver = getattr(self._local, "driver", None)
+        if driver is None:
+            driver = self._local.driver = create_driver()
+            with self._lock:
+                self._drivers.append(driver)
+        return fetch_page_with_metrics(url, driver)
+
+    def close(self):
+        for driver in self._drivers:
+            driver.quit()
+        self._drivers.clear()
+
+def crawl_concurrent(start_url, whitelist_domain, max_pages=10, workers=CRAWL_WORKERS, fetcher="http",
+                     max_per_host=PER_HOST_LIMIT, delay=HOST_DELAY):
+    """Crawl like crawl_with_metrics, with up to ``workers`` pages in flight.
+
+    ``fetcher`` is "http" (urllib, no JavaScript) or "selenium" (a pool of
+    one headless driver per worker). Requests to each host are limited by
+    HostPoliteness. Returns the same per-page stats records, in the order
+    the pages were taken from the frontier.
+    """
+    from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+    drivers = DriverPool() if fetcher == "selenium" else None
+    fetch = drivers.fetch if drivers else fetch_page_http
+    politeness = HostPoliteness(max_per_host, delay)
+
+    def visit(url):
+        host = urlparse(url).netloc
+        politeness.acquire(host)
+        try:
+            html, load_time = fetch(url)
+        finally:
+            politeness.release(host)
+        return page_stats(url, html, load_time, whitelist_domain, extract_links_fast(html, url) if html else set())
+
+    to_visit = deque([start_url])
+    seen = {start_url}
+    stats = []
+    pending = {}
+
+    try:
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            while to_visit or pending:
+                while to_visit and len(pending) < workers and len(stats) < max_pages:
+                    url = to_visit.popleft()
+                    pending[pool.submit(visit, url)] = len(stats)
+                    stats.append(None)
+                if not pending:
+                    break
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    record, internal_links = future.result()
+                    stats[pending.pop(future)] = record
+                    for link in internal_links:
+                        if link not in seen:
+                            seen.add(link)
+                            to_visit.append(link)
+    finally:
+        if drivers:
+            drivers.close()
+    return stats
+
 def main():
-    start_url = "https://projecteuler.net/about"
-    whitelist_domain = "projecteuler.net"
+    parser = argparse.ArgumentParser(description="Crawl a site and record per-page load metrics")
+    parser.add_argument("--start-url", default="https://projecteuler.net/about", help="Page to start crawling from")
+    parser.add_argument("--domain", default="projecteuler.net", help="Only follow links to hosts ending in this")
+    parser.add_argument("--max-pages", type=int, default=10, help="Stop after visiting this many pages")
+    parser.add_argument("--workers", type=int, default=1,
+                        help=f"Pages fetched concurrently; above 1 uses the concurrent crawler (try {CRAWL_WORKERS})")
+    parser.add_argument("--fetcher", choices=["selenium", "http"], default="selenium",
+                        help="Headless Chrome, or plain HTTP for pages that don't need JavaScript")
+    parser.add_argument("--per-host", type=int, default=PER_HOST_LIMIT, help="Concurrent requests allowed per host")
+    parser.add_argument("--delay", type=float, default=HOST_DELAY, help="Seconds between request starts per host")
+    parser.add_argument("--output", default="scraper_stats.json", help="Where to save the per-page stats")
+    args = parser.parse_args()
 
-    print(f"\n🕸️ Starting scraper evaluation on {start_url}...\n")
-    results = crawl_with_metrics(start_url, whitelist_domain)
+    print(f"\n🕸️ Starting scraper evaluation on {args.start_url}...\n")
+    if args.workers > 1 or args.fetcher == "http":
+        results = crawl_concurrent(args.start_url, args.domain, args.max_pages, workers=args.workers,
+                                   fetcher=args.fetcher, max_per_host=args.per_host, delay=args.delay)
+    else:
+        results = crawl_with_metrics(args.start_url, args.domain, args.max_pages)
 
-    with open("scraper_stats.json", "w", encoding="utf-8") as f:
+    with open(args.output, "w", encoding="utf-8") as f:
         json.dump(results, f, indent=2)
 
-    print("Evaluation complete. Results saved to scraper_stats.json")
+    print(f"Evaluation complete. Results saved to {args.output}")
 
 if __name__ == "__main__":
     main()
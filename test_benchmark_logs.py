@@ -0,0 +1,98 @@
+import unittest
+import contextlib
+import io
+import json
+import os
+import sqlite3
+import tempfile
+import benchmark_logs
+from collections import Counter
+from datetime import datetime
+from import_logs import import_from_csv
+from populate_fake_logs import generate_logs, write_csv, write_ndjson
+
+class TestBenchmarkSuite(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.data_dir = self.tmp.name
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_generator_is_deterministic(self):
+        end = benchmark_logs.DATASET_END
+        first = list(generate_logs(200, seed=7, end=end))
+        self.assertEqual(first, list(generate_logs(200, seed=7, end=end)))
+        self.assertNotEqual(first, list(generate_logs(200, seed=8, end=end)))
+
+    def test_generator_shape(self):
+        rows = list(generate_logs(20000, seed=3, num_users=5000, num_queries=5000, days=14, end=datetime(2024, 1, 1)))
+        self.assertEqual(len(rows), 20000)
+        timestamps = [row[0] for row in rows]
+        self.assertEqual(timestamps, sorted(timestamps))
+        self.assertTrue("2023-12-18 00:00:00" <= timestamps[0] and timestamps[-1] < "2024-01-01 00:00:00")
+
+        # Zipf: the most popular user dwarfs the median one.
+        users = Counter(row[1] for row in rows).most_common()
+        self.assertEqual(users[0][0], "user_0")
+        self.assertGreater(users[0][1], 20 * users[len(users) // 2][1])
+        # Afternoon peak versus the small hours.
+        hours = Counter(row[0][11:13] for row in rows)
+        self.assertGreater(hours["14"], 3 * hours["03"])
+        # Log-normal with a slow tail.
+        times = sorted(row[3] for row in rows)
+        self.assertTrue(0.15 < times[len(times) // 2] < 0.4)
+        self.assertGreater(times[-1], 2.0)
+
+    def test_file_outputs_import(self):
+        rows = list(generate_logs(500, seed=2, num_users=50, num_queries=50, end=datetime(2024, 1, 1)))
+        for name, writer in (("gen.csv.gz", write_csv), ("gen.ndjson", write_ndjson)):
+            path = os.path.join(self.data_dir, name)
+            db = os.path.join(self.data_dir, name + ".db")
+            self.assertEqual(writer(path, rows), 500)
+            with contextlib.redirect_stdout(io.StringIO()):
+                self.assertEqual(import_from_csv(path, db), 500)
+            conn = sqlite3.connect(db)
+            imported = conn.execute("SELECT timestamp, user_id, search_query, response_time FROM search_logs ORDER BY id").fetchall()
+            conn.close()
+            self.assertEqual(imported, rows)
+
+    def test_dataset_is_cached_and_reproducible(self):
+        with contextlib.redirect_stdout(io.StringIO()):
+            path = benchmark_logs.build_dataset(300, seed=1, data_dir=self.data_dir)
+            self.assertEqual(path, benchmark_logs.build_dataset(300, seed=1, data_dir=self.data_dir))
+
+        conn = sqlite3.connect(path)
+        rows = conn.execute("SELECT timestamp, user_id, search_query, response_time FROM search_logs ORDER BY id").fetchall()
+        conn.close()
+        self.assertEqual(rows, list(benchmark_logs.dataset_rows(300, seed=1)))
+
+    def test_run_suite_writes_results(self):
+        with contextlib.redirect_stdout(io.StringIO()):
+            report = benchmark_logs.run_suite(500, seed=0, warmup=0, repeat=2, data_dir=self.data_dir)
+            path = benchmark_logs.save_results(report, os.path.join(self.data_dir, "results.json"))
+
+        expected = {"ingest", "filter_user", "filter_query", "filter_day", "aggregate", "report", "export", "flag_match"}
+        self.assertEqual(set(report["results"]), expected)
+        for result in report["results"].values():
+            self.assertEqual(len(result["samples"]), 2)
+            self.assertLessEqual(result["min"], result["p50"])
+            self.assertLessEqual(result["p95"], result["max"])
+        with open(path, encoding="utf-8") as f:
+            self.assertEqual(json.load(f)["rows"], 500)
+
+    def test_compare_flags_regressions(self):
+        baseline = {"results": {"fast": {"p50": 0.100}, "noisy": {"p50": 0.0001}, "steady": {"p50": 0.050}}}
+        current = {"results": {"fast": {"p50": 0.150}, "noisy": {"p50": 0.0005}, "steady": {"p50": 0.051}}}
+        regressed = {row[0] for row in benchmark_logs.compare_results(baseline, current) if row[4]}
+        # "noisy" is 5x slower but within the absolute noise floor.
+        self.assertEqual(regressed, {"fast"})
+
+    def test_percentile_interpolates(self):
+        self.assertEqual(benchmark_logs.percentile([4, 1, 3, 2], 50), 2.5)
+        self.assertEqual(benchmark_logs.percentile([1, 2, 3, 4, 5], 100), 5)
+        self.assertEqual(benchmark_logs.percentile([2.0], 95), 2.0)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,102 @@
+import unittest
+import contextlib
+import io
+import os
+import tempfile
+from datetime import datetime
+import flag_manager
+from log_filter import export_logs_to_csv, filter_logs, log_batches
+from populate_fake_logs import generate_logs, insert_logs
+from utils.columnar import GrowingDictionary, columnar_format, write_columnar
+
+try:
+    import pyarrow
+    import pyarrow.ipc
+    import pyarrow.parquet
+    HAS_PYARROW = True
+except ImportError:
+    HAS_PYARROW = False
+
+def read_rows(path):
+    if columnar_format(path) == "parquet":
+        table = pyarrow.parquet.read_table(path)
+    else:
+        with pyarrow.ipc.open_file(path) as reader:
+            table = reader.read_all()
+    return list(zip(*(table.column(name).to_pylist() for name in table.column_names))), table.schema
+
+@unittest.skipUnless(HAS_PYARROW, "pyarrow is not installed")
+class TestColumnarExport(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.db = os.path.join(self.tmp.name, "logs.db")
+        rows = list(generate_logs(5000, seed=3, num_users=50, num_queries=200, days=30, end=datetime(2024, 3, 1)))
+        rows.append(("2024-02-10 08:00:00", "user_odd", "odd query", None))
+        insert_logs(self.db, rows)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def path(self, name):
+        return os.path.join(self.tmp.name, name)
+
+    def test_round_trip_in_row_groups(self):
+        filters = {"start": "2024-02-05", "end": "2024-02-20 23:59:59"}
+        expected = filter_logs(self.db, **filters)
+        for name in ("logs.parquet", "logs.arrow"):
+            count = write_columnar(log_batches(self.db, arraysize=300, **filters), self.path(name), chunk_size=700)
+            self.assertEqual(count, len(expected))
+            rows, schema = read_rows(self.path(name))
+            self.assertEqual(rows, expected, name)
+            self.assertTrue(pyarrow.types.is_dictionary(schema.field("user_id").type))
+            self.assertTrue(pyarrow.types.is_dictionary(schema.field("search_query").type))
+
+        metadata = pyarrow.parquet.ParquetFile(self.path("logs.parquet")).metadata
+        self.assertEqual(metadata.num_row_groups, -(-len(expected) // 700))
+        with pyarrow.ipc.open_file(self.path("logs.arrow")) as reader:
+            self.assertEqual(reader.num_record_batches, -(-len(expected) // 700))
+
+    def test_dictionary_grows_by_batch(self):
+        converted = []
+
+        class RecordingArrow:
+            # pyarrow, noting how many values each pa.array call converts.
+            def __getattr__(self, name):
+                return getattr(pyarrow, name)
+
+            def array(self, values, type=None):
+                converted.append(len(values))
+                return pyarrow.array(values, type=type)
+
+        dictionary = GrowingDictionary(RecordingArrow())
+        for batch in range(50):
+            column = [f"query {batch * 100 + i}" for i in range(100)] + ["query 0", None]
+            encoded = dictionary.encode(column)
+            self.assertEqual(encoded.to_pylist(), column)
+        self.assertEqual(len(dictionary.dictionary), 5000)
+        # Only a batch's own values (indices and new strings) are converted, never the whole dictionary.
+        self.assertLessEqual(max(converted), 102)
+
+    def test_smaller_than_csv(self):
+        with contextlib.redirect_stdout(io.StringIO()):
+            export_logs_to_csv(filter_logs(self.db), self.path("logs.csv"))
+        csv_size = os.path.getsize(self.path("logs.csv"))
+        for name in ("logs.parquet", "logs.arrow"):
+            write_columnar(log_batches(self.db), self.path(name))
+            self.assertLess(os.path.getsize(self.path(name)), csv_size / 2, name)
+
+    def test_flag_manager_only_flagged(self):
+        matcher = flag_manager.build_matcher("odd")
+        expected, _ = flag_manager.filter_logs(self.db, flagged="odd", only_flagged=True)
+        self.assertTrue(expected)
+        batches = flag_manager.log_batches(self.db, matcher=matcher, only_flagged=True, arraysize=100)
+        write_columnar(batches, self.path("flagged.parquet"))
+        self.assertEqual(read_rows(self.path("flagged.parquet"))[0], expected)
+
+    def test_unknown_format(self):
+        with self.assertRaises(ValueError):
+            write_columnar([], self.path("logs.txt"))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,109 @@
+import unittest
+import contextlib
+import io
+import os
+import sqlite3
+import tempfile
+from datetime import datetime
+from log_reporter import compute_full_report, read_report, reports_match, update_report_state
+from optimize_db import compact_db
+from populate_fake_logs import generate_logs, insert_logs
+from utils.compact import is_compact, migrate_to_compact, scan_compact
+from utils.db_utils import fetch_data, init_schema
+from utils.rollups import create_rollups
+
+def summary(data):
+    """fetch_data's five breakdowns as dicts (order and float rounding aside) plus the total."""
+    rounded = lambda value: round(value, 9) if isinstance(value, float) else value
+    return [{key: rounded(value) for key, value in part} for part in list(data)[:5]] + [data.total_logs]
+
+COLUMNS = "SELECT id, timestamp, user_id, search_query, response_time FROM search_logs ORDER BY id"
+
+class TestCompactSchema(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.db = os.path.join(self.tmp.name, "compact.db")
+        insert_logs(self.db, generate_logs(2000, seed=6, num_users=80, num_queries=200, days=10, end=datetime(2024, 1, 1)))
+        self.conn = sqlite3.connect(self.db)
+        # Timestamps the integer column cannot reproduce exactly stay as text.
+        self.conn.executemany("INSERT INTO search_logs (timestamp, user_id, search_query, response_time) VALUES (?, ?, ?, ?)", [
+            ("not a date", "user_odd", "odd query", None),
+            ("2024-01-02T03:04:05", "user_odd", "odd query", 0.5),
+            ("2024-01-02 03:04:05.123", "user_0", "odd query", 0.25),
+        ])
+        self.conn.commit()
+
+    def tearDown(self):
+        self.conn.close()
+        self.tmp.cleanup()
+
+    def migrate(self, chunk=500):
+        return migrate_to_compact(self.conn, chunk=chunk)
+
+    def test_view_returns_original_rows(self):
+        before = self.conn.execute(COLUMNS).fetchall()
+        expected = summary(fetch_data(self.db))
+        self.assertEqual(self.migrate(), len(before))
+        self.assertTrue(is_compact(self.conn))
+        self.assertEqual(self.conn.execute(COLUMNS).fetchall(), before)
+        self.assertEqual(summary(fetch_data(self.db)), expected)
+        self.assertEqual(summary(scan_compact(self.conn)), expected)
+        # Migrating again and init_schema are both no-ops.
+        self.assertEqual(self.migrate(), 0)
+        init_schema(self.conn)
+        self.assertTrue(is_compact(self.conn))
+
+    def test_writes_through_view(self):
+        self.migrate()
+        last = self.conn.execute("SELECT MAX(id) FROM search_logs").fetchone()[0]
+        self.conn.execute("INSERT INTO search_logs (user_id, search_query, response_time) VALUES ('new_user', 'new query', 0.1)")
+        row = self.conn.execute("SELECT id, timestamp, user_id FROM search_logs WHERE user_id = 'new_user'").fetchone()
+        self.assertEqual(row[0], last + 1)
+        self.assertRegex(row[1], r"^\d{4}-\d\d-\d\d \d\d:\d\d:\d\d$")
+
+        self.conn.execute("UPDATE search_logs SET search_query = 'renamed', timestamp = 'later' WHERE id = ?", (row[0],))
+        self.assertEqual(self.conn.execute("SELECT timestamp, search_query FROM search_logs WHERE id = ?", (row[0],)).fetchone(),
+                         ("later", "renamed"))
+        self.conn.execute("DELETE FROM search_logs WHERE user_id = 'user_odd'")
+        self.conn.commit()
+        self.assertEqual(self.conn.execute("SELECT COUNT(*) FROM search_logs WHERE user_id = 'user_odd'").fetchone()[0], 0)
+
+        insert_logs(self.db, [("2024-02-01 00:00:00", "bulk_user", "bulk query", 0.3)] * 3)
+        self.assertEqual(self.conn.execute("SELECT COUNT(*) FROM search_logs WHERE user_id = 'bulk_user'").fetchone()[0], 3)
+
+    def test_rollups_and_report_state_follow_the_migration(self):
+        create_rollups(self.conn)
+        update_report_state(self.conn)
+        self.migrate()
+
+        insert_logs(self.db, list(generate_logs(100, seed=9, num_users=10, num_queries=10, end=datetime(2024, 2, 1))))
+        self.conn.execute("DELETE FROM search_logs WHERE id <= 10")
+        self.conn.commit()
+
+        update_report_state(self.conn)
+        self.assertTrue(reports_match(read_report(self.conn), compute_full_report(self.conn)))
+        self.assertEqual(summary(fetch_data(self.db)), summary(scan_compact(self.conn)))
+
+    def test_changes_during_copy_are_mirrored(self):
+        # Simulate a run that stopped after copying part of the table.
+        def interrupt(done, total):
+            raise KeyboardInterrupt
+        with self.assertRaises(KeyboardInterrupt):
+            migrate_to_compact(self.conn, chunk=500, progress=interrupt)
+        self.conn.execute("UPDATE search_logs SET response_time = 9.5 WHERE id = 1")
+        self.conn.execute("DELETE FROM search_logs WHERE id = 2")
+        self.conn.commit()
+        before = self.conn.execute(COLUMNS).fetchall()
+        self.migrate()
+        self.assertEqual(self.conn.execute(COLUMNS).fetchall(), before)
+
+    def test_compact_db_refuses_with_fts(self):
+        self.conn.execute("CREATE VIRTUAL TABLE search_logs_fts USING fts5(search_query, content='search_logs', content_rowid='id')")
+        self.conn.commit()
+        with contextlib.redirect_stdout(io.StringIO()):
+            self.assertIsNone(compact_db(self.db))
+        self.assertFalse(is_compact(self.conn))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,22 @@
+import unittest
+import contextlib
+import csv
+import io
+import os
+import tempfile
+from unittest import mock
+from utils import export_utils
+
+class TestExportUtils(unittest.TestCase):
+
+    def test_export_creates_missing_directory(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            directory = os.path.join(tmp, "fresh", "exports")
+            with mock.patch.object(export_utils, "EXPORT_DIR", directory), \
+                    contextlib.redirect_stdout(io.StringIO()):
+                export_utils.export_to_csv([("user_1", 3), ("user_2", 1)], "out.csv")
+            with open(os.path.join(directory, "out.csv"), newline="", encoding="utf-8") as f:
+                self.assertEqual(list(csv.reader(f)), [["Label", "Value"], ["user_1", "3"], ["user_2", "1"]])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,43 @@
+import unittest
+import os
+import subprocess
+import sys
+
+# Command-line tools that run from cron and shell pipelines, and the
+# cumulative import time (microseconds) each one may spend at startup.
+FAST_MODULES = ["log_stats", "log_reporter", "log_filter"]
+IMPORT_BUDGET_US = 150000
+
+HEAVY_MODULES = ["matplotlib", "flask", "selenium", "bs4", "pyarrow"]
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+def run_python(*args):
+    return subprocess.run([sys.executable, *args], cwd=HERE, capture_output=True, text=True, check=True)
+
+def cumulative_import_us(module):
+    """Cumulative import time of module as reported by python -X importtime."""
+    stderr = run_python("-X", "importtime", "-c", f"import {module}").stderr
+    for line in stderr.splitlines():
+        parts = [part.strip() for part in line.split("|")]
+        if len(parts) == 3 and parts[2] == module:
+            return int(parts[1])
+    raise AssertionError(f"no importtime entry for {module}")
+
+class TestImportTime(unittest.TestCase):
+
+    def test_startup_within_budget(self):
+        for module in FAST_MODULES:
+            # Best of three to keep a loaded CI box from causing false alarms.
+            elapsed = min(cumulative_import_us(module) for _ in range(3))
+            self.assertLess(elapsed, IMPORT_BUDGET_US, f"{module} took {elapsed}us to import")
+
+    def test_no_heavy_dependencies_loaded(self):
+        for module in FAST_MODULES + ["log_cli", "log_visualizer", "scraper_stats", "flag_manager", "import_logs"]:
+            code = (f"import sys, {module}; "
+                    f"print(','.join(m for m in {HEAVY_MODULES!r} if m in sys.modules))")
+            loaded = run_python("-c", code).stdout.strip()
+            self.assertEqual(loaded, "", f"importing {module} loaded {loaded}")
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,59 @@
+import unittest
+import contextlib
+import io
+import sqlite3
+import os
+import tempfile
+import load_test
+
+class TestLoadTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.scratch = tempfile.TemporaryDirectory()
+        cls.port = load_test.free_port()
+        cls.proc = load_test.start_server(cls.scratch.name, cls.port, threads=2, seed_rows=100)
+        cls.workload = load_test.Workload(load_test.parse_mix("post=3,get=1"), seed=1)
+
+    @classmethod
+    def tearDownClass(cls):
+        load_test.stop_server(cls.proc)
+        cls.scratch.cleanup()
+
+    def run_step(self, mode, rate=None):
+        with contextlib.redirect_stdout(io.StringIO()):
+            return load_test.run_step("127.0.0.1", self.port, self.workload, mode, concurrency=2,
+                                      duration=0.5, rate=rate, interval=0.25)
+
+    def test_closed_loop(self):
+        summary = self.run_step("closed")
+        self.assertGreater(summary["requests"], 0)
+        self.assertEqual(summary["error_rate"], 0)
+        self.assertEqual(set(summary["endpoints"]), {"POST /log", "GET /logs"})
+        self.assertLessEqual(summary["p50_ms"], summary["max_ms"])
+
+        # Posted logs land in the server's own database, not the repo's logs.db.
+        conn = sqlite3.connect(os.path.join(self.scratch.name, "logs.db"))
+        count = conn.execute("SELECT COUNT(*) FROM search_logs").fetchone()[0]
+        conn.close()
+        self.assertGreater(count, 100)
+
+    def test_open_loop_offers_fixed_rate(self):
+        summary = self.run_step("open", rate=40)
+        self.assertEqual(summary["requests"] + summary["unsent"], 20)
+        self.assertEqual(summary["error_rate"], 0)
+
+    def test_errors_are_counted(self):
+        recorder = load_test.Recorder()
+        client = load_test.Client("127.0.0.1", self.port)
+        load_test.issue(client, recorder, ("POST /log", "POST", "/log", "{}"))
+        client.close()
+        self.assertEqual(recorder.total["errors"], 1)
+
+    def test_parse_mix(self):
+        self.assertEqual(load_test.parse_mix("post=9,get=1"), [("post", 9.0), ("get", 1.0)])
+        with self.assertRaises(ValueError):
+            load_test.parse_mix("delete=1")
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,109 @@
+import unittest
+import contextlib
+import csv
+import gzip
+import io
+import sqlite3
+import os
+import sys
+from unittest import mock
+import flag_manager
+import log_filter
+from log_filter import count_logs, filter_logs, log_batches
+from optimize_db import add_fts_index, drop_fts_index
+from utils.db_utils import has_fts_index
+
+TEST_DB = "test_filter_logs.db"
+
+ROWS = [
+    ("2025-04-20 09:00:00", "test_user_1", "how to use flask", 0.5),
+    ("2025-04-21 10:00:00", "test_user_2", "Flask logging", 0.3),
+    ("2025-04-22 11:00:00", "test_user_1", "best pizza in nyc", 0.7),
+    ("2025-04-23 12:00:00", "test_user_3", "debug python service", 0.2),
+]
+
+class TestLogFilter(unittest.TestCase):
+
+    def setUp(self):
+        if os.path.exists(TEST_DB):
+            os.remove(TEST_DB)
+        conn = sqlite3.connect(TEST_DB)
+        conn.execute("""
+            CREATE TABLE search_logs (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
+                user_id TEXT NOT NULL,
+                search_query TEXT NOT NULL,
+                response_time REAL
+            )
+        """)
+        conn.executemany("INSERT INTO search_logs (timestamp, user_id, search_query, response_time) VALUES (?, ?, ?, ?)", ROWS)
+        conn.commit()
+        conn.close()
+
+    def tearDown(self):
+        if os.path.exists(TEST_DB):
+            os.remove(TEST_DB)
+
+    def test_filters(self):
+        logs = filter_logs(TEST_DB, user="test_user_1", start="2025-04-21")
+        self.assertEqual([r[2] for r in logs], ["best pizza in nyc"])
+
+    def test_fts_matches_like(self):
+        for query in ("flask", "FLA", "py", "zz", "nothing"):
+            expected = filter_logs(TEST_DB, query=query)
+            add_fts_index(TEST_DB)
+            self.assertEqual(filter_logs(TEST_DB, query=query), expected)
+            drop_fts_index(TEST_DB)
+
+    def test_fts_kept_in_sync(self):
+        add_fts_index(TEST_DB)
+        conn = sqlite3.connect(TEST_DB)
+        self.assertTrue(has_fts_index(conn))
+        conn.execute("INSERT INTO search_logs (user_id, search_query) VALUES ('test_user_4', 'flask tutorial')")
+        conn.execute("DELETE FROM search_logs WHERE search_query = 'how to use flask'")
+        conn.execute("UPDATE search_logs SET search_query = 'flask pizza' WHERE search_query = 'best pizza in nyc'")
+        conn.commit()
+        conn.close()
+        logs = filter_logs(TEST_DB, query="flask")
+        self.assertEqual(sorted(r[2] for r in logs), ["Flask logging", "flask pizza", "flask tutorial"])
+
+    def run_main(self, module, *args):
+        out = io.StringIO()
+        with mock.patch.object(sys, "argv", [module.__name__, "--db", TEST_DB, *args]), contextlib.redirect_stdout(out):
+            module.main()
+        return out.getvalue()
+
+    def test_limit_and_count(self):
+        self.assertEqual(count_logs(TEST_DB, user="test_user_1"), 2)
+        self.assertEqual(count_logs(TEST_DB, limit=3), 3)
+        self.assertEqual(len(filter_logs(TEST_DB, limit=3)), 3)
+        self.assertEqual(filter_logs(TEST_DB, flagged="flask", only_flagged=True, limit=1), [ROWS[0]])
+        batches = list(log_batches(TEST_DB, arraysize=3))
+        self.assertEqual([len(rows) for rows in batches], [3, 1])
+
+        self.assertIn("🔢 2 logs", self.run_main(log_filter, "--query", "flask", "--count-only"))
+        self.assertIn("🔢 1 logs", self.run_main(log_filter, "--flagged", "pizza", "--only-flagged", "--count-only"))
+        self.assertIn("🔢 3 logs", self.run_main(flag_manager, "--count-only", "--limit", "3"))
+
+    def test_streaming_export(self):
+        path = TEST_DB + ".csv.gz"
+        try:
+            out = self.run_main(log_filter, "--flagged", "flask", "--export", path)
+            self.assertEqual(out.count("🚩"), 2)
+            self.assertIn("Exported 4 logs", out)
+            with gzip.open(path, "rt", newline="", encoding="utf-8") as f:
+                rows = list(csv.reader(f))
+            self.assertEqual(rows[0], ["timestamp", "user_id", "search_query", "response_time"])
+            self.assertEqual([tuple(row[:3]) for row in rows[1:]], [row[:3] for row in ROWS])
+
+            out = self.run_main(flag_manager, "--flagged", "pizza", "--only-flagged", "--export", path)
+            self.assertIn("🚩 (pizza)", out)
+            with gzip.open(path, "rt", encoding="utf-8") as f:
+                self.assertEqual(len(f.read().splitlines()), 2)
+        finally:
+            if os.path.exists(path):
+                os.remove(path)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,7 +1,13 @@
 import unittest
+import contextlib
+import io
+import json
 import sqlite3
 import os
-from import_logs import import_from_csv
+import gzip
+from unittest import mock
+from import_logs import import_from_csv, ensure_checkpoint_table, save_checkpoint
+from utils.db_utils import connect, init_schema
 
 TEST_DB = "test_logs.db"
 TEST_CSV = "test_logs.csv"
@@ -16,8 +22,9 @@ class TestLogImport(unittest.TestCase):
             f.write("2025-04-23 14:33:00,test_user_2,test query 2,0.427\n")
 
     def setUp(self):
-        if os.path.exists(TEST_DB):
-            os.remove(TEST_DB)
+        for suffix in ("", "-wal", "-shm"):
+            if os.path.exists(TEST_DB + suffix):
+                os.remove(TEST_DB + suffix)
         import_from_csv(TEST_CSV, TEST_DB)
 
     def test_table_created(self):
@@ -35,12 +42,140 @@ class TestLogImport(unittest.TestCase):
         self.assertEqual(count, 2)
         conn.close()
 
+    def test_schema_matches_service(self):
+        conn = sqlite3.connect(TEST_DB)
+        columns = {row[1]: row for row in conn.execute("PRAGMA table_info(search_logs)")}
+        conn.close()
+        self.assertEqual(columns["timestamp"][2], "DATETIME")
+        self.assertEqual(columns["user_id"][3], 1)
+
+    def test_gzip_import(self):
+        os.remove(TEST_DB)
+        with open(TEST_CSV, "rb") as src, gzip.open(TEST_CSV + ".gz", "wb") as dst:
+            dst.write(src.read())
+        try:
+            self.assertEqual(import_from_csv(TEST_CSV + ".gz", TEST_DB), 2)
+        finally:
+            os.remove(TEST_CSV + ".gz")
+
+    def test_ndjson_import(self):
+        os.remove(TEST_DB)
+        path = "test_logs.ndjson"
+        with open(path, "w", encoding="utf-8") as f:
+            f.write('{"timestamp": "2025-04-23 14:32:00", "user_id": "test_user_1", "search_query": "q 1", "response_time": 0.5}\n')
+            f.write("\n")
+            f.write('{"user_id": "test_user_2", "search_query": "q 2"}\n')
+            f.write('{"user_id": "test_user_3"}\n')
+            f.write("not json\n")
+            for timestamp in (20250423, ["2025-04-23"], {"at": "2025-04-23"}, "20250423", "2025-04-23T14:32:00"):
+                f.write(json.dumps({"timestamp": timestamp, "user_id": "test_user_4", "search_query": "q 4"}) + "\n")
+        try:
+            self.assertEqual(import_from_csv(path, TEST_DB), 2)
+        finally:
+            os.remove(path)
+        conn = sqlite3.connect(TEST_DB)
+        rows = conn.execute("SELECT user_id, search_query, response_time FROM search_logs ORDER BY id").fetchall()
+        conn.close()
+        self.assertEqual(rows, [("test_user_1", "q 1", 0.5), ("test_user_2", "q 2", None)])
+
+    def test_resume_from_checkpoint(self):
+        os.remove(TEST_DB)
+        with open(TEST_CSV, "rb") as f:
+            header_end = len(f.readline())
+            first_row_end = header_end + len(f.readline())
+
+        # Pretend an earlier run committed the first row and then crashed.
+        conn = connect(TEST_DB)
+        init_schema(conn)
+        ensure_checkpoint_table(conn)
+        conn.execute("INSERT INTO search_logs (timestamp, user_id, search_query, response_time) "
+                     "VALUES ('2025-04-23 14:32:00', 'test_user_1', 'test query 1', 0.523)")
+        conn.execute("INSERT INTO import_checkpoints (source, byte_offset, rows) VALUES (?, ?, ?)",
+                     (os.path.abspath(TEST_CSV), first_row_end, 1))
+        conn.commit()
+        conn.close()
+
+        self.assertEqual(import_from_csv(TEST_CSV, TEST_DB, chunk_size=1), 2)
+        conn = sqlite3.connect(TEST_DB)
+        users = [r[0] for r in conn.execute("SELECT user_id FROM search_logs ORDER BY id")]
+        remaining = conn.execute("SELECT COUNT(*) FROM import_checkpoints").fetchone()[0]
+        conn.close()
+        self.assertEqual(users, ["test_user_1", "test_user_2"])
+        self.assertEqual(remaining, 0)
+
+    def test_resume_restores_dropped_indexes(self):
+        os.remove(TEST_DB)
+        conn = connect(TEST_DB)
+        init_schema(conn)
+        conn.execute("CREATE INDEX idx_user_id ON search_logs(user_id)")
+        conn.commit()
+        conn.close()
+
+        # A --rebuild-indexes run that dies after its first chunk...
+        calls = []
+        def save_then_crash(*args):
+            calls.append(args)
+            if len(calls) > 2:
+                raise RuntimeError("crash")
+            save_checkpoint(*args)
+
+        with mock.patch("import_logs.save_checkpoint", side_effect=save_then_crash):
+            with self.assertRaises(RuntimeError), contextlib.redirect_stdout(io.StringIO()):
+                import_from_csv(TEST_CSV, TEST_DB, chunk_size=1, drop_and_rebuild_indexes=True)
+        conn = sqlite3.connect(TEST_DB)
+        self.assertIsNone(conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'idx_user_id'").fetchone())
+        conn.close()
+
+        # ...is resumed without the flag and still gets its index back.
+        with contextlib.redirect_stdout(io.StringIO()):
+            import_from_csv(TEST_CSV, TEST_DB, chunk_size=1)
+        conn = sqlite3.connect(TEST_DB)
+        self.assertIsNotNone(conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'idx_user_id'").fetchone())
+        self.assertEqual(conn.execute("SELECT COUNT(*) FROM import_checkpoints").fetchone()[0], 0)
+        self.assertEqual(conn.execute("SELECT COUNT(*) FROM search_logs").fetchone()[0], 2)
+        conn.close()
+
+    def test_missing_timestamp_stamped_now(self):
+        path = TEST_DB + ".ndjson"
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(json.dumps({"user_id": "u", "search_query": "q"}) + "\n")
+        try:
+            with contextlib.redirect_stdout(io.StringIO()):
+                import_from_csv(path, TEST_DB)
+        finally:
+            os.remove(path)
+        conn = sqlite3.connect(TEST_DB)
+        self.assertIsNotNone(conn.execute("SELECT timestamp FROM search_logs WHERE user_id = 'u'").fetchone()[0])
+        conn.close()
+
+    def test_non_finite_response_times_skipped(self):
+        path = TEST_DB + ".csv"
+        with open(path, "w", encoding="utf-8") as f:
+            f.write("timestamp,user_id,search_query,response_time\n")
+            for value in ("inf", "-inf", "nan", "NaN", "Infinity", "0.25"):
+                f.write(f"2025-04-23 15:00:00,rt_user,{value},{value}\n")
+        ndjson = TEST_DB + ".ndjson"
+        with open(ndjson, "w", encoding="utf-8") as f:
+            f.write('{"user_id": "rt_user", "search_query": "json nan", "response_time": NaN}\n')
+        try:
+            with contextlib.redirect_stdout(io.StringIO()):
+                self.assertEqual(import_from_csv(path, TEST_DB), 1)
+                self.assertEqual(import_from_csv(ndjson, TEST_DB), 0)
+        finally:
+            os.remove(path)
+            os.remove(ndjson)
+        conn = sqlite3.connect(TEST_DB)
+        rows = conn.execute("SELECT search_query, response_time FROM search_logs WHERE user_id = 'rt_user'").fetchall()
+        conn.close()
+        self.assertEqual(rows, [("0.25", 0.25)])
+
     @classmethod
     def tearDownClass(cls):
         if os.path.exists(TEST_CSV):
             os.remove(TEST_CSV)
-        if os.path.exists(TEST_DB):
-            os.remove(TEST_DB)
+        for suffix in ("", "-wal", "-shm"):
+            if os.path.exists(TEST_DB + suffix):
+                os.remove(TEST_DB + suffix)
 
 if __name__ == '__main__':
     unittest.main()
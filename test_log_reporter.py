@@ -0,0 +1,73 @@
+import unittest
+import sqlite3
+import os
+import random
+from log_reporter import update_report_state, read_report, compute_full_report, reports_match
+from test_rollups import Interleaved
+from utils.db_utils import init_schema
+
+TEST_DB = "test_reporter_logs.db"
+
+def insert_random_rows(conn, count, seed):
+    rng = random.Random(seed)
+    rows = [(f"2025-04-{rng.randint(1, 28):02d} {rng.randint(0, 23):02d}:00:00", f"user_{rng.randint(1, 9)}",
+             f"query {rng.randint(1, 20)}", rng.choice([None, round(rng.uniform(0.1, 2.0), 3)]))
+            for _ in range(count)]
+    conn.executemany("INSERT INTO search_logs (timestamp, user_id, search_query, response_time) VALUES (?, ?, ?, ?)", rows)
+    conn.commit()
+
+class TestLogReporter(unittest.TestCase):
+
+    def setUp(self):
+        if os.path.exists(TEST_DB):
+            os.remove(TEST_DB)
+        self.conn = sqlite3.connect(TEST_DB)
+        init_schema(self.conn)
+
+    def tearDown(self):
+        self.conn.close()
+        if os.path.exists(TEST_DB):
+            os.remove(TEST_DB)
+
+    def test_incremental_matches_full(self):
+        insert_random_rows(self.conn, 500, seed=1)
+        self.assertEqual(update_report_state(self.conn, chunk=64), 500)
+        self.assertTrue(reports_match(read_report(self.conn), compute_full_report(self.conn)))
+
+        insert_random_rows(self.conn, 300, seed=2)
+        self.assertEqual(update_report_state(self.conn), 300)
+        self.assertEqual(update_report_state(self.conn), 0)
+        self.assertTrue(reports_match(read_report(self.conn), compute_full_report(self.conn)))
+
+    def test_delete_forces_rebuild(self):
+        insert_random_rows(self.conn, 200, seed=3)
+        update_report_state(self.conn)
+        self.conn.execute("DELETE FROM search_logs WHERE user_id = 'user_1'")
+        self.conn.commit()
+        update_report_state(self.conn)
+        self.assertTrue(reports_match(read_report(self.conn), compute_full_report(self.conn)))
+
+    def test_concurrent_runs_count_rows_once(self):
+        insert_random_rows(self.conn, 400, seed=4)
+        update_report_state(self.conn)
+        insert_random_rows(self.conn, 300, seed=5)
+
+        def other_run():
+            other = sqlite3.connect(TEST_DB)
+            self.assertEqual(update_report_state(other, chunk=64), 300)
+            other.close()
+
+        # The other run starts after this one has read the watermark.
+        conn = Interleaved(self.conn, "SELECT MAX(id)", other_run)
+        self.assertEqual(update_report_state(conn, chunk=64), 0)
+        self.assertEqual(read_report(self.conn)["total_logs"], 700)
+        self.assertTrue(reports_match(read_report(self.conn), compute_full_report(self.conn)))
+
+    def test_empty_database(self):
+        update_report_state(self.conn)
+        report = read_report(self.conn)
+        self.assertEqual(report["total_logs"], 0)
+        self.assertIsNone(report["top_user"])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,209 @@
+import unittest
+import base64
+import sqlite3
+import os
+import gzip
+import json
+import log_service
+from utils.db_utils import connect
+from utils.write_buffer import WriteBehindBuffer
+
+TEST_DB = "test_service_logs.db"
+
+class TestLogService(unittest.TestCase):
+
+    def setUp(self):
+        for suffix in ("", "-wal", "-shm"):
+            if os.path.exists(TEST_DB + suffix):
+                os.remove(TEST_DB + suffix)
+        self._orig_db = log_service.DB_FILE
+        log_service.DB_FILE = TEST_DB
+        log_service.init_db()
+        self.client = log_service.app.test_client()
+
+    def tearDown(self):
+        log_service.stop_write_buffer()
+        log_service.close_connections()
+        log_service.DB_FILE = self._orig_db
+        for suffix in ("", "-wal", "-shm"):
+            if os.path.exists(TEST_DB + suffix):
+                os.remove(TEST_DB + suffix)
+
+    def count_rows(self):
+        conn = sqlite3.connect(TEST_DB)
+        count = conn.execute("SELECT COUNT(*) FROM search_logs").fetchone()[0]
+        conn.close()
+        return count
+
+    def test_log_requires_fields(self):
+        resp = self.client.post("/log", json={"user_id": "u1"})
+        self.assertEqual(resp.status_code, 400)
+
+    def test_log_stored(self):
+        resp = self.client.post("/log", json={"user_id": "u1", "search_query": "q", "response_time": 0.2})
+        self.assertEqual(resp.status_code, 201)
+        self.assertEqual(self.count_rows(), 1)
+
+    def test_buffered_log_flushed_on_stop(self):
+        log_service.start_write_buffer(max_rows=1000, max_delay_ms=60000)
+        for i in range(25):
+            resp = self.client.post("/log", json={"user_id": f"u{i}", "search_query": "q"})
+            self.assertEqual(resp.status_code, 202)
+        log_service.stop_write_buffer()
+        self.assertEqual(self.count_rows(), 25)
+
+    def test_log_rejects_bad_types(self):
+        log_service.start_write_buffer(max_rows=1000, max_delay_ms=60000)
+        for body in ({"user_id": None, "search_query": "q"}, {"user_id": "u", "search_query": 5},
+                     {"user_id": "u", "search_query": "q", "response_time": "slow"}, ["u", "q"]):
+            self.assertEqual(self.client.post("/log", json=body).status_code, 400, body)
+        log_service.stop_write_buffer()
+        self.assertEqual(self.count_rows(), 0)
+
+    def test_buffer_survives_bad_rows(self):
+        buf = WriteBehindBuffer(TEST_DB, log_service.INSERT_SQL, max_rows=10, max_delay_ms=60000)
+        for i in range(10):
+            buf.put((None if i == 3 else f"u{i}", "q", 0.1))
+        buf.put(("u10", "q", 0.1))
+        buf.close()
+        self.assertEqual(self.count_rows(), 10)
+        self.assertEqual((buf.flushed_rows, buf.dropped_rows), (10, 1))
+
+        # A database that rejects every row: rows are dropped, the writer keeps running.
+        buf = WriteBehindBuffer(TEST_DB, "INSERT INTO missing_table VALUES (?, ?, ?)", max_rows=2, max_delay_ms=60000)
+        for i in range(5):
+            buf.put((f"u{i}", "q", 0.1))
+        buf.close(timeout=10)
+        self.assertFalse(buf._thread.is_alive())
+        self.assertEqual(buf.dropped_rows, 5)
+
+    def test_bulk_rejects_non_finite_and_bad_timestamps(self):
+        body = "\n".join([
+            '{"user_id": "u1", "search_query": "a", "response_time": NaN}',
+            '{"user_id": "u1", "search_query": "a", "response_time": Infinity}',
+            json.dumps({"user_id": "u1", "search_query": "a", "timestamp": "garbage"}),
+            json.dumps({"user_id": "u1", "search_query": "a", "timestamp": 20250423}),
+            # Accepted by datetime.fromisoformat, but not in the stored format.
+            json.dumps({"user_id": "u1", "search_query": "a", "timestamp": "20250423"}),
+            json.dumps({"user_id": "u1", "search_query": "a", "timestamp": "2025-W17-3"}),
+            json.dumps({"user_id": "u1", "search_query": "a", "timestamp": "20250423T143200"}),
+            json.dumps({"user_id": "u1", "search_query": "a", "timestamp": "2025-04-23T14:32:00"}),
+            json.dumps({"user_id": "u1", "search_query": "a", "timestamp": "2025-04-23 14:32:00+05:00"}),
+            json.dumps({"user_id": "u1", "search_query": "a", "timestamp": "2025-4-23 14:32:00"}),
+            json.dumps({"user_id": "u1", "search_query": "a", "timestamp": "2025-04-23 14:32:00"}),
+            json.dumps({"user_id": "u1", "search_query": "a", "timestamp": "2025-04-23"}),
+        ])
+        result = self.client.post("/log/bulk", data=body).get_json()
+        self.assertEqual(result["inserted"], 2)
+        self.assertEqual([e["line"] for e in result["errors"]], list(range(1, 11)))
+        resp = self.client.post("/log", data='{"user_id": "u", "search_query": "q", "response_time": Infinity}',
+                                content_type="application/json")
+        self.assertEqual(resp.status_code, 400)
+
+    def test_buffered_log_flushed_by_size(self):
+        buf = log_service.start_write_buffer(max_rows=10, max_delay_ms=60000)
+        for i in range(20):
+            self.client.post("/log", json={"user_id": "u1", "search_query": f"q{i}"})
+        log_service.stop_write_buffer()
+        self.assertEqual(buf.flushed_rows, 20)
+        self.assertGreaterEqual(buf.flushes, 2)
+
+    def test_bulk_reports_bad_lines(self):
+        body = "\n".join([
+            json.dumps({"user_id": "u1", "search_query": "a", "response_time": 0.1}),
+            "not json",
+            json.dumps({"user_id": "u2"}),
+            "",
+            json.dumps({"user_id": "u3", "search_query": "b", "timestamp": "2025-04-23 14:32:00"}),
+        ])
+        resp = self.client.post("/log/bulk", data=body, content_type="application/x-ndjson")
+        self.assertEqual(resp.status_code, 200)
+        result = resp.get_json()
+        self.assertEqual(result["inserted"], 2)
+        self.assertEqual([e["line"] for e in result["errors"]], [2, 3])
+        conn = sqlite3.connect(TEST_DB)
+        row = conn.execute("SELECT timestamp FROM search_logs WHERE user_id = 'u3'").fetchone()
+        conn.close()
+        self.assertEqual(row[0], "2025-04-23 14:32:00")
+
+    def test_bulk_gzip_chunked(self):
+        lines = [json.dumps({"user_id": f"u{i}", "search_query": "q"}) for i in range(2500)]
+        body = gzip.compress("\n".join(lines).encode("utf-8"))
+        resp = self.client.post("/log/bulk", data=body, headers={"Content-Encoding": "gzip"})
+        self.assertEqual(resp.get_json()["inserted"], 2500)
+        self.assertEqual(self.count_rows(), 2500)
+
+    def test_wal_enabled(self):
+        conn = log_service.get_db()
+        self.assertEqual(conn.execute("PRAGMA journal_mode").fetchone()[0], "wal")
+        self.assertIs(log_service.get_db(), conn)
+
+    def test_reader_not_blocked_by_open_write(self):
+        writer = connect(TEST_DB)
+        writer.execute("BEGIN IMMEDIATE")
+        writer.execute(log_service.INSERT_SQL, ("u1", "pending", None))
+        try:
+            resp = self.client.get("/logs")
+            self.assertEqual(resp.status_code, 200)
+            self.assertEqual(resp.get_json(), [])
+        finally:
+            writer.rollback()
+            writer.close()
+
+    def insert_rows(self, count):
+        conn = connect(TEST_DB)
+        conn.executemany(
+            "INSERT INTO search_logs (timestamp, user_id, search_query, response_time) VALUES (?, ?, ?, ?)",
+            [(f"2025-04-23 14:{i % 3:02d}:00", f"u{i % 2}", f"q{i}", 0.1) for i in range(count)],
+        )
+        conn.commit()
+        conn.close()
+
+    def page_ids(self, limit):
+        """Ids of every row, following next_cursor page by page."""
+        seen = []
+        cursor = None
+        while True:
+            url = f"/logs?limit={limit}" + (f"&cursor={cursor}" if cursor else "")
+            page = self.client.get(url).get_json()
+            seen.extend(row[0] for row in page["logs"])
+            cursor = page["next_cursor"]
+            if not cursor:
+                return seen
+
+    def test_logs_keyset_pages(self):
+        self.insert_rows(25)
+        seen = self.page_ids(10)
+        self.assertEqual(sorted(seen), list(range(1, 26)))
+        self.assertEqual(len(seen), len(set(seen)))
+
+    def test_logs_pages_past_null_timestamps(self):
+        conn = connect(TEST_DB)
+        conn.executemany("INSERT INTO search_logs (timestamp, user_id, search_query) VALUES (NULL, ?, 'q')",
+                         [(f"u{i}",) for i in range(7)])
+        conn.commit()
+        conn.close()
+        self.insert_rows(8)
+        # Pages of 5 end on a NULL-timestamp row, then cross into the dated rows.
+        seen = self.page_ids(5)
+        self.assertEqual(seen[:7], list(range(1, 8)))
+        self.assertEqual(sorted(seen), list(range(1, 16)))
+
+    def test_logs_rejects_bad_cursor(self):
+        resp = self.client.get("/logs?limit=5&cursor=garbage")
+        self.assertEqual(resp.status_code, 400)
+        for crafted in ([[1], 1], [{"a": 1}, 1], ["2025-01-01", True], ["2025-01-01", "1"]):
+            token = base64.urlsafe_b64encode(json.dumps(crafted).encode("utf-8")).decode("ascii")
+            resp = self.client.get(f"/logs?limit=5&cursor={token}")
+            self.assertEqual(resp.status_code, 400, crafted)
+
+    def test_logs_streamed(self):
+        self.insert_rows(2500)
+        rows = json.loads(self.client.get("/logs?user_id=u1").get_data(as_text=True))
+        self.assertEqual(len(rows), 1250)
+        lines = self.client.get("/logs?format=ndjson").get_data(as_text=True).splitlines()
+        self.assertEqual(len(lines), 2500)
+        self.assertEqual(json.loads(lines[0])[0], 1)
+
+if __name__ == '__main__':
+    unittest.main()
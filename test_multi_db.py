@@ -0,0 +1,65 @@
+import unittest
+import contextlib
+import io
+import os
+import sqlite3
+import tempfile
+from datetime import datetime
+from log_reporter import compute_full_report, generate_multi_report, reports_match
+from populate_fake_logs import generate_logs, insert_logs
+from utils.db_utils import fetch_data
+from utils.multi_db import expand_paths, fetch_many
+from utils.rollups import create_rollups, refresh_rollups
+
+def summary(data):
+    rounded = lambda value: round(value, 9) if isinstance(value, float) else value
+    return [{key: rounded(value) for key, value in part} for part in list(data)[:5]] + [data.total_logs]
+
+class TestMultiDatabase(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        rows = list(generate_logs(6000, seed=11, num_users=60, num_queries=150, days=40, end=datetime(2024, 5, 1)))
+        self.combined = os.path.join(self.tmp.name, "combined.db")
+        insert_logs(self.combined, rows)
+        # One file per "search node", each with its own slice of the traffic.
+        self.nodes = []
+        for node in range(3):
+            path = os.path.join(self.tmp.name, f"node_{node}.db")
+            insert_logs(path, rows[node::3])
+            self.nodes.append(path)
+        conn = sqlite3.connect(self.nodes[0])
+        create_rollups(conn)
+        refresh_rollups(conn)
+        conn.close()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_expand_paths(self):
+        pattern = os.path.join(self.tmp.name, "node_*.db")
+        self.assertEqual(expand_paths([pattern, self.nodes[1]]), self.nodes)
+        with self.assertRaises(FileNotFoundError):
+            expand_paths([os.path.join(self.tmp.name, "missing_*.db")])
+
+    def test_fetch_many_matches_one_database(self):
+        for workers in (1, 2):
+            merged = fetch_many(self.nodes, workers=workers)
+            expected = fetch_data(self.combined)
+            self.assertEqual(summary(merged), summary(expected))
+            self.assertEqual(merged.response_times.count, expected.response_times.count)
+            self.assertEqual(merged.response_times.buckets, expected.response_times.buckets)
+
+        ranged = fetch_many(self.nodes, "2024-04-01", "2024-04-15 23:59:59", workers=2)
+        self.assertEqual(summary(ranged), summary(fetch_data(self.combined, "2024-04-01", "2024-04-15 23:59:59")))
+
+    def test_combined_report(self):
+        with contextlib.redirect_stdout(io.StringIO()):
+            report = generate_multi_report(self.nodes, workers=2)
+        conn = sqlite3.connect(self.combined)
+        expected = compute_full_report(conn)
+        conn.close()
+        self.assertTrue(reports_match(report, expected), (report, expected))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,60 @@
+import unittest
+import contextlib
+import io
+import os
+import sqlite3
+import tempfile
+from datetime import datetime
+from optimize_db import advise_indexes, existing_index_keys
+from populate_fake_logs import generate_logs, insert_logs
+
+class TestIndexAdvisor(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.db = os.path.join(self.tmp.name, "advise.db")
+        insert_logs(self.db, generate_logs(3000, seed=4, num_users=100, num_queries=300, days=14, end=datetime(2024, 1, 1)))
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def advise(self, apply):
+        with contextlib.redirect_stdout(io.StringIO()):
+            return advise_indexes(self.db, apply=apply)
+
+    def index_names(self):
+        conn = sqlite3.connect(self.db)
+        names = set(existing_index_keys(conn))
+        conn.close()
+        return names
+
+    def test_dry_run_changes_nothing(self):
+        results, sizes = self.advise(apply=False)
+        self.assertEqual(sizes, {})
+        self.assertEqual(self.index_names(), set())
+        self.assertTrue(all(result["problems"] for result in results))
+
+    def test_apply_builds_composite_and_expression_indexes(self):
+        results, sizes = self.advise(apply=True)
+        self.assertIn("idx_user_id_timestamp", sizes)
+        self.assertIn("idx_date_timestamp", sizes)
+        self.assertIn("idx_strftime_h_timestamp", sizes)
+        self.assertTrue(all(size > 0 for size in sizes.values()))
+        self.assertEqual(self.index_names(), set(sizes))
+
+        by_label = {result["label"]: result for result in results}
+        page = by_label["GET /logs user + time page"]["plan_after"]
+        self.assertTrue(any("idx_user_id_timestamp (user_id=? AND timestamp>?" in line for line in page))
+        self.assertNotIn("USE TEMP B-TREE FOR GROUP BY", by_label["searches per day"]["plan_after"])
+
+        conn = sqlite3.connect(self.db)
+        analyzed = conn.execute("SELECT COUNT(*) FROM sqlite_stat1").fetchone()[0]
+        conn.close()
+        self.assertGreater(analyzed, 0)
+
+        # A second run finds nothing left to propose.
+        _, sizes = self.advise(apply=True)
+        self.assertEqual(sizes, {})
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,156 @@
+import unittest
+import contextlib
+import io
+import json
+import os
+import sqlite3
+import tempfile
+from datetime import datetime
+from unittest import mock
+import log_service
+from log_filter import filter_logs
+from log_reporter import compute_full_report, read_report, reports_match, update_report_state
+from optimize_db import partition_db
+from populate_fake_logs import generate_logs, insert_logs
+from utils.aggregator import LogAggregates
+from utils.compact import migrate_to_compact
+from utils.db_utils import fetch_data
+from utils import partitions
+from utils.rollups import create_rollups, refresh_rollups
+
+def summary(data):
+    rounded = lambda value: round(value, 9) if isinstance(value, float) else value
+    return [{key: rounded(value) for key, value in part} for part in list(data)[:5]] + [data.total_logs]
+
+class TestPartitions(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.single = os.path.join(self.tmp.name, "single.db")
+        self.parts = os.path.join(self.tmp.name, "parts")
+        rows = list(generate_logs(3000, seed=5, num_users=40, num_queries=100, days=120, end=datetime(2024, 2, 15)))
+        rows += [("not a date", "user_odd", "odd query", 0.3), (None, "user_odd", "null time", None)]
+        insert_logs(self.single, rows)
+        with contextlib.redirect_stdout(io.StringIO()):
+            partition_db(self.single, self.parts)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_routing_and_ids(self):
+        self.assertEqual(partitions.partition_key("2024-01-31 23:59:59"), "2024-01")
+        self.assertEqual(partitions.partition_key("2024-01-31T23:59:59"), "2024-01")
+        self.assertEqual(partitions.partition_key("2024-011"), partitions.UNDATED)
+        self.assertEqual(partitions.partition_key(None), partitions.UNDATED)
+
+        keys = [key for key, _ in partitions.list_partitions(self.parts)]
+        self.assertEqual(keys, ["2023-10", "2023-11", "2023-12", "2024-01", "2024-02", partitions.UNDATED])
+
+        writer = partitions.PartitionWriter(self.parts)
+        writer.insert([("2024-02-20 10:00:00", "u", "new", 0.1), ("2030-05-01 00:00:00", "u", "future", 0.2)])
+        writer.close()
+        conn = sqlite3.connect(partitions.partition_path(self.parts, "2030-05"))
+        new_id = conn.execute("SELECT id FROM search_logs").fetchone()[0]
+        conn.close()
+        self.assertEqual(new_id, partitions.first_id("2030-05") + 1)
+
+    def test_pruning(self):
+        keys = [key for key, _ in partitions.overlapping_partitions(self.parts, "2023-12-15", "2024-01-02")]
+        self.assertEqual(keys, ["2023-12", "2024-01", partitions.UNDATED])
+        self.assertTrue(partitions.contains("2024-01", "2023-12-15", "2024-02-01"))
+        self.assertFalse(partitions.contains("2024-01", "2024-01-02", None))
+
+    def test_filters_match_single_database(self):
+        cases = [
+            {}, {"user": "user_0"}, {"query": "a"},
+            {"start": "2023-12-15", "end": "2024-01-02 12:00:00"},
+            {"start": "2024-02", "user": "user_1"},
+        ]
+        for limit in (10, 2):
+            with mock.patch.object(partitions, "attach_limit", return_value=limit):
+                for filters in cases:
+                    expected = sorted(filter_logs(self.single, **filters), key=repr)
+                    self.assertEqual(sorted(filter_logs(self.parts, **filters), key=repr), expected, filters)
+
+    def test_fetch_data_matches_single_database(self):
+        self.assertEqual(summary(fetch_data(self.parts)), summary(fetch_data(self.single)))
+        for start, end in (("2023-12-15", "2024-01-31 23:59:59"), ("2024-01", None), (None, "2023-11-30")):
+            self.assertEqual(summary(fetch_data(self.parts, start, end)), summary(fetch_data(self.single, start, end)))
+
+    def test_id_watermarks_skip_the_id_gap(self):
+        # A split month keeps its old low ids; new rows land in the partition's id block.
+        writer = partitions.PartitionWriter(self.parts)
+        writer.insert([("2024-01-20 10:00:00", f"user_new{i}", "fresh query", 0.5) for i in range(30)])
+        writer.close()
+        path = partitions.partition_path(self.parts, "2024-01")
+        conn = sqlite3.connect(path)
+        low, high = conn.execute("SELECT MIN(id), MAX(id) FROM search_logs").fetchone()
+        self.assertGreater(high - low, 10 ** 12)
+        total = conn.execute("SELECT COUNT(*) FROM search_logs").fetchone()[0]
+
+        create_rollups(conn)
+        self.assertEqual(refresh_rollups(conn, chunk=100), total)
+        self.assertEqual(summary(fetch_data(path)), summary(LogAggregates.scan(conn)))
+
+        self.assertEqual(update_report_state(conn, chunk=100), total)
+        self.assertTrue(reports_match(read_report(conn), compute_full_report(conn)))
+
+        self.assertEqual(migrate_to_compact(conn, chunk=100), total)
+        self.assertEqual(conn.execute("SELECT COUNT(*) FROM search_logs").fetchone()[0], total)
+        conn.close()
+
+class TestPartitionedService(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self._orig = log_service.PARTITION_DIR
+        log_service.PARTITION_DIR = os.path.join(self.tmp.name, "parts")
+        log_service.init_db()
+        self.client = log_service.app.test_client()
+
+    def tearDown(self):
+        log_service.stop_write_buffer()
+        log_service.close_connections()
+        log_service.PARTITION_DIR = self._orig
+        self.tmp.cleanup()
+
+    def post_bulk(self, count):
+        lines = [json.dumps({"timestamp": f"2024-{1 + i % 12:02d}-{1 + i % 28:02d} 10:00:00", "user_id": f"u{i % 3}",
+                             "search_query": f"q{i}", "response_time": 0.1}) for i in range(count)]
+        resp = self.client.post("/log/bulk", data="\n".join(lines))
+        self.assertEqual(resp.get_json()["inserted"], count)
+
+    def test_ingest_is_routed(self):
+        self.assertEqual(self.client.post("/log", json={"user_id": "u", "search_query": "now"}).status_code, 201)
+        self.post_bulk(24)
+        log_service.start_write_buffer(max_rows=1000, max_delay_ms=60000)
+        self.client.post("/log", json={"user_id": "u", "search_query": "buffered"})
+        log_service.stop_write_buffer()
+
+        keys = {key for key, _ in partitions.list_partitions(log_service.PARTITION_DIR)}
+        this_month = partitions.partition_key(partitions.utc_timestamp())
+        self.assertEqual(keys, {f"2024-{m:02d}" for m in range(1, 13)} | {this_month})
+        rows = json.loads(self.client.get("/logs").get_data(as_text=True))
+        self.assertEqual(len(rows), 26)
+
+    def test_pages_cross_partitions_in_order(self):
+        self.post_bulk(60)
+        with mock.patch.object(partitions, "attach_limit", return_value=3):
+            seen = []
+            cursor = None
+            while True:
+                url = "/logs?limit=7&user_id=u1" + (f"&cursor={cursor}" if cursor else "")
+                page = self.client.get(url).get_json()
+                seen.extend(page["logs"])
+                cursor = page["next_cursor"]
+                if not cursor:
+                    break
+        self.assertEqual(len(seen), 20)
+        self.assertEqual(seen, sorted(seen, key=lambda row: (row[1], row[0])))
+
+        rows = json.loads(self.client.get("/logs?start_time=2024-03-01&end_time=2024-04-30").get_data(as_text=True))
+        self.assertEqual(len(rows), 10)
+        self.assertTrue(all("2024-03" <= row[1] < "2024-05" for row in rows))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,49 @@
+import unittest
+import random
+from utils.quantiles import ResponseTimeSketch
+
+class TestResponseTimeSketch(unittest.TestCase):
+
+    def setUp(self):
+        rng = random.Random(7)
+        self.values = [rng.lognormvariate(-1.5, 0.8) for _ in range(20000)]
+        self.values += [rng.uniform(5, 30) for _ in range(100)]  # slow tail
+
+    def exact(self, q):
+        ordered = sorted(self.values)
+        return ordered[int(q * (len(ordered) - 1))]
+
+    def test_quantiles_within_relative_error(self):
+        sketch = ResponseTimeSketch.from_values(self.values)
+        for q in (0.5, 0.9, 0.95, 0.99, 0.999):
+            self.assertAlmostEqual(sketch.quantile(q), self.exact(q), delta=self.exact(q) * 0.011)
+        self.assertEqual(sketch.min, min(self.values))
+        self.assertEqual(sketch.max, max(self.values))
+        self.assertAlmostEqual(sketch.mean, sum(self.values) / len(self.values))
+
+    def test_merge_equals_single_sketch(self):
+        whole = ResponseTimeSketch.from_values(self.values)
+        merged = ResponseTimeSketch()
+        for start in range(0, len(self.values), 3000):
+            part = ResponseTimeSketch.from_values(self.values[start:start + 3000])
+            merged.merge(ResponseTimeSketch.loads(part.dumps()))
+        self.assertEqual(merged.buckets, whole.buckets)
+        self.assertEqual(merged.count, whole.count)
+        self.assertEqual(merged.quantiles(), whole.quantiles())
+
+    def test_empty_and_zero(self):
+        sketch = ResponseTimeSketch()
+        self.assertIsNone(sketch.quantile(0.5))
+        sketch.update([0.0, 0.0, 1.0])
+        self.assertEqual(sketch.quantile(0.5), 0.0)
+        self.assertEqual(len(sketch), 3)
+
+    def test_non_finite_values_skipped(self):
+        sketch = ResponseTimeSketch.from_values([0.5, float("inf"), float("nan"), float("-inf"), 1.5])
+        self.assertEqual((sketch.count, sketch.non_finite), (2, 3))
+        self.assertEqual((sketch.min, sketch.max, sketch.sum), (0.5, 1.5, 2.0))
+        restored = ResponseTimeSketch.loads(sketch.dumps())
+        self.assertEqual(restored.merge(sketch).non_finite, 6)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,117 @@
+import unittest
+import contextlib
+import io
+import os
+import sqlite3
+import tempfile
+from datetime import datetime
+from import_logs import import_from_csv
+from optimize_db import partition_db
+from populate_fake_logs import generate_logs, insert_logs
+from utils import partitions
+from utils.aggregator import LogAggregates
+from utils.db_utils import fetch_data
+from utils.retention import cutoff_for, purge
+from utils.rollups import create_rollups, refresh_rollups
+
+COLUMNS = "SELECT timestamp, user_id, search_query, response_time FROM search_logs"
+
+def summary(data):
+    rounded = lambda value: round(value, 6) if isinstance(value, float) else value
+    return [{key: rounded(value) for key, value in part} for part in list(data)[:5]] + [data.total_logs]
+
+class TestRetention(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.db = os.path.join(self.tmp.name, "logs.db")
+        rows = list(generate_logs(4000, seed=8, num_users=30, num_queries=80, days=90, end=datetime(2024, 3, 1)))
+        rows.append(("not a date", "user_odd", "odd query", 0.2))
+        self.rows = rows
+        insert_logs(self.db, rows)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def query(self, sql, *params, db=None):
+        conn = sqlite3.connect(db or self.db)
+        try:
+            return conn.execute(sql, params).fetchall()
+        finally:
+            conn.close()
+
+    def test_cutoff(self):
+        self.assertEqual(cutoff_for(before="2024-01-15 10:00:00"), "2024-01-15")
+        self.assertIsNone(cutoff_for())
+        with self.assertRaises(ValueError):
+            cutoff_for(before="yesterday")
+
+    def test_purge_in_batches_keeps_rollups_in_step(self):
+        conn = sqlite3.connect(self.db)
+        create_rollups(conn)
+        refresh_rollups(conn)
+        conn.close()
+
+        stats = purge(self.db, "2024-01-15", batch=300)
+        expired = [row for row in self.rows if row[0] < "2024-01-15"]
+        self.assertEqual(stats["rows"], len(expired))
+        self.assertGreater(stats["batches"], 1)
+        self.assertGreater(stats["max_lock"], 0)
+        self.assertEqual(self.query(COLUMNS + " WHERE DATE(timestamp) < '2024-01-15'"), [])
+        self.assertEqual(self.query("SELECT COUNT(*) FROM search_logs")[0][0], len(self.rows) - len(expired))
+
+        self.assertEqual(self.query("SELECT stale FROM rollup_state"), [(0,)])
+        self.assertEqual(self.query("SELECT MIN(bucket) FROM rollup_daily_rt_sketch WHERE bucket <> ''"), [("2024-01-15",)])
+        conn = sqlite3.connect(self.db)
+        scanned = LogAggregates.scan(conn)
+        conn.close()
+        rolled = fetch_data(self.db)
+        self.assertEqual(summary(rolled), summary(scanned))
+        self.assertEqual(rolled.response_times.count, scanned.response_times.count)
+
+    def test_purge_skips_id_gaps(self):
+        conn = sqlite3.connect(self.db)
+        conn.execute("INSERT INTO search_logs (id, timestamp, user_id, search_query, response_time) "
+                     "VALUES (?, '2023-06-01 00:00:00', 'far', 'far away', 0.1)", (10**15,))
+        conn.commit()
+        conn.close()
+
+        stats = purge(self.db, "2024-01-15", batch=1000)
+        expired = [row for row in self.rows if row[0] < "2024-01-15"]
+        self.assertEqual(stats["rows"], len(expired) + 1)
+        self.assertEqual(self.query("SELECT COUNT(*) FROM search_logs WHERE id = ?", 10**15), [(0,)])
+
+    def test_archive_round_trips(self):
+        archive_dir = os.path.join(self.tmp.name, "archive")
+        purge(self.db, "2024-01-01", batch=500, archive_dir=archive_dir)
+        stats = purge(self.db, "2024-01-01", archive_dir=archive_dir)
+        self.assertEqual(stats["rows"], 0)
+
+        restored = os.path.join(self.tmp.name, "restored.db")
+        with contextlib.redirect_stdout(io.StringIO()):
+            import_from_csv(os.path.join(archive_dir, "search_logs_before_2024-01-01.csv.gz"), restored)
+        expired = [row for row in self.rows if row[0] < "2024-01-01"]
+        self.assertEqual(self.query(COLUMNS + " ORDER BY id", db=restored), expired)
+
+    def test_incremental_vacuum_shrinks_file(self):
+        self.assertEqual(self.query("PRAGMA auto_vacuum"), [(2,)])
+        stats = purge(self.db, None, batch=1000)
+        self.assertEqual(stats["rows"], len(self.rows))
+        self.assertGreater(stats["pages_freed"], 0)
+        self.assertLess(stats["bytes_after"], stats["bytes_before"])
+        self.assertEqual(self.query("SELECT COUNT(*) FROM search_logs"), [(0,)])
+
+    def test_partitions_drop_whole_months(self):
+        parts = os.path.join(self.tmp.name, "parts")
+        with contextlib.redirect_stdout(io.StringIO()):
+            partition_db(self.db, parts)
+        stats = purge(parts, "2024-01-15")
+        self.assertEqual(stats["dropped_partitions"], 1)
+        keys = [key for key, _ in partitions.list_partitions(parts)]
+        self.assertEqual(keys, ["2024-01", "2024-02", partitions.UNDATED])
+        self.assertEqual(stats["rows"], len([row for row in self.rows if row[0] < "2024-01-15"]))
+        remaining = self.query("SELECT MIN(timestamp) FROM search_logs", db=partitions.partition_path(parts, "2024-01"))
+        self.assertGreaterEqual(remaining[0][0], "2024-01-15")
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,129 @@
+import unittest
+import sqlite3
+import os
+import random
+from utils.db_utils import fetch_data, init_schema
+from utils.aggregator import LogAggregates
+from utils.rollups import create_rollups, has_rollups, load_rollups, refresh_rollups
+
+TEST_DB = "test_rollup_logs.db"
+
+def insert_random_rows(conn, count, seed):
+    rng = random.Random(seed)
+    rows = []
+    for _ in range(count):
+        timestamp = f"2025-04-{rng.randint(1, 9):02d} {rng.randint(0, 23):02d}:{rng.randint(0, 59):02d}:00"
+        if rng.random() < 0.05:
+            timestamp = "not a date"
+        response_time = round(rng.uniform(0.1, 1.0), 3) if rng.random() > 0.1 else None
+        rows.append((timestamp, f"user_{rng.randint(1, 5)}", f"query {rng.randint(1, 8)}", response_time))
+    conn.executemany("INSERT INTO search_logs (timestamp, user_id, search_query, response_time) VALUES (?, ?, ?, ?)", rows)
+    conn.commit()
+
+class Interleaved:
+    """A connection stand-in that runs ``other`` once, just before the first statement containing ``marker``.
+
+    Lets a test put a second process's work between two statements of the
+    code under test.
+    """
+
+    def __init__(self, conn, marker, other):
+        self.conn, self.marker, self.other = conn, marker, other
+
+    def execute(self, sql, *args):
+        if self.other and self.marker in sql:
+            other, self.other = self.other, None
+            other()
+        return self.conn.execute(sql, *args)
+
+    def __getattr__(self, name):
+        return getattr(self.conn, name)
+
+    def __enter__(self):
+        return self.conn.__enter__()
+
+    def __exit__(self, *exc):
+        return self.conn.__exit__(*exc)
+
+class TestRollups(unittest.TestCase):
+
+    def setUp(self):
+        if os.path.exists(TEST_DB):
+            os.remove(TEST_DB)
+        self.conn = sqlite3.connect(TEST_DB)
+        init_schema(self.conn)
+
+    def tearDown(self):
+        self.conn.close()
+        if os.path.exists(TEST_DB):
+            os.remove(TEST_DB)
+
+    def assertSameData(self, actual, expected):
+        for got, want in zip(list(actual)[:5], list(expected)[:5]):
+            self.assertEqual([row[0] for row in got], [row[0] for row in want])
+            for (_, a), (_, b) in zip(got, want):
+                if b is None:
+                    self.assertIsNone(a)
+                else:
+                    self.assertAlmostEqual(a, b)
+
+    def raw_data(self):
+        """The original six GROUP BY queries fetch_data used to run."""
+        cursor = self.conn.cursor()
+        results = []
+        for sql in (
+            "SELECT user_id, COUNT(*) FROM search_logs GROUP BY user_id",
+            "SELECT search_query, COUNT(*) FROM search_logs GROUP BY search_query",
+            "SELECT DATE(timestamp), COUNT(*) FROM search_logs GROUP BY DATE(timestamp)",
+            "SELECT user_id, AVG(response_time) FROM search_logs GROUP BY user_id",
+            "SELECT strftime('%H', timestamp), COUNT(*) FROM search_logs GROUP BY strftime('%H', timestamp)",
+        ):
+            results.append(cursor.execute(sql).fetchall())
+        return results
+
+    def test_single_pass_matches_group_by(self):
+        insert_random_rows(self.conn, 300, seed=5)
+        data = fetch_data(TEST_DB)
+        self.assertSameData(data, self.raw_data())
+        count, total, low, high = self.conn.execute(
+            "SELECT COUNT(response_time), SUM(response_time), MIN(response_time), MAX(response_time) FROM search_logs").fetchone()
+        self.assertEqual(data.response_times.count, count)
+        self.assertAlmostEqual(data.response_times.sum, total)
+        self.assertEqual((data.response_times.min, data.response_times.max), (low, high))
+        self.assertEqual(data.total_logs, 300)
+
+    def test_incremental_matches_raw(self):
+        insert_random_rows(self.conn, 300, seed=1)
+        create_rollups(self.conn)
+        self.assertTrue(has_rollups(self.conn))
+        self.assertSameData(fetch_data(TEST_DB), self.raw_data())
+
+        insert_random_rows(self.conn, 200, seed=2)
+        self.assertSameData(fetch_data(TEST_DB), self.raw_data())
+
+    def test_delete_triggers_rebuild(self):
+        insert_random_rows(self.conn, 200, seed=3)
+        create_rollups(self.conn)
+        fetch_data(TEST_DB)
+        self.conn.execute("DELETE FROM search_logs WHERE user_id = 'user_1'")
+        self.conn.commit()
+        insert_random_rows(self.conn, 50, seed=4)
+        self.assertSameData(fetch_data(TEST_DB), self.raw_data())
+
+    def test_concurrent_refresh_folds_rows_once(self):
+        insert_random_rows(self.conn, 300, seed=6)
+        create_rollups(self.conn)
+
+        def other_process():
+            other = sqlite3.connect(TEST_DB)
+            self.assertEqual(refresh_rollups(other, chunk=100), 300)
+            other.close()
+
+        # The other refresh runs after this one has read the watermark.
+        conn = Interleaved(self.conn, "SELECT MAX(id)", other_process)
+        self.assertEqual(refresh_rollups(conn, chunk=100), 0)
+        self.assertEqual(self.conn.execute("SELECT SUM(searches) FROM rollup_daily_user").fetchone()[0], 300)
+        self.assertEqual(load_rollups(self.conn).total_logs, LogAggregates.scan(self.conn).total_logs)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,103 @@
+import unittest
+import os
+import tempfile
+import threading
+import time
+from functools import partial
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+from scraper_stats import crawl_concurrent, extract_links_fast
+
+# A small site: index links to a, b, an external page and a missing page;
+# a and b link back and onward to c.
+PAGES = {
+    "index.html": '<a href="a.html">A</a> <a href="/b.html">B</a> <a href="http://example.com/x">X</a> '
+                  '<a href="missing.html">gone</a>',
+    "a.html": '<a href="index.html">home</a> <a href="c.html">C</a>',
+    "b.html": '<a href="c.html">C</a> <a href="index.html">home</a> <a href="https://example.org/">Y</a>',
+    "c.html": '<p>no links here</p>',
+}
+
+class SiteHandler(SimpleHTTPRequestHandler):
+    """Serves the fixture site, recording how many requests overlap and when each starts."""
+
+    delay = 0.0
+
+    def do_GET(self):
+        server = self.server
+        with server.lock:
+            server.starts.append(time.monotonic())
+            server.in_flight += 1
+            server.max_in_flight = max(server.max_in_flight, server.in_flight)
+        try:
+            time.sleep(self.delay)
+            super().do_GET()
+        finally:
+            with server.lock:
+                server.in_flight -= 1
+
+    def log_message(self, format, *args):
+        pass
+
+class TestConcurrentCrawl(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        for name, body in PAGES.items():
+            with open(os.path.join(self.tmp.name, name), "w", encoding="utf-8") as f:
+                f.write(f"<html><body>{body}</body></html>")
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), partial(SiteHandler, directory=self.tmp.name))
+        self.server.lock = threading.Lock()
+        self.server.starts = []
+        self.server.in_flight = self.server.max_in_flight = 0
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        self.host = f"127.0.0.1:{self.server.server_address[1]}"
+        self.base = f"http://{self.host}/"
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        self.tmp.cleanup()
+
+    def crawl(self, **kwargs):
+        return crawl_concurrent(self.base + "index.html", self.host, **kwargs)
+
+    def test_stats_records(self):
+        stats = self.crawl(max_pages=10, workers=3)
+        by_url = {record["url"]: record for record in stats}
+        self.assertEqual(len(stats), 5)
+        self.assertEqual(set(by_url), {self.base + name for name in ("index.html", "a.html", "b.html", "c.html", "missing.html")})
+        self.assertEqual(stats[0]["url"], self.base + "index.html")
+        self.assertEqual(by_url[self.base + "missing.html"], {"url": self.base + "missing.html", "status": "failed"})
+
+        index = by_url[self.base + "index.html"]
+        self.assertEqual((index["total_links"], index["internal_links"], index["external_links"]), (4, 3, 1))
+        self.assertGreater(index["content_size_bytes"], 0)
+        self.assertEqual(by_url[self.base + "c.html"]["total_links"], 0)
+
+        self.assertEqual(len(self.crawl(max_pages=2, workers=3)), 2)
+
+    def test_per_host_politeness(self):
+        SiteHandler.delay = 0.05
+        try:
+            self.crawl(workers=4, max_per_host=4)
+            self.assertGreater(self.server.max_in_flight, 1)
+
+            self.server.max_in_flight = 0
+            self.crawl(workers=4, max_per_host=1)
+            self.assertEqual(self.server.max_in_flight, 1)
+
+            self.server.starts.clear()
+            self.crawl(workers=4, max_per_host=4, delay=0.1)
+            gaps = [b - a for a, b in zip(self.server.starts, self.server.starts[1:])]
+            self.assertEqual(len(self.server.starts), 5)
+            self.assertGreaterEqual(min(gaps), 0.09)
+        finally:
+            SiteHandler.delay = 0.0
+
+    def test_extract_links(self):
+        links = extract_links_fast('<a href="/x?a=1&amp;b=2">x</a><a name="top"></a><A HREF="y.html">', "http://h/p/")
+        self.assertEqual(links, {"http://h/x?a=1&b=2", "http://h/p/y.html"})
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,83 @@
+import unittest
+import json
+import os
+import random
+import tempfile
+from utils import term_matcher
+from utils.term_matcher import TermMatcher, load_matcher
+
+class TestTermMatcher(unittest.TestCase):
+
+    def test_matches_substring_scan(self):
+        rng = random.Random(1)
+        terms = ["".join(rng.choice("abc") for _ in range(rng.randint(1, 4))) for _ in range(30)]
+        matcher = TermMatcher(terms)
+        for _ in range(500):
+            text = "".join(rng.choice("abcABC ") for _ in range(rng.randint(0, 20)))
+            expected = {t for t in terms if t in text.lower()}
+            self.assertEqual(matcher.find(text), expected)
+            self.assertEqual(matcher.matches(text), bool(expected))
+
+    def test_overlapping_terms(self):
+        matcher = TermMatcher(["he", "she", "his", "hers"])
+        self.assertEqual(matcher.find("uSHErs"), {"he", "she", "hers"})
+
+    def test_behaves_like_term_set(self):
+        matcher = TermMatcher(["Flask", "pizza"])
+        self.assertEqual(set(matcher), {"flask", "pizza"})
+        self.assertIn("pizza", matcher)
+        self.assertFalse(TermMatcher([]))
+
+    def test_disk_cache_tracks_file(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "flagged_terms.txt")
+            with open(path, "w") as f:
+                f.write("pizza\n")
+            calls = []
+
+            def load_terms():
+                calls.append(1)
+                with open(path) as f:
+                    return [line.strip() for line in f if line.strip()]
+
+            self.assertEqual(set(load_matcher(path, load_terms)), {"pizza"})
+            self.assertEqual(set(load_matcher(path, load_terms)), {"pizza"})
+            self.assertEqual(len(calls), 1)
+
+            with open(path, "w") as f:
+                f.write("pizza\nflask\n")
+            self.assertEqual(set(load_matcher(path, load_terms)), {"pizza", "flask"})
+            self.assertEqual(len(calls), 2)
+
+            # The cache round-trips through JSON into a working automaton.
+            cached = load_matcher(path, load_terms)
+            self.assertEqual(len(calls), 2)
+            self.assertEqual(cached.find("Flask pizzas"), {"pizza", "flask"})
+            self.assertFalse(cached.matches("pasta"))
+
+    def test_cache_rebuilt_when_unreadable_or_old_format(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "flagged_terms.txt")
+            with open(path, "w") as f:
+                f.write("pizza\n")
+            calls = []
+            load_terms = lambda: calls.append(1) or ["pizza"]
+            cache_file = os.path.join(tmp, ".flagged_terms.txt.matcher.json")
+
+            load_matcher(path, load_terms)
+            with open(cache_file, "wb") as f:
+                f.write(b"\x80\x05not json")
+            self.assertTrue(load_matcher(path, load_terms).matches("pizza"))
+            self.assertEqual(len(calls), 2)
+
+            with open(cache_file) as f:
+                cached = json.load(f)
+            cached["key"][0] = term_matcher.MATCHER_CACHE_VERSION - 1
+            cached["matcher"]["out"] = [[] for _ in cached["matcher"]["out"]]
+            with open(cache_file, "w") as f:
+                json.dump(cached, f)
+            self.assertTrue(load_matcher(path, load_terms).matches("pizza"))
+            self.assertEqual(len(calls), 3)
+
+if __name__ == '__main__':
+    unittest.main()
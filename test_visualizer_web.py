@@ -0,0 +1,82 @@
+import unittest
+import os
+import shutil
+import sqlite3
+import tempfile
+
+try:
+    import matplotlib  # noqa: F401
+    HAS_MATPLOTLIB = True
+except ImportError:
+    HAS_MATPLOTLIB = False
+
+@unittest.skipUnless(HAS_MATPLOTLIB, "matplotlib is not installed")
+class TestChartCache(unittest.TestCase):
+
+    def setUp(self):
+        import visualizer_web
+        from utils.db_utils import init_schema
+        self.web = visualizer_web
+        self.tmp = tempfile.mkdtemp()
+        self.db = os.path.join(self.tmp, "logs.db")
+        conn = sqlite3.connect(self.db)
+        init_schema(conn)
+        conn.execute("INSERT INTO search_logs (timestamp, user_id, search_query, response_time) "
+                     "VALUES ('2025-04-23 14:32:00', 'u1', 'q1', 0.5)")
+        conn.commit()
+        conn.close()
+        self._orig_cache = visualizer_web.chart_cache
+        visualizer_web.chart_cache = visualizer_web.ChartCache(self.tmp, self.db)
+        self.client = visualizer_web.app.test_client()
+
+    def tearDown(self):
+        self.web.chart_cache = self._orig_cache
+        shutil.rmtree(self.tmp)
+
+    def test_first_render_and_conditional_get(self):
+        resp = self.client.get("/")
+        self.assertEqual(resp.status_code, 200)
+        version = self.web.chart_cache.rendered_version
+        self.assertEqual(version, self.web.data_version(self.db))
+        self.assertIn(f"v={version}".encode(), resp.data)
+
+        chart = self.client.get("/charts/searches_per_user.png")
+        self.assertEqual(chart.status_code, 200)
+        self.assertTrue(chart.headers.get("ETag"))
+        self.assertTrue(chart.headers.get("Last-Modified"))
+        again = self.client.get("/charts/searches_per_user.png", headers={"If-None-Match": chart.headers["ETag"]})
+        self.assertEqual(again.status_code, 304)
+
+    def test_rendered_version_reused_until_data_changes(self):
+        cache = self.web.chart_cache
+        cache.refresh()
+        first = cache.rendered_version
+        self.assertEqual(cache.refresh(), first)
+
+        conn = sqlite3.connect(self.db)
+        conn.execute("INSERT INTO search_logs (user_id, search_query) VALUES ('u2', 'q2')")
+        conn.commit()
+        conn.close()
+        cache._checked_version = None
+        cache._rendered.clear()
+        cache.refresh()
+        cache._rendered.wait(30)
+        self.assertNotEqual(cache.rendered_version, first)
+
+@unittest.skipUnless(HAS_MATPLOTLIB, "matplotlib is not installed")
+class TestRenderCharts(unittest.TestCase):
+
+    def test_parallel_batch(self):
+        from utils.plot_utils import chart_spec, render_charts
+        with tempfile.TemporaryDirectory() as tmp:
+            specs = [
+                chart_spec("bar", [("u1", 3), ("u2", None), ("u3", 1)], "Bars", "x", "y", path=os.path.join(tmp, "bars.png")),
+                chart_spec("line", [("2025-04-02", 1), ("2025-04-01", 2)], "Line", "x", "y", path=os.path.join(tmp, "line.png")),
+                chart_spec("bar", [], "Empty", "x", "y", path=os.path.join(tmp, "empty.png")),
+            ]
+            paths = render_charts(specs, processes=2)
+            self.assertEqual(paths, [specs[0]["path"], specs[1]["path"], None])
+            self.assertTrue(all(os.path.getsize(p) > 0 for p in paths if p))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,109 @@
+from utils.quantiles import ResponseTimeSketch
+
+# Rows pulled from the cursor per fetchmany() call.
+SCAN_CHUNK = 10000
+
+SCAN_SQL = """
+    SELECT user_id, search_query, DATE(timestamp), strftime('%H', timestamp), response_time
+    FROM search_logs
+"""
+
+def _sorted_items(counts):
+    # Same order as SQLite's GROUP BY output: NULL first, then by value.
+    return sorted(counts.items(), key=lambda item: (item[0] is not None, item[0]))
+
+class LogAggregates:
+    """All fetch_data result sets, filled from a single pass over search_logs.
+
+    Iterating yields the six classic results in order, so existing
+    ``user_data, query_data, ... = fetch_data()`` unpacking keeps working.
+    Response times are summarized in a ResponseTimeSketch (NULLs skipped),
+    so memory does not grow with the number of rows.
+    """
+
+    def __init__(self):
+        self.users = {}       # user_id -> [searches, rt_count, rt_sum]
+        self.queries = {}     # search_query -> searches
+        self.days = {}        # DATE(timestamp) -> searches
+        self.hours = {}       # strftime('%H', timestamp) -> searches
+        self.response_times = ResponseTimeSketch()
+
+    @classmethod
+    def scan(cls, conn, chunk=SCAN_CHUNK, start=None, end=None):
+        """Build the aggregates with one streamed scan of search_logs, optionally limited to start..end."""
+        aggregates = cls()
+        cursor = conn.cursor()
+        cursor.arraysize = chunk
+        sql, params = SCAN_SQL + " WHERE 1=1", []
+        if start:
+            sql += " AND timestamp >= ?"
+            params.append(start)
+        if end:
+            sql += " AND timestamp <= ?"
+            params.append(end)
+        cursor.execute(sql, params)
+        while True:
+            rows = cursor.fetchmany()
+            if not rows:
+                break
+            aggregates.add_rows(rows)
+        return aggregates
+
+    def add_rows(self, rows):
+        users, queries, days, hours = self.users, self.queries, self.days, self.hours
+        add_time = self.response_times.add
+        for user_id, search_query, day, hour, response_time in rows:
+            user = users.get(user_id)
+            if user is None:
+                user = users[user_id] = [0, 0, 0.0]
+            user[0] += 1
+            queries[search_query] = queries.get(search_query, 0) + 1
+            days[day] = days.get(day, 0) + 1
+            hours[hour] = hours.get(hour, 0) + 1
+            if response_time is not None:
+                user[1] += 1
+                user[2] += response_time
+                add_time(response_time)
+
+    def merge(self, other):
+        """Fold in the aggregates of another set of rows (e.g. another partition)."""
+        for user_id, (searches, rt_count, rt_sum) in other.users.items():
+            user = self.users.get(user_id)
+            if user is None:
+                user = self.users[user_id] = [0, 0, 0.0]
+            user[0] += searches
+            user[1] += rt_count
+            user[2] += rt_sum
+        for mine, theirs in ((self.queries, other.queries), (self.days, other.days), (self.hours, other.hours)):
+            for key, count in theirs.items():
+                mine[key] = mine.get(key, 0) + count
+        self.response_times.merge(other.response_times)
+        return self
+
+    @property
+    def total_logs(self):
+        return sum(self.days.values())
+
+    @property
+    def user_counts(self):
+        return [(user_id, stats[0]) for user_id, stats in _sorted_items(self.users)]
+
+    @property
+    def query_counts(self):
+        return _sorted_items(self.queries)
+
+    @property
+    def time_counts(self):
+        return _sorted_items(self.days)
+
+    @property
+    def avg_response_times(self):
+        return [(user_id, stats[2] / stats[1] if stats[1] else None) for user_id, stats in _sorted_items(self.users)]
+
+    @property
+    def hour_counts(self):
+        return _sorted_items(self.hours)
+
+    def __iter__(self):
+        return iter((self.user_counts, self.query_counts, self.time_counts,
+                     self.avg_response_times, self.hour_counts, self.response_times))
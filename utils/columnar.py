@@ -0,0 +1,130 @@
+import os
+
+# Columnar export of search logs (pyarrow, optional): the file suffix picks
+# the format, Parquet or the Arrow IPC file format.
+COLUMNAR_FORMATS = {".parquet": "parquet", ".arrow": "arrow", ".feather": "arrow", ".ipc": "arrow"}
+
+# Rows per Parquet row group / Arrow record batch. At most about twice this
+# many rows are held in memory while exporting, plus (Arrow files only) one
+# copy of every distinct user_id and search_query, see GrowingDictionary.
+ROW_GROUP_ROWS = 100000
+
+# Compression codec for both formats.
+COMPRESSION = "zstd"
+
+LOG_FIELDS = ["timestamp", "user_id", "search_query", "response_time"]
+DICTIONARY_FIELDS = ("user_id", "search_query")
+
+def columnar_format(path):
+    """'parquet' or 'arrow' when path names a columnar export file, else None."""
+    return COLUMNAR_FORMATS.get(os.path.splitext(path)[1].lower())
+
+def _pyarrow():
+    try:
+        import pyarrow
+    except ImportError:
+        raise ImportError("Columnar export needs pyarrow: pip install pyarrow")
+    return pyarrow
+
+def log_schema(pa):
+    return pa.schema([
+        ("timestamp", pa.string()),
+        ("user_id", pa.dictionary(pa.int32(), pa.string())),
+        ("search_query", pa.dictionary(pa.int32(), pa.string())),
+        ("response_time", pa.float64()),
+    ])
+
+class GrowingDictionary:
+    """Dictionary-encodes one column across batches with a dictionary that only grows.
+
+    The Arrow IPC file format cannot replace a dictionary between batches,
+    only extend it, so every batch reuses the codes handed out before and
+    the writer emits just the new values as a delta. The dictionary is kept
+    as an Arrow array and only each batch's new values are converted, so
+    the Python work per batch is proportional to the batch, not to the
+    dictionary; memory still grows with the number of distinct values.
+    """
+
+    def __init__(self, pa):
+        self.pa = pa
+        self.codes = {}
+        self.dictionary = pa.array([], type=pa.string())
+
+    def encode(self, column):
+        codes = self.codes
+        indices = []
+        new_values = []
+        for value in column:
+            if value is None:
+                indices.append(None)
+                continue
+            code = codes.get(value)
+            if code is None:
+                code = codes[value] = len(codes)
+                new_values.append(value)
+            indices.append(code)
+        if new_values:
+            self.dictionary = self.pa.concat_arrays(
+                [self.dictionary, self.pa.array(new_values, type=self.pa.string())])
+        return self.pa.DictionaryArray.from_arrays(self.pa.array(indices, type=self.pa.int32()), self.dictionary)
+
+def _text(column):
+    # SQLite columns are loosely typed; keep odd values instead of failing the export.
+    return [value if value is None or isinstance(value, str) else str(value) for value in column]
+
+def _number(column):
+    return [value if value is None or isinstance(value, (int, float)) else None for value in column]
+
+def _record_batch(pa, rows, dictionaries=None):
+    timestamps, users, queries, times = (list(column) for column in zip(*rows))
+    if dictionaries:
+        users = dictionaries["user_id"].encode(_text(users))
+        queries = dictionaries["search_query"].encode(_text(queries))
+    else:
+        users = pa.array(_text(users), type=pa.string()).dictionary_encode()
+        queries = pa.array(_text(queries), type=pa.string()).dictionary_encode()
+    return pa.record_batch([
+        pa.array(_text(timestamps), type=pa.string()),
+        users,
+        queries,
+        pa.array(_number(times), type=pa.float64()),
+    ], schema=log_schema(pa))
+
+def _open_writer(pa, path, fmt):
+    schema = log_schema(pa)
+    if fmt == "parquet":
+        import pyarrow.parquet as pq
+        return pq.ParquetWriter(path, schema, compression=COMPRESSION, use_dictionary=list(DICTIONARY_FIELDS))
+    import pyarrow.ipc
+    options = pyarrow.ipc.IpcWriteOptions(compression=COMPRESSION, emit_dictionary_deltas=True)
+    return pyarrow.ipc.new_file(path, schema, options=options)
+
+def write_columnar(batches, path, fmt=None, chunk_size=ROW_GROUP_ROWS):
+    """Stream lists of (timestamp, user_id, search_query, response_time) rows into a columnar file.
+
+    Rows are regrouped into chunks of ``chunk_size``; each chunk becomes
+    one Parquet row group or Arrow record batch and is written before the
+    next one is read. Returns the number of rows written.
+    """
+    pa = _pyarrow()
+    fmt = fmt or columnar_format(path)
+    if fmt not in ("parquet", "arrow"):
+        raise ValueError(f"Unknown columnar format for '{path}'; use one of {', '.join(COLUMNAR_FORMATS)}")
+    dictionaries = {name: GrowingDictionary(pa) for name in DICTIONARY_FIELDS} if fmt == "arrow" else None
+
+    written = 0
+    pending = []
+    writer = _open_writer(pa, path, fmt)
+    try:
+        for rows in batches:
+            pending.extend(rows)
+            while len(pending) >= chunk_size:
+                writer.write_batch(_record_batch(pa, pending[:chunk_size], dictionaries))
+                written += chunk_size
+                pending = pending[chunk_size:]
+        if pending:
+            writer.write_batch(_record_batch(pa, pending, dictionaries))
+            written += len(pending)
+    finally:
+        writer.close()
+    return written
@@ -0,0 +1,251 @@
+import re
+from datetime import date, timedelta
+from utils.aggregator import LogAggregates, SCAN_CHUNK
+
+# Optional compact storage (optimize_db.py --compact). Rows live in
+# search_logs_compact with integer epoch-millisecond timestamps and integer
+# references into the log_users / log_queries dictionaries. search_logs
+# becomes a view with the original columns, and INSTEAD OF triggers route
+# inserts, updates and deletes on it to the compact table, so the tools
+# keep working unchanged. Ids are carried over, so id watermarks (rollups,
+# report state) stay valid across the migration.
+COMPACT_TABLE = "search_logs_compact"
+
+# Timestamp text -> epoch ms, and back to the text search_logs used to hold.
+# A timestamp is only stored as ms when it converts back to exactly the
+# same text; anything else is kept verbatim in ts_raw.
+TO_MS = "CAST(round((julianday({0}) - 2440587.5) * 86400000.0) AS INTEGER)"
+FROM_MS = ("CASE WHEN {0} % 1000 = 0 THEN strftime('%Y-%m-%d %H:%M:%S', {0} / 1000, 'unixepoch') "
+           "ELSE strftime('%Y-%m-%d %H:%M:%f', {0} / 1000.0, 'unixepoch') END")
+
+def _ms_or_null(text):
+    ms = TO_MS.format(text)
+    return f"CASE WHEN {ms} >= 0 AND {FROM_MS.format(ms)} = {text} THEN {ms} END"
+
+def _raw_or_null(text):
+    ms = TO_MS.format(text)
+    return f"CASE WHEN {ms} >= 0 AND {FROM_MS.format(ms)} = {text} THEN NULL ELSE {text} END"
+
+COMPACT_SCHEMA = [
+    "CREATE TABLE IF NOT EXISTS log_users (id INTEGER PRIMARY KEY, user_id TEXT NOT NULL UNIQUE)",
+    "CREATE TABLE IF NOT EXISTS log_queries (id INTEGER PRIMARY KEY, search_query TEXT NOT NULL UNIQUE)",
+    f"""CREATE TABLE IF NOT EXISTS {COMPACT_TABLE} (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        ts_ms INTEGER,
+        user_ref INTEGER NOT NULL REFERENCES log_users(id),
+        query_ref INTEGER NOT NULL REFERENCES log_queries(id),
+        response_time REAL,
+        ts_raw TEXT
+    )""",
+]
+
+# Timestamp filters go through the view's computed text column and cannot
+# use an index on ts_ms, so only user and query lookups are indexed.
+COMPACT_INDEXES = [
+    ("idx_compact_user_ts", "user_ref, ts_ms"),
+    ("idx_compact_query", "query_ref"),
+]
+
+# The view and its triggers replace the search_logs table at the end of the migration.
+COMPACT_VIEW = [
+    f"""CREATE VIEW search_logs AS
+        SELECT l.id AS id, COALESCE(l.ts_raw, {FROM_MS.format('l.ts_ms')}) AS timestamp,
+               u.user_id AS user_id, q.search_query AS search_query, l.response_time AS response_time
+        FROM {COMPACT_TABLE} l
+        JOIN log_users u ON u.id = l.user_ref
+        JOIN log_queries q ON q.id = l.query_ref""",
+    # Views have no column defaults, so a missing timestamp means "now" like the table's DEFAULT.
+    f"""CREATE TRIGGER search_logs_insert INSTEAD OF INSERT ON search_logs BEGIN
+        INSERT OR IGNORE INTO log_users (user_id) VALUES (NEW.user_id);
+        INSERT OR IGNORE INTO log_queries (search_query) VALUES (NEW.search_query);
+        INSERT INTO {COMPACT_TABLE} (id, ts_ms, user_ref, query_ref, response_time, ts_raw) VALUES (
+            NEW.id,
+            {_ms_or_null("COALESCE(NEW.timestamp, CURRENT_TIMESTAMP)")},
+            (SELECT id FROM log_users WHERE user_id = NEW.user_id),
+            (SELECT id FROM log_queries WHERE search_query = NEW.search_query),
+            NEW.response_time,
+            {_raw_or_null("COALESCE(NEW.timestamp, CURRENT_TIMESTAMP)")});
+    END""",
+    f"""CREATE TRIGGER search_logs_update INSTEAD OF UPDATE ON search_logs BEGIN
+        INSERT OR IGNORE INTO log_users (user_id) VALUES (NEW.user_id);
+        INSERT OR IGNORE INTO log_queries (search_query) VALUES (NEW.search_query);
+        UPDATE {COMPACT_TABLE} SET
+            ts_ms = {_ms_or_null("NEW.timestamp")},
+            user_ref = (SELECT id FROM log_users WHERE user_id = NEW.user_id),
+            query_ref = (SELECT id FROM log_queries WHERE search_query = NEW.search_query),
+            response_time = NEW.response_time,
+            ts_raw = {_raw_or_null("NEW.timestamp")}
+        WHERE id = OLD.id;
+    END""",
+    f"""CREATE TRIGGER search_logs_delete INSTEAD OF DELETE ON search_logs BEGIN
+        DELETE FROM {COMPACT_TABLE} WHERE id = OLD.id;
+    END""",
+]
+
+# Copies search_logs rows with ? < id <= ? into the compact table; the
+# dictionaries must already hold their users and queries.
+COPY_SQL = f"""
+    INSERT INTO {COMPACT_TABLE} (id, ts_ms, user_ref, query_ref, response_time, ts_raw)
+    SELECT s.id, {_ms_or_null("s.timestamp")}, u.id, q.id, s.response_time, {_raw_or_null("s.timestamp")}
+    FROM search_logs s
+    JOIN log_users u ON u.user_id = s.user_id
+    JOIN log_queries q ON q.search_query = s.search_query
+    WHERE s.id > ? AND s.id <= ?
+"""
+
+SCAN_COMPACT_SQL = f"""
+    SELECT user_ref, query_ref,
+           CASE WHEN ts_raw IS NULL THEN ts_ms / 86400000 ELSE DATE(ts_raw) END,
+           CASE WHEN ts_raw IS NULL THEN ts_ms / 3600000 % 24 ELSE strftime('%H', ts_raw) END,
+           response_time
+    FROM {COMPACT_TABLE}
+"""
+
+EPOCH = date(1970, 1, 1)
+
+def is_compact(conn):
+    """True once optimize_db --compact has turned search_logs into a view."""
+    row = conn.execute("SELECT type FROM sqlite_master WHERE name = 'search_logs'").fetchone()
+    return row is not None and row[0] == "view"
+
+def base_table(conn):
+    """The table that actually stores log rows, for triggers (which cannot be AFTER triggers on a view)."""
+    return COMPACT_TABLE if is_compact(conn) else "search_logs"
+
+def _merge_keys(counts, translate):
+    merged = {}
+    for key, count in counts.items():
+        key = translate(key)
+        merged[key] = merged.get(key, 0) + count
+    return merged
+
+def _day(key):
+    return (EPOCH + timedelta(days=key)).isoformat() if isinstance(key, int) else key
+
+def _hour(key):
+    return f"{key:02d}" if isinstance(key, int) else key
+
+def scan_compact(conn, chunk=SCAN_CHUNK):
+    """LogAggregates from one pass over the compact table, grouping on integers.
+
+    Users and queries are counted by reference and days and hours by
+    integer division of the epoch ms; names and date strings are only
+    looked up for the distinct keys at the end.
+    """
+    aggregates = LogAggregates()
+    cursor = conn.cursor()
+    cursor.arraysize = chunk
+    cursor.execute(SCAN_COMPACT_SQL)
+    while True:
+        rows = cursor.fetchmany()
+        if not rows:
+            break
+        aggregates.add_rows(rows)
+
+    user_names = dict(conn.execute("SELECT id, user_id FROM log_users"))
+    query_texts = dict(conn.execute("SELECT id, search_query FROM log_queries"))
+    aggregates.users = {user_names[ref]: stats for ref, stats in aggregates.users.items()}
+    aggregates.queries = {query_texts[ref]: count for ref, count in aggregates.queries.items()}
+    aggregates.days = _merge_keys(aggregates.days, _day)
+    aggregates.hours = _merge_keys(aggregates.hours, _hour)
+    return aggregates
+
+# Rows copied per transaction by migrate_to_compact.
+MIGRATION_CHUNK = 50000
+
+# While the copy runs, changes to rows that were already copied are
+# mirrored into the compact table. Dropped together with the old table.
+SYNC_TRIGGERS = [
+    f"""CREATE TRIGGER IF NOT EXISTS compact_sync_delete AFTER DELETE ON search_logs BEGIN
+        DELETE FROM {COMPACT_TABLE} WHERE id = OLD.id;
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS compact_sync_update AFTER UPDATE ON search_logs BEGIN
+        INSERT OR IGNORE INTO log_users (user_id) VALUES (NEW.user_id);
+        INSERT OR IGNORE INTO log_queries (search_query) VALUES (NEW.search_query);
+        UPDATE {COMPACT_TABLE} SET
+            ts_ms = {_ms_or_null("NEW.timestamp")},
+            user_ref = (SELECT id FROM log_users WHERE user_id = NEW.user_id),
+            query_ref = (SELECT id FROM log_queries WHERE search_query = NEW.search_query),
+            response_time = NEW.response_time,
+            ts_raw = {_raw_or_null("NEW.timestamp")}
+        WHERE id = OLD.id;
+    END""",
+]
+
+def next_id_chunk(conn, last_id, max_id, chunk, table="search_logs"):
+    """(upper id, rows) of the next at most ``chunk`` rows with last_id < id <= max_id, or (None, 0).
+
+    The bound follows the ids actually present, so a gap in the id space
+    (a partition's id block sits far above any copied-in rows) is skipped
+    in one step instead of being walked ``chunk`` ids at a time.
+    """
+    return conn.execute(f"""
+        SELECT MAX(id), COUNT(*) FROM (SELECT id FROM {table} WHERE id > ? AND id <= ? ORDER BY id LIMIT ?)
+    """, (last_id, max_id, chunk)).fetchone()
+
+def _copy_range(conn, low, high):
+    for table, column in (("log_users", "user_id"), ("log_queries", "search_query")):
+        conn.execute(f"""
+            INSERT OR IGNORE INTO {table} ({column})
+            SELECT DISTINCT {column} FROM search_logs WHERE id > ? AND id <= ?
+        """, (low, high))
+    # OR IGNORE: a resumed run may overlap rows that were already copied.
+    return conn.execute(COPY_SQL.replace("INSERT INTO", "INSERT OR IGNORE INTO", 1), (low, high)).rowcount
+
+def _carried_triggers(conn):
+    """CREATE TRIGGER statements on search_logs to re-create on the compact table."""
+    rows = conn.execute("SELECT name, sql FROM sqlite_master WHERE type = 'trigger' AND tbl_name = 'search_logs'")
+    return [re.sub(r"\bON\s+search_logs\b", f"ON {COMPACT_TABLE}", sql, count=1)
+            for name, sql in rows if not name.startswith("compact_sync_")]
+
+def migrate_to_compact(conn, chunk=MIGRATION_CHUNK, progress=None):
+    """Convert search_logs to the compact schema while the database stays in use.
+
+    Rows are copied by id range in short transactions, so writers only ever
+    wait for one chunk, and an interrupted run resumes where it stopped.
+    The final catch-up and the swap of the table for the view happen in one
+    IMMEDIATE transaction. Returns the number of rows copied.
+    """
+    if is_compact(conn):
+        return 0
+    with conn:
+        for sql in COMPACT_SCHEMA + SYNC_TRIGGERS:
+            conn.execute(sql)
+        for name, columns in COMPACT_INDEXES:
+            conn.execute(f"CREATE INDEX IF NOT EXISTS {name} ON {COMPACT_TABLE}({columns})")
+
+    copied = 0
+    last = conn.execute(f"SELECT COALESCE(MAX(id), 0) FROM {COMPACT_TABLE}").fetchone()[0]
+    while True:
+        max_id = conn.execute("SELECT COALESCE(MAX(id), 0) FROM search_logs").fetchone()[0]
+        high, rows = next_id_chunk(conn, last, max_id, chunk)
+        if rows < chunk:
+            # The rest fits in one chunk: copy it with the swap below.
+            break
+        with conn:
+            copied += _copy_range(conn, last, high)
+        last = high
+        if progress:
+            progress(last, max_id)
+
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        max_id = conn.execute("SELECT COALESCE(MAX(id), 0) FROM search_logs").fetchone()[0]
+        copied += _copy_range(conn, last, max_id)
+
+        # Keep AUTOINCREMENT from ever handing out an id the old table used.
+        row = conn.execute("SELECT seq FROM sqlite_sequence WHERE name = 'search_logs'").fetchone()
+        seq = max(row[0] if row else 0, max_id)
+        conn.execute("DELETE FROM sqlite_sequence WHERE name = ?", (COMPACT_TABLE,))
+        conn.execute("INSERT INTO sqlite_sequence (name, seq) VALUES (?, ?)", (COMPACT_TABLE, seq))
+
+        carried = _carried_triggers(conn)
+        conn.execute("DROP TABLE search_logs")
+        conn.execute("DELETE FROM sqlite_sequence WHERE name = 'search_logs'")
+        for sql in COMPACT_VIEW + carried:
+            conn.execute(sql)
+        conn.commit()
+    except BaseException:
+        conn.rollback()
+        raise
+    return copied
@@ -1,27 +1,119 @@
+import os
 import sqlite3
+from datetime import datetime
+from utils.aggregator import LogAggregates
+from utils.compact import is_compact, scan_compact
+from utils.rollups import has_rollups, refresh_rollups, load_rollups
 
-def fetch_data(db_path='logs.db'):
-    """Fetch various aggregate stats from the logs database."""
-    conn = sqlite3.connect(db_path)
-    cursor = conn.cursor()
+SCHEMA = """
+    CREATE TABLE IF NOT EXISTS search_logs (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
+        user_id TEXT NOT NULL,
+        search_query TEXT NOT NULL,
+        response_time REAL
+    )
+"""
+
+# Applied to every connection opened through connect(). WAL lets readers and
+# the writer proceed concurrently; synchronous=NORMAL is durable across
+# application crashes in WAL mode and only fsyncs at checkpoints.
+PRAGMAS = [
+    ("journal_mode", "WAL"),
+    ("synchronous", "NORMAL"),
+    ("cache_size", -64000),        # in KiB, i.e. ~64 MB page cache
+    ("mmap_size", 268435456),      # 256 MB memory-mapped reads
+    ("busy_timeout", 5000),        # ms to wait on a locked database
+    ("temp_store", "MEMORY"),
+]
+
+FTS_TABLE = "search_logs_fts"
+
+# Timestamps are stored as text in CURRENT_TIMESTAMP's format (or as a bare
+# date); the date filters, rollups, partitions and cursors all rely on
+# comparing that text, so anything else has to be rejected on the way in.
+TIMESTAMP_FORMATS = ("%Y-%m-%d %H:%M:%S", "%Y-%m-%d")
 
-    cursor.execute("SELECT user_id, COUNT(*) FROM search_logs GROUP BY user_id")
-    user_counts = cursor.fetchall()
+def is_valid_timestamp(value):
+    """True if value is a string in one of TIMESTAMP_FORMATS, zero-padded exactly as stored."""
+    if not isinstance(value, str):
+        return False
+    for fmt in TIMESTAMP_FORMATS:
+        try:
+            # strptime alone accepts '2025-4-3'; the round trip does not.
+            if datetime.strptime(value, fmt).strftime(fmt) == value:
+                return True
+        except ValueError:
+            pass
+    return False
 
-    cursor.execute("SELECT search_query, COUNT(*) FROM search_logs GROUP BY search_query")
-    query_counts = cursor.fetchall()
+def has_fts_index(conn):
+    """True if optimize_db --fts has built the search_query full-text index."""
+    row = conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (FTS_TABLE,)).fetchone()
+    return row is not None
 
-    cursor.execute("SELECT DATE(timestamp), COUNT(*) FROM search_logs GROUP BY DATE(timestamp)")
-    time_counts = cursor.fetchall()
+def query_filter(conn, query):
+    """SQL fragment and parameter for a substring --query filter.
 
-    cursor.execute("SELECT user_id, AVG(response_time) FROM search_logs GROUP BY user_id")
-    avg_response_times = cursor.fetchall()
+    Routes through the FTS5 trigram index when it exists, which answers the
+    same case-insensitive LIKE without scanning search_logs.
+    """
+    pattern = f"%{query}%"
+    if has_fts_index(conn):
+        return f" AND id IN (SELECT rowid FROM {FTS_TABLE} WHERE search_query LIKE ?)", pattern
+    return " AND search_query LIKE ?", pattern
 
-    cursor.execute("SELECT strftime('%H', timestamp), COUNT(*) FROM search_logs GROUP BY strftime('%H', timestamp)")
-    hour_counts = cursor.fetchall()
+def connect(db_path, check_same_thread=True):
+    """Open a SQLite connection with the tuned PRAGMAS applied."""
+    new_file = not os.path.exists(db_path) or os.path.getsize(db_path) == 0
+    conn = sqlite3.connect(db_path, check_same_thread=check_same_thread)
+    if new_file:
+        # See init_schema; on a new file this has to come before journal_mode.
+        conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+    for name, value in PRAGMAS:
+        conn.execute(f"PRAGMA {name} = {value}")
+    return conn
 
-    cursor.execute("SELECT response_time FROM search_logs")
-    response_times = [row[0] for row in cursor.fetchall()]
+def init_schema(conn):
+    """Create the search_logs table if it does not exist yet.
 
-    conn.close()
-    return user_counts, query_counts, time_counts, avg_response_times, hour_counts, response_times
\ No newline at end of file
+    New databases get auto_vacuum=INCREMENTAL so that clear_logs.py can hand
+    purged pages back to the file system; the pragma is a no-op once a
+    database has tables.
+    """
+    conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+    conn.execute(SCHEMA)
+    conn.commit()
+
+def fetch_data(db_path='logs.db', start=None, end=None):
+    """Fetch various aggregate stats from the logs database.
+
+    Returns a LogAggregates built from one streamed pass over search_logs (or
+    over its compact table), or from the rollup tables (optimize_db.py
+    --rollups) when they exist, after catching them up with new rows. It
+    unpacks like the old six-tuple. With start/end only rows in that range
+    are counted, which always scans. db_path may also be a partition
+    directory (utils/partitions.py); only the months overlapping the range
+    are read.
+    """
+    if os.path.isdir(db_path):
+        # Imported here: utils.partitions builds on this module.
+        from utils.partitions import fetch_partitions
+        return fetch_partitions(db_path, start, end)
+
+    conn = sqlite3.connect(db_path)
+    try:
+        if start or end:
+            return LogAggregates.scan(conn, start=start, end=end)
+        if has_rollups(conn):
+            try:
+                refresh_rollups(conn)
+                return load_rollups(conn)
+            except sqlite3.OperationalError as e:
+                # e.g. a read-only copy: fall back to scanning the raw table.
+                print(f"Rollups unavailable ({e}); scanning search_logs instead")
+        if is_compact(conn):
+            return scan_compact(conn)
+        return LogAggregates.scan(conn)
+    finally:
+        conn.close()
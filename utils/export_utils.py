@@ -1,6 +1,6 @@
 import csv
 import os
-import statistics
+from utils.quantiles import as_sketch
 
 EXPORT_DIR = "exports"
 
@@ -9,6 +9,7 @@ def export_to_csv(data, filename):
         print(f"No data to export to {filename}")
         return
 
+    os.makedirs(EXPORT_DIR, exist_ok=True)
     path = os.path.join(EXPORT_DIR, filename)
     with open(path, "w", newline="", encoding="utf-8") as f:
         writer = csv.writer(f)
@@ -24,9 +25,12 @@ def print_summary_report(user_data, query_data, time_data, response_times):
     print(f"- Total active days: {len(time_data)}")
     print(f"- Most recent activity date: {time_data[-1][0] if time_data else 'N/A'}")
 
-    if response_times:
-        print(f"- Response time stats (s): min={min(response_times):.3f}, max={max(response_times):.3f}, "
-              f"mean={statistics.mean(response_times):.3f}, median={statistics.median(response_times):.3f}")
+    rt = as_sketch(response_times)
+    if rt.count:
+        print(f"- Response time stats (s): min={rt.min:.3f}, max={rt.max:.3f}, "
+              f"mean={rt.mean:.3f}, median={rt.quantile(0.5):.3f}")
+        print("- Response time percentiles (s): " +
+              ", ".join(f"{label}={value:.3f}" for label, value in rt.quantiles().items()))
     else:
         print("- No response time data available.")
 
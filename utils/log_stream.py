@@ -0,0 +1,58 @@
+import csv
+import gzip
+
+# Rows fetched per cursor round trip; every stage of the pipeline holds at
+# most one batch of this size.
+STREAM_BATCH_ROWS = 1000
+
+CSV_HEADER = ["timestamp", "user_id", "search_query", "response_time"]
+
+def cursor_batches(cursor, arraysize=STREAM_BATCH_ROWS):
+    """Yield an executed cursor's rows in lists of up to arraysize."""
+    cursor.arraysize = arraysize
+    while True:
+        rows = cursor.fetchmany()
+        if not rows:
+            break
+        yield rows
+
+def matching(batches, predicate):
+    """Keep only the rows predicate accepts, dropping batches that end up empty."""
+    for rows in batches:
+        rows = [row for row in rows if predicate(row)]
+        if rows:
+            yield rows
+
+def limited(batches, limit):
+    """Stop the stream after limit rows; the source is closed when the pipeline is."""
+    if limit is None:
+        yield from batches
+        return
+    remaining = limit
+    for rows in batches:
+        if remaining <= 0:
+            break
+        if len(rows) > remaining:
+            rows = rows[:remaining]
+        remaining -= len(rows)
+        yield rows
+
+def count_rows(batches):
+    return sum(len(rows) for rows in batches)
+
+def open_text(filename):
+    """Open an export for writing, gzip-compressed when the name ends in .gz."""
+    if filename.endswith(".gz"):
+        return gzip.open(filename, "wt", compresslevel=6, newline="", encoding="utf-8")
+    return open(filename, "w", newline="", encoding="utf-8")
+
+def write_csv(batches, filename):
+    """Write batches of (timestamp, user_id, search_query, response_time) rows as they arrive; returns the row count."""
+    count = 0
+    with open_text(filename) as f:
+        writer = csv.writer(f)
+        writer.writerow(CSV_HEADER)
+        for rows in batches:
+            writer.writerows(rows)
+            count += len(rows)
+    return count
@@ -0,0 +1,48 @@
+import glob
+import os
+from functools import partial
+from utils.aggregator import LogAggregates
+from utils.db_utils import fetch_data
+
+def expand_paths(patterns):
+    """Database paths for a list of paths and glob patterns, in order and without duplicates."""
+    paths = []
+    for pattern in patterns:
+        matches = [pattern] if os.path.exists(pattern) else sorted(glob.glob(pattern))
+        if not matches:
+            raise FileNotFoundError(f"No databases match '{pattern}'")
+        for path in matches:
+            if path not in paths:
+                paths.append(path)
+    return paths
+
+def default_workers(paths):
+    return max(1, min(len(paths), os.cpu_count() or 1))
+
+def map_databases(func, paths, workers=None):
+    """Yield func(path) for every path, in order, running them in a process pool.
+
+    Each database is read by its own worker process, so the work spreads
+    over the cores instead of queueing behind one connection. With a single
+    worker (or a single path) everything runs in this process. func must be
+    picklable (a module-level function or a functools.partial of one).
+    """
+    workers = workers or default_workers(paths)
+    if workers <= 1 or len(paths) <= 1:
+        for path in paths:
+            yield func(path)
+        return
+
+    # Imported here: multiprocessing is only needed for several databases.
+    from concurrent.futures import ProcessPoolExecutor
+    with ProcessPoolExecutor(max_workers=min(workers, len(paths))) as pool:
+        yield from pool.map(func, paths)
+
+def fetch_many(paths, start=None, end=None, workers=None):
+    """fetch_data over several databases (files or partition directories), merged into one LogAggregates."""
+    if len(paths) == 1:
+        return fetch_data(paths[0], start, end)
+    aggregates = LogAggregates()
+    for part in map_databases(partial(fetch_data, start=start, end=end), paths, workers):
+        aggregates.merge(part)
+    return aggregates
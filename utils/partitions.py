@@ -0,0 +1,264 @@
+import glob
+import heapq
+import os
+import re
+import sqlite3
+from datetime import datetime, timezone
+from utils.aggregator import LogAggregates
+from utils.db_utils import connect, fetch_data, init_schema
+
+# Month-partitioned storage: a directory holding one logs_YYYY-MM.db per
+# month, each with the usual search_logs table. Rows go to the month their
+# timestamp starts with; timestamps without a YYYY-MM prefix go to
+# logs_undated.db, which every query has to include.
+PARTITION_FILE = "logs_{}.db"
+UNDATED = "undated"
+MONTH_PREFIX = re.compile(r"^(\d{4}-\d{2})(?!\d)")
+
+# Each partition hands out ids from its own block (month number * ID_SPAN),
+# so ids stay unique across the directory and (timestamp, id) cursors work.
+ID_SPAN = 10 ** 12
+UNDATED_BLOCK = 12 * 10000
+
+# SQLite's default cap on ATTACHed databases; the real limit is read from
+# the connection where Python exposes it.
+DEFAULT_ATTACH_LIMIT = 10
+
+INSERT_SQL = """
+    INSERT INTO search_logs (timestamp, user_id, search_query, response_time)
+    VALUES (?, ?, ?, ?)
+"""
+
+def is_partitioned(path):
+    """True when path is a partition directory rather than a database file."""
+    return os.path.isdir(path)
+
+def utc_timestamp():
+    """The current time in CURRENT_TIMESTAMP's format."""
+    return datetime.now(timezone.utc).strftime("%Y-%m-%d %H:%M:%S")
+
+def partition_key(timestamp):
+    """'YYYY-MM' for the month a timestamp belongs to, or UNDATED."""
+    match = MONTH_PREFIX.match(timestamp) if isinstance(timestamp, str) else None
+    return match.group(1) if match else UNDATED
+
+def partition_path(directory, key):
+    return os.path.join(directory, PARTITION_FILE.format(key))
+
+def first_id(key):
+    """Start of the id block reserved for one partition."""
+    if key == UNDATED:
+        return UNDATED_BLOCK * ID_SPAN
+    year, month = int(key[:4]), int(key[5:7])
+    return (year * 12 + month - 1) * ID_SPAN
+
+def list_partitions(directory):
+    """(key, path) for every partition file, months in order and UNDATED last."""
+    found = []
+    for path in glob.glob(os.path.join(glob.escape(directory), PARTITION_FILE.format("*"))):
+        key = os.path.basename(path)[len("logs_"):-len(".db")]
+        if key == UNDATED or MONTH_PREFIX.fullmatch(key):
+            found.append((key, path))
+    return sorted(found, key=lambda item: (item[0] == UNDATED, item[0]))
+
+def overlaps(key, start=None, end=None):
+    """Whether a partition can hold rows with start <= timestamp <= end.
+
+    The bounds are compared as text, like the SQL filters: every timestamp
+    in month M starts with M, so M is out of range only when start's month
+    is later or end sorts before M itself.
+    """
+    if key == UNDATED:
+        return True
+    return (start is None or start[:7] <= key) and (end is None or key <= end)
+
+def overlapping_partitions(directory, start=None, end=None):
+    return [(key, path) for key, path in list_partitions(directory) if overlaps(key, start, end)]
+
+def contains(key, start=None, end=None):
+    """Whether every timestamp a partition can hold lies within start..end."""
+    if key == UNDATED:
+        return start is None and end is None
+    return (start is None or start <= key) and (end is None or end[:7] > key)
+
+def fetch_partitions(directory, start=None, end=None):
+    """fetch_data over a partition directory, merging the per-month aggregates.
+
+    Months entirely inside the range go through fetch_data unfiltered, so
+    they use their rollups when they have them; only the months at the
+    edges of the range are scanned with the timestamp filter.
+    """
+    aggregates = LogAggregates()
+    for key, path in overlapping_partitions(directory, start, end):
+        if contains(key, start, end):
+            aggregates.merge(fetch_data(path))
+        else:
+            aggregates.merge(fetch_data(path, start, end))
+    return aggregates
+
+def open_partition(directory, key):
+    """Connect to one partition, creating it with its id block on first use."""
+    os.makedirs(directory, exist_ok=True)
+    conn = connect(partition_path(directory, key))
+    init_schema(conn)
+    with conn:
+        if conn.execute("SELECT 1 FROM sqlite_sequence WHERE name = 'search_logs'").fetchone() is None:
+            conn.execute("INSERT INTO sqlite_sequence (name, seq) VALUES ('search_logs', ?)", (first_id(key),))
+    return conn
+
+class PartitionWriter:
+    """Routes (timestamp, user_id, search_query, response_time) rows to their month's partition.
+
+    Connections are opened lazily and kept, so a long-running ingest path
+    pays for opening a partition once. A missing timestamp is stamped with
+    the current UTC time, as the table default would have.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.connections = {}
+
+    def route(self, rows):
+        groups = {}
+        for row in rows:
+            if row[0] is None:
+                row = (utc_timestamp(),) + tuple(row[1:])
+            groups.setdefault(partition_key(row[0]), []).append(row)
+        return groups
+
+    def write(self, key, rows):
+        """Insert rows that all belong to one partition, in one transaction."""
+        conn = self.connections.get(key)
+        if conn is None:
+            conn = self.connections[key] = open_partition(self.directory, key)
+        with conn:
+            conn.executemany(INSERT_SQL, rows)
+
+    def insert(self, rows):
+        """Insert rows, one transaction per partition touched; returns the number inserted."""
+        inserted = 0
+        for key, group in self.route(rows).items():
+            self.write(key, group)
+            inserted += len(group)
+        return inserted
+
+    def close(self):
+        for conn in self.connections.values():
+            conn.close()
+        self.connections.clear()
+
+# Rows read from the source per transaction by split_database.
+SPLIT_CHUNK = 50000
+
+COPY_SQL = """
+    INSERT INTO search_logs (id, timestamp, user_id, search_query, response_time)
+    VALUES (?, ?, ?, ?, ?)
+"""
+
+def split_database(db_path, directory, chunk=SPLIT_CHUNK, progress=None):
+    """Copy every row of a single logs database into month partitions under directory.
+
+    Ids are kept: they are far below every partition's id block, so they
+    stay unique and rows inserted later never collide with them. Returns
+    the number of rows copied.
+    """
+    source = sqlite3.connect(db_path)
+    partitions = {}
+    copied = 0
+    last = 0
+    try:
+        while True:
+            rows = source.execute(
+                "SELECT id, timestamp, user_id, search_query, response_time FROM search_logs WHERE id > ? ORDER BY id LIMIT ?",
+                (last, chunk)).fetchall()
+            if not rows:
+                break
+            groups = {}
+            for row in rows:
+                groups.setdefault(partition_key(row[1]), []).append(row)
+            for key, group in groups.items():
+                conn = partitions.get(key)
+                if conn is None:
+                    conn = partitions[key] = open_partition(directory, key)
+                with conn:
+                    conn.executemany(COPY_SQL, group)
+            copied += len(rows)
+            last = rows[-1][0]
+            if progress:
+                progress(copied)
+    finally:
+        source.close()
+        for conn in partitions.values():
+            conn.close()
+    return copied
+
+def attach_limit(conn):
+    if hasattr(conn, "getlimit"):
+        return conn.getlimit(sqlite3.SQLITE_LIMIT_ATTACHED)
+    return DEFAULT_ATTACH_LIMIT
+
+def attached_batches(partitions):
+    """Yield (connection, schema names) with the partitions ATTACHed, at most the attach limit at a time."""
+    conn = sqlite3.connect(":memory:")
+    try:
+        size = max(attach_limit(conn), 1)
+        for i in range(0, len(partitions), size):
+            batch = partitions[i:i + size]
+            schemas = [f"p{n}" for n in range(len(batch))]
+            for schema, (_, path) in zip(schemas, batch):
+                conn.execute(f"ATTACH DATABASE ? AS {schema}", (path,))
+            try:
+                yield conn, schemas
+            finally:
+                for schema in schemas:
+                    conn.execute(f"DETACH DATABASE {schema}")
+    finally:
+        conn.close()
+
+def union_sql(schemas, columns, where):
+    return " UNION ALL ".join(f"SELECT {columns} FROM {schema}.search_logs WHERE 1=1{where}" for schema in schemas)
+
+def select_partitions(directory, columns, where="", params=(), start=None, end=None, arraysize=1000):
+    """Stream rows matching a search_logs filter from the partitions overlapping start..end.
+
+    ``where`` is a string of " AND ..." clauses with ``params`` for one
+    table; it is repeated for every attached partition. Yields lists of up
+    to ``arraysize`` rows, partition by partition, months in order.
+    """
+    partitions = overlapping_partitions(directory, start, end)
+    for conn, schemas in attached_batches(partitions):
+        cursor = conn.cursor()
+        cursor.arraysize = arraysize
+        cursor.execute(union_sql(schemas, columns, where), list(params) * len(schemas))
+        while True:
+            rows = cursor.fetchmany()
+            if not rows:
+                break
+            yield rows
+
+def _order_key(row):
+    # SQLite's ORDER BY timestamp, id: NULL timestamps first.
+    return (row[1] is not None, row[1], row[0])
+
+def select_partitions_page(directory, where="", params=(), start=None, end=None, limit=1000):
+    """The first ``limit`` rows (id, timestamp, user_id, search_query, response_time) in (timestamp, id) order.
+
+    Each batch of partitions returns its own first ``limit`` rows and the
+    batches are merged. Dated partitions hold disjoint, increasing
+    timestamp ranges, so once the months read so far have produced
+    ``limit`` rows, later months cannot contribute.
+    """
+    partitions = overlapping_partitions(directory, start, end)
+    # The undated partition can sort anywhere, so read it in the first batch.
+    partitions = [p for p in partitions if p[0] == UNDATED] + [p for p in partitions if p[0] != UNDATED]
+    columns = "id, timestamp, user_id, search_query, response_time"
+    pages = []
+    dated = 0
+    for conn, schemas in attached_batches(partitions):
+        sql = f"SELECT * FROM ({union_sql(schemas, columns, where)}) ORDER BY timestamp, id LIMIT ?"
+        rows = conn.execute(sql, list(params) * len(schemas) + [limit]).fetchall()
+        pages.append(rows)
+        dated += sum(1 for row in rows if partition_key(row[1]) != UNDATED)
+        if dated >= limit:
+            break
+    return list(heapq.merge(*pages, key=_order_key))[:limit]
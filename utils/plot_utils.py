@@ -1,56 +1,104 @@
-import matplotlib.pyplot as plt
 import os
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
 
 EXPORT_DIR = "exports"
 
-def plot_bar_chart(data, title, xlabel, ylabel, save=False, top_n=None):
-    if not data:
-        print(f"No data to plot for {title}")
-        return
+def chart_spec(kind, data, title, xlabel, ylabel, path=None, top_n=None):
+    """Everything needed to render one chart, as a picklable dict for render_charts."""
+    return {"kind": kind, "data": list(data), "title": title, "xlabel": xlabel,
+            "ylabel": ylabel, "path": path or default_chart_path(title), "top_n": top_n}
 
+def default_chart_path(title):
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    return os.path.join(EXPORT_DIR, title.lower().replace(" ", "_") + f"_{timestamp}.png")
+
+def _prepare(kind, data, top_n=None):
+    if kind == "line":
+        return sorted(data, key=lambda x: x[0])
+    data = [row for row in data if row[1] is not None]
     data = sorted(data, key=lambda x: x[1], reverse=True)
-    if top_n:
-        data = data[:top_n]
+    return data[:top_n] if top_n else data
 
+def _draw(ax, kind, data, title, xlabel, ylabel):
     labels, values = zip(*data)
+    if kind == "line":
+        ax.plot(labels, values, marker='o', linestyle='-', color='darkgreen')
+        ax.grid(True, linestyle="--", alpha=0.6)
+    else:
+        ax.bar(labels, values, color="skyblue")
+        ax.grid(axis="y", linestyle="--", alpha=0.7)
+    ax.set_title(title)
+    ax.set_xlabel(xlabel)
+    ax.set_ylabel(ylabel)
+    ax.tick_params(axis="x", labelrotation=45)
+
+def render_chart(spec):
+    """Render one chart spec to PNG on the Agg canvas, without pyplot's global state.
+
+    Returns the saved path, or None when there was nothing to plot.
+    """
+    data = _prepare(spec["kind"], spec["data"], spec.get("top_n"))
+    if not data:
+        print(f"No data to plot for {spec['title']}")
+        return None
+
+    fig = Figure(figsize=(10, 6))
+    FigureCanvasAgg(fig)
+    ax = fig.add_subplot()
+    _draw(ax, spec["kind"], data, spec["title"], spec["xlabel"], spec["ylabel"])
+    fig.tight_layout()
+    fig.savefig(spec["path"])
+    # Nothing else references the figure, so it is freed as soon as we return.
+    fig.clear()
+    return spec["path"]
+
+def render_charts(specs, processes=None, mp_context=None):
+    """Render a batch of chart specs in parallel across a process pool.
+
+    With processes=1 (or a single chart) they are rendered in this process.
+    Multi-threaded callers should pass a "spawn" mp_context rather than fork.
+    """
+    specs = list(specs)
+    if processes is None:
+        processes = min(len(specs), os.cpu_count() or 1)
+    if processes <= 1 or len(specs) <= 1:
+        return [render_chart(spec) for spec in specs]
+    with ProcessPoolExecutor(max_workers=processes, mp_context=mp_context) as pool:
+        return list(pool.map(render_chart, specs))
+
+def _show(kind, data, title, xlabel, ylabel):
+    import matplotlib.pyplot as plt
     plt.figure(figsize=(10, 6))
-    plt.bar(labels, values, color="skyblue")
-    plt.title(title)
-    plt.xlabel(xlabel)
-    plt.ylabel(ylabel)
-    plt.xticks(rotation=45)
-    plt.grid(axis="y", linestyle="--", alpha=0.7)
+    _draw(plt.gca(), kind, data, title, xlabel, ylabel)
     plt.tight_layout()
+    plt.show()
+    plt.close()
 
-    if save:
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        filename = os.path.join(EXPORT_DIR, title.lower().replace(" ", "_") + f"_{timestamp}.png")
-        plt.savefig(filename)
-        print(f"📁 Saved graph to {filename}")
-    else:
-        plt.show()
+def plot_bar_chart(data, title, xlabel, ylabel, save=False, top_n=None, output_path=None):
+    if save or output_path:
+        path = render_chart(chart_spec("bar", data, title, xlabel, ylabel, path=output_path, top_n=top_n))
+        if path and not output_path:
+            print(f"📁 Saved graph to {path}")
+        return
 
-def plot_line_chart(data, title, xlabel, ylabel, save=False):
+    data = _prepare("bar", data, top_n)
     if not data:
         print(f"No data to plot for {title}")
         return
+    _show("bar", data, title, xlabel, ylabel)
 
-    data = sorted(data, key=lambda x: x[0])
-    dates, counts = zip(*data)
-    plt.figure(figsize=(10, 6))
-    plt.plot(dates, counts, marker='o', linestyle='-', color='darkgreen')
-    plt.title(title)
-    plt.xlabel(xlabel)
-    plt.ylabel(ylabel)
-    plt.xticks(rotation=45)
-    plt.grid(True, linestyle="--", alpha=0.6)
-    plt.tight_layout()
+def plot_line_chart(data, title, xlabel, ylabel, save=False, output_path=None):
+    if save or output_path:
+        path = render_chart(chart_spec("line", data, title, xlabel, ylabel, path=output_path))
+        if path and not output_path:
+            print(f"📁 Saved graph to {path}")
+        return
 
-    if save:
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        filename = os.path.join(EXPORT_DIR, title.lower().replace(" ", "_") + f"_{timestamp}.png")
-        plt.savefig(filename)
-        print(f"📁 Saved graph to {filename}")
-    else:
-        plt.show()
+    data = _prepare("line", data)
+    if not data:
+        print(f"No data to plot for {title}")
+        return
+    _show("line", data, title, xlabel, ylabel)
@@ -0,0 +1,136 @@
+import json
+import math
+
+# Values at or below this are counted as zero (log-buckets need x > 0).
+MIN_POSITIVE = 1e-9
+
+REPORT_QUANTILES = [("p50", 0.5), ("p90", 0.9), ("p95", 0.95), ("p99", 0.99), ("p999", 0.999)]
+
+class ResponseTimeSketch:
+    """Mergeable log-bucket histogram for response times.
+
+    Every value lands in bucket ``ceil(log_gamma(x))`` where
+    ``gamma = (1 + a) / (1 - a)``, so any quantile is returned within a
+    relative error ``a`` (default 1%) while memory only grows with the
+    log of the value range, not with the number of values. Count, sum,
+    min and max are tracked exactly. Two sketches with the same accuracy
+    merge by adding bucket counts, which is what lets per-day sketches be
+    persisted and combined across days, users or databases.
+    """
+
+    def __init__(self, relative_accuracy=0.01):
+        self.relative_accuracy = relative_accuracy
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._inv_log_gamma = 1 / math.log(self.gamma)
+        self.buckets = {}
+        self.zero_count = 0
+        self.count = 0
+        self.sum = 0.0
+        self.min = None
+        self.max = None
+        self.non_finite = 0   # NaN / Infinity values, counted but kept out of the stats
+
+    @classmethod
+    def from_values(cls, values, relative_accuracy=0.01):
+        sketch = cls(relative_accuracy)
+        sketch.update(values)
+        return sketch
+
+    def add(self, value):
+        if value is None:
+            return
+        if not math.isfinite(value):
+            self.non_finite += 1
+            return
+        self.count += 1
+        self.sum += value
+        if self.min is None or value < self.min:
+            self.min = value
+        if self.max is None or value > self.max:
+            self.max = value
+        if value <= MIN_POSITIVE:
+            self.zero_count += 1
+        else:
+            index = math.ceil(math.log(value) * self._inv_log_gamma)
+            self.buckets[index] = self.buckets.get(index, 0) + 1
+
+    def update(self, values):
+        for value in values:
+            self.add(value)
+
+    def merge(self, other):
+        if other.relative_accuracy != self.relative_accuracy:
+            raise ValueError("Cannot merge sketches with different relative accuracy")
+        for index, count in other.buckets.items():
+            self.buckets[index] = self.buckets.get(index, 0) + count
+        self.zero_count += other.zero_count
+        self.non_finite += other.non_finite
+        self.count += other.count
+        self.sum += other.sum
+        if other.min is not None and (self.min is None or other.min < self.min):
+            self.min = other.min
+        if other.max is not None and (self.max is None or other.max > self.max):
+            self.max = other.max
+        return self
+
+    @property
+    def mean(self):
+        return self.sum / self.count if self.count else None
+
+    def quantile(self, q):
+        """Estimated q-quantile (0 <= q <= 1), or None for an empty sketch."""
+        if not self.count:
+            return None
+        rank = q * (self.count - 1)
+        seen = self.zero_count
+        if rank < seen:
+            return max(self.min, 0.0)
+        for index in sorted(self.buckets):
+            seen += self.buckets[index]
+            if rank < seen:
+                estimate = 2 * self.gamma ** index / (self.gamma + 1)
+                return min(max(estimate, self.min), self.max)
+        return self.max
+
+    def quantiles(self, points=REPORT_QUANTILES):
+        return {label: self.quantile(q) for label, q in points}
+
+    def __len__(self):
+        return self.count
+
+    def to_dict(self):
+        return {
+            "relative_accuracy": self.relative_accuracy,
+            "count": self.count,
+            "sum": self.sum,
+            "min": self.min,
+            "max": self.max,
+            "zero_count": self.zero_count,
+            "non_finite": self.non_finite,
+            "buckets": {str(index): count for index, count in self.buckets.items()},
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        sketch = cls(data["relative_accuracy"])
+        sketch.count = data["count"]
+        sketch.sum = data["sum"]
+        sketch.min = data["min"]
+        sketch.max = data["max"]
+        sketch.zero_count = data["zero_count"]
+        sketch.non_finite = data.get("non_finite", 0)
+        sketch.buckets = {int(index): count for index, count in data["buckets"].items()}
+        return sketch
+
+    def dumps(self):
+        return json.dumps(self.to_dict(), separators=(",", ":"))
+
+    @classmethod
+    def loads(cls, text):
+        return cls.from_dict(json.loads(text))
+
+def as_sketch(response_times):
+    """Accept either a sketch or a plain sequence of response times."""
+    if isinstance(response_times, ResponseTimeSketch):
+        return response_times
+    return ResponseTimeSketch.from_values(response_times)
@@ -0,0 +1,206 @@
+import csv
+import gzip
+import io
+import os
+import time
+from datetime import date, datetime, timedelta, timezone
+from utils.compact import next_id_chunk
+from utils.db_utils import connect
+from utils.partitions import UNDATED, list_partitions
+from utils.rollups import purge_rows, rollup_deltas
+
+# Ids examined per delete transaction. Small batches keep each write lock
+# short, so the live ingest only ever waits a few milliseconds.
+PURGE_BATCH = 5000
+
+# Free pages handed back per incremental_vacuum step after a batch.
+VACUUM_STEP_PAGES = 2000
+
+ARCHIVE_FILE = "search_logs_before_{}.csv.gz"
+ARCHIVE_COLUMNS = ["timestamp", "user_id", "search_query", "response_time"]
+
+def cutoff_for(days=None, before=None):
+    """The 'YYYY-MM-DD' retention cutoff: rows dated earlier expire. None expires everything."""
+    if before:
+        return date.fromisoformat(before[:10]).isoformat()
+    if days is not None:
+        return (datetime.now(timezone.utc).date() - timedelta(days=days)).isoformat()
+    return None
+
+def expiry_condition(cutoff):
+    # Rows whose timestamp does not parse as a date never expire by age.
+    if cutoff is None:
+        return "1=1", []
+    return "DATE(timestamp) < ?", [cutoff]
+
+class Archive:
+    """Appends expired rows to a gzipped CSV that import_logs.py can load.
+
+    Every batch is written as its own gzip member and synced before the
+    rows are deleted, so an interrupted purge never loses rows (at worst
+    the batch it was on is archived twice).
+    """
+
+    def __init__(self, directory, cutoff):
+        os.makedirs(directory, exist_ok=True)
+        self.path = os.path.join(directory, ARCHIVE_FILE.format(cutoff or "all"))
+        self.rows = 0
+
+    def write(self, rows):
+        if not rows:
+            return
+        buf = io.StringIO()
+        writer = csv.writer(buf)
+        if not os.path.exists(self.path) or os.path.getsize(self.path) == 0:
+            writer.writerow(ARCHIVE_COLUMNS)
+        writer.writerows(rows)
+        with open(self.path, "ab") as f:
+            f.write(gzip.compress(buf.getvalue().encode("utf-8"), compresslevel=6))
+            f.flush()
+            os.fsync(f.fileno())
+        self.rows += len(rows)
+
+def new_stats():
+    return {"rows": 0, "batches": 0, "max_lock": 0.0, "pages_freed": 0,
+            "bytes_before": 0, "bytes_after": 0, "dropped_partitions": 0}
+
+def merge_stats(total, stats):
+    for key, value in stats.items():
+        total[key] = max(total[key], value) if key == "max_lock" else total[key] + value
+    return total
+
+def database_bytes(conn):
+    return conn.execute("PRAGMA page_count").fetchone()[0] * conn.execute("PRAGMA page_size").fetchone()[0]
+
+def vacuum_step(conn, stats):
+    """Return up to VACUUM_STEP_PAGES free pages to the file system (auto_vacuum=INCREMENTAL only)."""
+    free = conn.execute("PRAGMA freelist_count").fetchone()[0]
+    if not free:
+        return
+    started = time.perf_counter()
+    conn.execute(f"PRAGMA incremental_vacuum({min(free, VACUUM_STEP_PAGES)})").fetchall()
+    stats["max_lock"] = max(stats["max_lock"], time.perf_counter() - started)
+    stats["pages_freed"] += free - conn.execute("PRAGMA freelist_count").fetchone()[0]
+
+def purge_database(db_path, cutoff=None, batch=PURGE_BATCH, archive=None, vacuum=True, pause=0.0, progress=None):
+    """Delete expired rows from one database in short id-range transactions.
+
+    The table is walked in slices of ``batch`` ids present (keyset, see
+    compact.next_id_chunk), and the expiry condition is only evaluated
+    inside each slice, so no statement scans the whole table and gaps in
+    the id space cost nothing. A slice with expired rows then takes the
+    write lock, deletes them (keeping the rollups in step, see
+    rollups.purge_rows, with the deltas read beforehand) and commits;
+    slices with none are skipped without locking. With auto_vacuum=INCREMENTAL
+    the freed pages are returned to the file system a step at a time.
+    The report state of log_reporter.py is rebuilt on its next run.
+    Returns a stats dict (see new_stats).
+    """
+    stats = new_stats()
+    conn = connect(db_path)
+    conn.isolation_level = None
+    try:
+        stats["bytes_before"] = database_bytes(conn)
+        incremental = conn.execute("PRAGMA auto_vacuum").fetchone()[0] == 2
+        condition, params = expiry_condition(cutoff)
+        # Both ends come straight off the rowid b-tree.
+        low, high = conn.execute("SELECT MIN(id), MAX(id) FROM search_logs").fetchone()
+
+        last = (low or 1) - 1
+        while high is not None and last < high:
+            upper, present = next_id_chunk(conn, last, high, batch)
+            if not present:
+                break
+            where = f"id > ? AND id <= ? AND {condition}"
+            where_params = [last, upper] + params
+            last = upper
+            if conn.execute(f"SELECT 1 FROM search_logs WHERE {where} LIMIT 1", where_params).fetchone() is None:
+                continue
+            if archive:
+                archive.write(conn.execute(
+                    f"SELECT timestamp, user_id, search_query, response_time FROM search_logs WHERE {where} ORDER BY id",
+                    where_params).fetchall())
+            # Reading the rollup deltas before taking the lock keeps it short.
+            deltas = rollup_deltas(conn, where, where_params)
+
+            conn.execute("BEGIN IMMEDIATE")
+            locked = time.perf_counter()
+            try:
+                deleted = purge_rows(conn, where, where_params, deltas)
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            stats["max_lock"] = max(stats["max_lock"], time.perf_counter() - locked)
+            stats["rows"] += deleted
+            stats["batches"] += 1
+
+            if vacuum and incremental:
+                vacuum_step(conn, stats)
+            if progress:
+                progress(stats["rows"])
+            if pause:
+                time.sleep(pause)
+
+        if vacuum and incremental:
+            while conn.execute("PRAGMA freelist_count").fetchone()[0]:
+                vacuum_step(conn, stats)
+        stats["bytes_after"] = database_bytes(conn)
+    finally:
+        conn.close()
+    return stats
+
+def drop_partition(path, archive=None, batch=PURGE_BATCH):
+    """Remove a whole partition file whose month has expired, archiving its rows first.
+
+    Any connection still open on the file (e.g. a running log_service) keeps
+    writing to the removed file, so drop months that no longer get traffic.
+    """
+    conn = connect(path)
+    try:
+        rows = conn.execute("SELECT COUNT(*) FROM search_logs").fetchone()[0]
+        size = database_bytes(conn)
+        if archive:
+            cursor = conn.execute("SELECT timestamp, user_id, search_query, response_time FROM search_logs ORDER BY id")
+            while True:
+                chunk = cursor.fetchmany(batch)
+                if not chunk:
+                    break
+                archive.write(chunk)
+    finally:
+        conn.close()
+    for suffix in ("", "-wal", "-shm"):
+        if os.path.exists(path + suffix):
+            os.remove(path + suffix)
+    stats = new_stats()
+    stats.update(rows=rows, bytes_before=size, dropped_partitions=1)
+    return stats
+
+def purge(db_path, cutoff=None, batch=PURGE_BATCH, archive_dir=None, vacuum=True, pause=0.0, progress=None):
+    """Apply the retention cutoff to a database file or a partition directory.
+
+    In a partition directory, months that lie entirely before the cutoff
+    are dropped as whole files; only the cutoff's own month and the
+    undated partition need row deletes.
+    """
+    archive = Archive(archive_dir, cutoff) if archive_dir else None
+    if not os.path.isdir(db_path):
+        stats = purge_database(db_path, cutoff, batch, archive, vacuum, pause, progress)
+    else:
+        stats = new_stats()
+        for key, path in list_partitions(db_path):
+            if cutoff is None or (key != UNDATED and key < cutoff[:7]):
+                merge_stats(stats, drop_partition(path, archive, batch))
+            elif key == UNDATED or key == cutoff[:7]:
+                merge_stats(stats, purge_database(path, cutoff, batch, archive, vacuum, pause, progress))
+    stats["archive"] = archive.path if archive and archive.rows else None
+    return stats
+
+def enable_incremental_vacuum(db_path):
+    """Switch an existing database to auto_vacuum=INCREMENTAL; this needs one full VACUUM."""
+    conn = connect(db_path)
+    try:
+        conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+        conn.execute("VACUUM")
+    finally:
+        conn.close()
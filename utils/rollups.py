@@ -0,0 +1,230 @@
+from utils.aggregator import LogAggregates
+from utils.compact import base_table, is_compact, next_id_chunk
+from utils.quantiles import ResponseTimeSketch
+
+# Pre-aggregated (bucket x user) and (bucket x query) tables at hourly and
+# daily grain. Each row carries the search count plus count, sum and sum of
+# squares of response_time, so averages and variances can be rebuilt from
+# any combination of buckets. Rows with an unparseable timestamp go into
+# the '' bucket, which reads back as NULL like DATE(timestamp) would.
+ROLLUPS = {
+    "rollup_hourly_user": ("strftime('%Y-%m-%d %H', timestamp)", "user_id"),
+    "rollup_hourly_query": ("strftime('%Y-%m-%d %H', timestamp)", "search_query"),
+    "rollup_daily_user": ("DATE(timestamp)", "user_id"),
+    "rollup_daily_query": ("DATE(timestamp)", "search_query"),
+}
+
+# One serialized ResponseTimeSketch per day, so percentiles can be
+# reported (and merged across days) without reading raw response times.
+SKETCH_TABLE = "rollup_daily_rt_sketch"
+
+# Rows folded in per transaction during catch-up.
+CATCHUP_CHUNK = 100000
+
+def create_rollups(conn):
+    for table, (_, key) in ROLLUPS.items():
+        conn.execute(f"""
+            CREATE TABLE IF NOT EXISTS {table} (
+                bucket TEXT NOT NULL,
+                {key} TEXT NOT NULL,
+                searches INTEGER NOT NULL,
+                rt_count INTEGER NOT NULL,
+                rt_sum REAL NOT NULL,
+                rt_sumsq REAL NOT NULL,
+                PRIMARY KEY (bucket, {key})
+            ) WITHOUT ROWID
+        """)
+    conn.execute(f"""
+        CREATE TABLE IF NOT EXISTS {SKETCH_TABLE} (
+            bucket TEXT PRIMARY KEY,
+            sketch TEXT NOT NULL
+        )
+    """)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS rollup_state (
+            name TEXT PRIMARY KEY,
+            last_id INTEGER NOT NULL,
+            stale INTEGER NOT NULL DEFAULT 0
+        )
+    """)
+    conn.execute("INSERT OR IGNORE INTO rollup_state (name, last_id) VALUES ('search_logs', 0)")
+    # Ids only grow, so new rows are found by id; changes to rows that were
+    # already folded in just mark the rollups stale for the next refresh.
+    table = base_table(conn)
+    for event in ("DELETE", "UPDATE"):
+        conn.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS rollup_stale_{event.lower()} AFTER {event} ON {table}
+            WHEN old.id <= (SELECT last_id FROM rollup_state WHERE name = 'search_logs')
+            BEGIN
+                UPDATE rollup_state SET stale = 1 WHERE name = 'search_logs' AND stale = 0;
+            END
+        """)
+    conn.commit()
+
+def has_rollups(conn):
+    row = conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'rollup_state'").fetchone()
+    return row is not None
+
+def _fold(conn, low, high):
+    """Add search_logs rows with low < id <= high into every rollup table."""
+    for table, (bucket_expr, key) in ROLLUPS.items():
+        conn.execute(f"""
+            INSERT INTO {table} (bucket, {key}, searches, rt_count, rt_sum, rt_sumsq)
+            SELECT COALESCE({bucket_expr}, ''), {key}, COUNT(*), COUNT(response_time),
+                   TOTAL(response_time), TOTAL(response_time * response_time)
+            FROM search_logs WHERE id > ? AND id <= ?
+            GROUP BY 1, 2
+            ON CONFLICT (bucket, {key}) DO UPDATE SET
+                searches = searches + excluded.searches,
+                rt_count = rt_count + excluded.rt_count,
+                rt_sum = rt_sum + excluded.rt_sum,
+                rt_sumsq = rt_sumsq + excluded.rt_sumsq
+        """, (low, high))
+
+    sketches = {}
+    rows = conn.execute("""
+        SELECT COALESCE(DATE(timestamp), ''), response_time FROM search_logs
+        WHERE id > ? AND id <= ? AND response_time IS NOT NULL
+    """, (low, high))
+    for day, response_time in rows:
+        sketch = sketches.get(day)
+        if sketch is None:
+            sketch = sketches[day] = ResponseTimeSketch()
+        sketch.add(response_time)
+    for day, sketch in sketches.items():
+        row = conn.execute(f"SELECT sketch FROM {SKETCH_TABLE} WHERE bucket = ?", (day,)).fetchone()
+        if row:
+            sketch.merge(ResponseTimeSketch.loads(row[0]))
+        conn.execute(f"INSERT OR REPLACE INTO {SKETCH_TABLE} VALUES (?, ?)", (day, sketch.dumps()))
+
+def _delete(conn, condition, params):
+    if is_compact(conn):
+        # Deletes through the compact view's INSTEAD OF trigger report no changes.
+        count = conn.execute(f"SELECT COUNT(*) FROM search_logs WHERE {condition}", params).fetchone()[0]
+        conn.execute(f"DELETE FROM search_logs WHERE {condition}", params)
+        return count
+    return conn.execute(f"DELETE FROM search_logs WHERE {condition}", params).rowcount
+
+def rollup_deltas(conn, condition, params):
+    """What the already folded-in rows matching condition contribute to each rollup table.
+
+    Read-only, so a purge can compute it before taking the write lock.
+    Returns (last_id, {table: [(searches, rt_count, rt_sum, rt_sumsq, bucket, key)]}),
+    or None when there are no rollups to keep in step (none, or stale).
+    """
+    if not has_rollups(conn):
+        return None
+    last_id, stale = conn.execute("SELECT last_id, stale FROM rollup_state WHERE name = 'search_logs'").fetchone()
+    if stale:
+        return None
+    deltas = {}
+    for table, (bucket_expr, key) in ROLLUPS.items():
+        deltas[table] = conn.execute(f"""
+            SELECT COUNT(*), COUNT(response_time), TOTAL(response_time), TOTAL(response_time * response_time),
+                   COALESCE({bucket_expr}, ''), {key}
+            FROM search_logs WHERE {condition} AND id <= ? GROUP BY 5, 6
+        """, list(params) + [last_id]).fetchall()
+    return last_id, deltas
+
+def purge_rows(conn, condition, params, deltas=None):
+    """Delete the search_logs rows matching condition and take them back out of the rollups.
+
+    Runs inside the caller's transaction. ``deltas`` from rollup_deltas
+    may be computed beforehand, outside the lock; they are recomputed if
+    the rollups moved on in the meantime. Buckets that drop to zero
+    searches are removed, along with the sketch of any day that has no
+    rows left, so the delete does not leave the rollups stale. Returns the
+    number of rows deleted.
+    """
+    state = conn.execute("SELECT last_id, stale FROM rollup_state WHERE name = 'search_logs'").fetchone() \
+        if has_rollups(conn) else None
+    if state is None or state[1]:
+        # No rollups, or a rebuild is already pending: nothing to keep in step.
+        return _delete(conn, condition, params)
+    if deltas is None or deltas[0] != state[0]:
+        deltas = rollup_deltas(conn, condition, params)
+
+    for table, rows in deltas[1].items():
+        key = ROLLUPS[table][1]
+        conn.executemany(f"""
+            UPDATE {table} SET searches = searches - ?, rt_count = rt_count - ?, rt_sum = rt_sum - ?,
+                rt_sumsq = rt_sumsq - ?
+            WHERE bucket = ? AND {key} = ?
+        """, rows)
+        conn.executemany(f"DELETE FROM {table} WHERE bucket = ? AND {key} = ? AND searches <= 0",
+                         [row[4:] for row in rows])
+    days = {row[4] for row in deltas[1]["rollup_daily_user"]}
+    conn.executemany(f"""
+        DELETE FROM {SKETCH_TABLE} WHERE bucket = ?
+        AND NOT EXISTS (SELECT 1 FROM rollup_daily_user WHERE bucket = ?)
+    """, [(day, day) for day in days])
+
+    deleted = _delete(conn, condition, params)
+    # The stale triggers fired on the delete; the rollups were kept in step.
+    conn.execute("UPDATE rollup_state SET stale = 0 WHERE name = 'search_logs'")
+    return deleted
+
+def rebuild_rollups(conn):
+    """Empty the rollups and fold in the whole table again."""
+    create_rollups(conn)
+    with conn:
+        for table in list(ROLLUPS) + [SKETCH_TABLE]:
+            conn.execute(f"DELETE FROM {table}")
+        conn.execute("UPDATE rollup_state SET last_id = 0, stale = 0 WHERE name = 'search_logs'")
+    return refresh_rollups(conn)
+
+def refresh_rollups(conn, chunk=CATCHUP_CHUNK):
+    """Catch the rollups up with rows inserted since the last run.
+
+    Progress is tracked by the highest search_logs id already folded in, so
+    each run only reads new rows. Every chunk re-reads that watermark inside
+    its own write transaction, so concurrent refreshes never fold the same
+    rows twice. If rows that were already folded in have since been deleted
+    or updated the rollups are rebuilt from scratch.
+    """
+    last_id, stale = conn.execute("SELECT last_id, stale FROM rollup_state WHERE name = 'search_logs'").fetchone()
+    max_id = conn.execute("SELECT MAX(id) FROM search_logs").fetchone()[0] or 0
+    if stale or max_id < last_id:
+        return rebuild_rollups(conn)
+
+    folded = 0
+    while last_id < max_id:
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            # Re-read under the write lock: a concurrent refresh (another
+            # request, log_reporter, optimize_db) may have folded this range.
+            last_id = conn.execute("SELECT last_id FROM rollup_state WHERE name = 'search_logs'").fetchone()[0]
+            high, rows = next_id_chunk(conn, last_id, max_id, chunk)
+            if high is None:
+                break
+            _fold(conn, last_id, high)
+            conn.execute("UPDATE rollup_state SET last_id = ? WHERE name = 'search_logs'", (high,))
+        folded += rows
+        last_id = high
+    return folded
+
+def load_rollups(conn):
+    """Build LogAggregates from the rollups without touching search_logs."""
+    aggregates = LogAggregates()
+    cursor = conn.cursor()
+
+    cursor.execute("""
+        SELECT user_id, SUM(searches), SUM(rt_count), SUM(rt_sum)
+        FROM rollup_daily_user GROUP BY user_id
+    """)
+    aggregates.users = {user_id: [searches, rt_count, rt_sum] for user_id, searches, rt_count, rt_sum in cursor}
+
+    cursor.execute("SELECT search_query, SUM(searches) FROM rollup_daily_query GROUP BY search_query")
+    aggregates.queries = dict(cursor.fetchall())
+
+    cursor.execute("SELECT NULLIF(bucket, ''), SUM(searches) FROM rollup_daily_user GROUP BY 1")
+    aggregates.days = dict(cursor.fetchall())
+
+    cursor.execute("SELECT NULLIF(substr(bucket, 12, 2), ''), SUM(searches) FROM rollup_hourly_user GROUP BY 1")
+    aggregates.hours = dict(cursor.fetchall())
+
+    cursor.execute(f"SELECT sketch FROM {SKETCH_TABLE}")
+    for (text,) in cursor:
+        aggregates.response_times.merge(ResponseTimeSketch.loads(text))
+
+    return aggregates
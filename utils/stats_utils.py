@@ -0,0 +1,36 @@
+from utils.quantiles import as_sketch
+
+def compute_summary_stats(user_data, query_data, time_data, hour_data, response_times):
+    """Reduce the fetch_data result sets to the headline numbers."""
+    rt = as_sketch(response_times)
+    return {
+        "total_logs": sum(count for _, count in time_data),
+        "total_users": len(user_data),
+        "total_queries": len(query_data),
+        "active_days": len(time_data),
+        "peak_hour": max(hour_data, key=lambda x: x[1])[0] if hour_data else None,
+        "most_active_user": max(user_data, key=lambda x: x[1])[0] if user_data else None,
+        "top_query": max(query_data, key=lambda x: x[1])[0] if query_data else None,
+        "fastest_response": rt.min,
+        "slowest_response": rt.max,
+        "mean_response": rt.mean,
+        "response_percentiles": rt.quantiles() if rt.count else {}
+    }
+
+def print_summary_report(stats):
+    print("\n📌 Summary Report")
+    print(f"- Total logs: {stats['total_logs']}")
+    print(f"- Unique users: {stats['total_users']}")
+    print(f"- Unique queries: {stats['total_queries']}")
+    print(f"- Active days: {stats['active_days']}")
+    print(f"- Peak hour: {stats['peak_hour'] if stats['peak_hour'] is not None else 'N/A'}")
+    print(f"- Most active user: {stats['most_active_user'] or 'N/A'}")
+    print(f"- Top query: {stats['top_query'] or 'N/A'}")
+
+    if stats["mean_response"] is not None:
+        print(f"- Response time (s): fastest={stats['fastest_response']:.3f}, "
+              f"slowest={stats['slowest_response']:.3f}, mean={stats['mean_response']:.3f}")
+        print("- Response time percentiles (s): " +
+              ", ".join(f"{label}={value:.3f}" for label, value in stats["response_percentiles"].items()))
+    else:
+        print("- No response time data available.")
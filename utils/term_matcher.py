@@ -0,0 +1,135 @@
+import json
+import os
+
+# Bump whenever TermMatcher's tables change shape; older cache files are rebuilt.
+MATCHER_CACHE_VERSION = 1
+
+class TermMatcher:
+    """Aho-Corasick automaton that finds every flagged term in one pass over a query.
+
+    Matching is case-insensitive substring matching, the same as
+    ``term in query.lower()``. The matcher also behaves like the set of terms
+    it was built from, so it can be passed wherever a set of terms was used.
+    """
+
+    def __init__(self, terms):
+        self.terms = frozenset(t.lower() for t in terms if t)
+        self._goto = [{}]
+        self._fail = [0]
+        self._out = [()]
+        for term in self.terms:
+            self._add(term)
+        self._link()
+
+    def _add(self, term):
+        state = 0
+        for ch in term:
+            nxt = self._goto[state].get(ch)
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto[state][ch] = nxt
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append(())
+            state = nxt
+        self._out[state] = self._out[state] + (term,)
+
+    def _link(self):
+        # Breadth-first so each state's failure target is finished before it.
+        queue = list(self._goto[0].values())
+        for state in queue:
+            for ch, nxt in self._goto[state].items():
+                queue.append(nxt)
+                fail = self._fail[state]
+                while fail and ch not in self._goto[fail]:
+                    fail = self._fail[fail]
+                target = self._goto[fail].get(ch, 0)
+                self._fail[nxt] = target if target != nxt else 0
+                self._out[nxt] = self._out[nxt] + self._out[self._fail[nxt]]
+
+    def find(self, text):
+        """Return the set of terms occurring in text."""
+        goto, fail, out = self._goto, self._fail, self._out
+        hits = set()
+        state = 0
+        for ch in text.lower():
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            if out[state]:
+                hits.update(out[state])
+        return hits
+
+    def matches(self, text):
+        """True if any term occurs in text; stops at the first hit."""
+        goto, fail, out = self._goto, self._fail, self._out
+        state = 0
+        for ch in text.lower():
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            if out[state]:
+                return True
+        return False
+
+    def __iter__(self):
+        return iter(self.terms)
+
+    def __len__(self):
+        return len(self.terms)
+
+    def __contains__(self, term):
+        return term in self.terms
+
+    def to_dict(self):
+        """The automaton's tables as plain JSON-serialisable data."""
+        return {"terms": sorted(self.terms), "goto": self._goto, "fail": self._fail,
+                "out": [list(terms) for terms in self._out]}
+
+    @classmethod
+    def from_dict(cls, data):
+        """Rebuild a matcher from to_dict() output without re-running the construction."""
+        goto, fail, out = data["goto"], data["fail"], data["out"]
+        if not (len(goto) == len(fail) == len(out) > 0):
+            raise ValueError("inconsistent matcher tables")
+        matcher = cls.__new__(cls)
+        matcher.terms = frozenset(data["terms"])
+        matcher._goto = [{ch: int(nxt) for ch, nxt in edges.items()} for edges in goto]
+        matcher._fail = [int(state) for state in fail]
+        matcher._out = [tuple(terms) for terms in out]
+        states = len(goto)
+        if any(not 0 <= nxt < states for edges in matcher._goto for nxt in edges.values()) \
+                or any(not 0 <= state < states for state in matcher._fail):
+            raise ValueError("matcher state out of range")
+        return matcher
+
+def load_matcher(terms_file, load_terms):
+    """Return a TermMatcher for terms_file, reusing an on-disk build if it is current.
+
+    The automaton's tables are saved as JSON next to the terms file, keyed by
+    MATCHER_CACHE_VERSION and the file's mtime and size; ``load_terms`` is
+    only called when that is stale. A cache file that does not parse is
+    ignored and rebuilt.
+    """
+    cache_file = os.path.join(os.path.dirname(terms_file), "." + os.path.basename(terms_file) + ".matcher.json")
+    try:
+        st = os.stat(terms_file)
+        key = [MATCHER_CACHE_VERSION, st.st_mtime_ns, st.st_size]
+    except OSError:
+        return TermMatcher(load_terms())
+
+    try:
+        with open(cache_file, encoding="utf-8") as f:
+            cached = json.load(f)
+        if cached["key"] == key:
+            return TermMatcher.from_dict(cached["matcher"])
+    except (OSError, ValueError, KeyError, TypeError, AttributeError):
+        pass
+
+    matcher = TermMatcher(load_terms())
+    try:
+        with open(cache_file, "w", encoding="utf-8") as f:
+            json.dump({"key": key, "matcher": matcher.to_dict()}, f)
+    except OSError:
+        pass
+    return matcher
@@ -0,0 +1,156 @@
+import queue
+import sqlite3
+import threading
+import time
+from utils.db_utils import connect
+from utils.partitions import PartitionWriter
+
+_STOP = object()
+
+# A locked/busy database is retried this many times (FLUSH_RETRY_DELAY
+# apart) before the batch falls back to row-by-row inserts.
+FLUSH_RETRIES = 40
+FLUSH_RETRY_DELAY = 0.05
+
+def is_transient(error):
+    return isinstance(error, sqlite3.OperationalError) and ("locked" in str(error) or "busy" in str(error))
+
+class WriteBehindBuffer:
+    """Queue rows in memory and commit them in batches from one writer thread.
+
+    A batch is flushed as soon as it holds ``max_rows`` rows or its oldest row
+    has waited ``max_delay_ms`` milliseconds, so a crash loses at most
+    ``max_delay_ms`` worth of accepted rows (plus whatever is still queued
+    behind a slow disk). With ``partition_dir`` the rows are
+    (timestamp, user_id, search_query, response_time) tuples routed to
+    their month's partition instead of being run through ``insert_sql``.
+    """
+
+    def __init__(self, db_file, insert_sql, max_rows=500, max_delay_ms=200, max_queue=100000, partition_dir=None):
+        self.db_file = db_file
+        self.insert_sql = insert_sql
+        self.partition_dir = partition_dir
+        self.max_rows = max_rows
+        self.max_delay = max_delay_ms / 1000.0
+        self.queue = queue.Queue(maxsize=max_queue)
+        self.flushed_rows = 0
+        self.flushes = 0
+        self.dropped_rows = 0
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name="log-writer", daemon=True)
+        self._thread.start()
+
+    def put(self, row):
+        """Queue one row; blocks when the queue is full (backpressure)."""
+        if self._closed:
+            raise RuntimeError("write buffer is closed")
+        self.queue.put(row)
+
+    def close(self, timeout=None):
+        """Flush everything still queued and stop the writer thread."""
+        if self._closed:
+            return
+        self._closed = True
+        self.queue.put(_STOP)
+        self._thread.join(timeout)
+
+    def _collect(self):
+        first = self.queue.get()
+        if first is _STOP:
+            return [], True
+
+        batch = [first]
+        deadline = time.monotonic() + self.max_delay
+        while len(batch) < self.max_rows:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                row = self.queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if row is _STOP:
+                return batch, True
+            batch.append(row)
+        return batch, False
+
+    def _write(self, target, key, rows):
+        if key is None:
+            with target:
+                target.executemany(self.insert_sql, rows)
+        else:
+            target.write(key, rows)
+
+    def _write_rows(self, target, key, rows):
+        """Commit rows, retrying while the database is locked; raises on any other error."""
+        for attempt in range(FLUSH_RETRIES):
+            try:
+                self._write(target, key, rows)
+                return
+            except sqlite3.Error as e:
+                if not is_transient(e) or attempt == FLUSH_RETRIES - 1:
+                    raise
+                print(f"Log flush failed, retrying: {e}")
+                time.sleep(FLUSH_RETRY_DELAY)
+
+    def _write_one_by_one(self, target, key, rows):
+        # Isolates the rows the database rejects; the rest are still stored.
+        stored = 0
+        for row in rows:
+            try:
+                self._write_rows(target, key, [row])
+                stored += 1
+            except sqlite3.Error as e:
+                self.dropped_rows += 1
+                print(f"Dropping log row {row!r}: {e}")
+        return stored
+
+    def _flush(self, target, batch):
+        # Partitioned batches commit one partition at a time, so a retry
+        # only repeats the partition that failed.
+        groups = [(None, batch)] if self.partition_dir is None else target.route(batch).items()
+        for key, rows in groups:
+            try:
+                self._write_rows(target, key, rows)
+                self.flushed_rows += len(rows)
+            except sqlite3.Error as e:
+                if is_transient(e):
+                    # Still locked after every retry: give up on the batch rather than stall ingest.
+                    self.dropped_rows += len(rows)
+                    print(f"Log flush failed, dropping {len(rows)} rows: {e}")
+                    continue
+                print(f"Log flush failed ({e}); storing the batch row by row")
+                self.flushed_rows += self._write_one_by_one(target, key, rows)
+        self.flushes += 1
+
+    def _flush_safely(self, target, batch):
+        # The writer thread must outlive any bad batch, or every later
+        # accepted row would silently pile up in the queue.
+        try:
+            self._flush(target, batch)
+        except Exception as e:
+            self.dropped_rows += len(batch)
+            print(f"Log flush failed, dropping {len(batch)} rows: {e}")
+
+    def _run(self):
+        conn = connect(self.db_file) if self.partition_dir is None else PartitionWriter(self.partition_dir)
+        try:
+            stopping = False
+            while not stopping:
+                batch, stopping = self._collect()
+                if batch:
+                    self._flush_safely(conn, batch)
+
+            # Drain anything that raced in after the stop marker.
+            leftover = []
+            while True:
+                try:
+                    row = self.queue.get_nowait()
+                except queue.Empty:
+                    break
+                if row is not _STOP:
+                    leftover.append(row)
+            if leftover:
+                self._flush_safely(conn, leftover)
+        finally:
+            conn.close()
@@ -1,42 +1,133 @@
 from flask import Flask, render_template, send_from_directory
+import json
+import multiprocessing
 import os
-from log_visualizer import fetch_data, plot_bar_chart, plot_line_chart
+import sqlite3
+import tempfile
+import threading
+import time
+from utils.db_utils import fetch_data
 
 app = Flask(__name__)
 EXPORT_FOLDER = "web_exports"
+DB_PATH = "logs.db"
+
+# How long a data-version check is trusted before asking the database again.
+VERSION_TTL = 5
+# How long the very first page load waits for charts that were never rendered.
+FIRST_RENDER_WAIT = 30
+
+# (filename, chart kind, LogAggregates attribute, title, x label, y label)
+CHARTS = [
+    ("searches_per_user.png", "bar", "user_counts", "Searches Per User", "User ID", "Search Count"),
+    ("searches_per_query.png", "bar", "query_counts", "Searches Per Query", "Search Query", "Count"),
+    ("searches_per_day.png", "bar", "time_counts", "Searches Per Day", "Date", "Count"),
+    ("searches_per_day_(line_chart).png", "line", "time_counts", "Searches Per Day (Line Chart)", "Date", "Count"),
+    ("average_response_time_per_user.png", "bar", "avg_response_times", "Average Response Time Per User", "User ID", "Avg Response Time (s)"),
+]
+
+def data_version(db_path):
+    """Cheap fingerprint of search_logs that changes whenever rows are added or removed."""
+    conn = sqlite3.connect(db_path)
+    try:
+        max_id, count = conn.execute("SELECT MAX(id), COUNT(*) FROM search_logs").fetchone()
+    finally:
+        conn.close()
+    return f"{max_id or 0}-{count}"
+
+def render_dashboard(db_path, folder):
+    """Render every chart into a scratch directory in parallel, then swap the files into folder."""
+    from utils.plot_utils import chart_spec, render_charts  # matplotlib only in the renderer
+
+    data = fetch_data(db_path)
+    with tempfile.TemporaryDirectory(dir=folder) as scratch:
+        specs = [chart_spec(kind, getattr(data, attr), title, xlabel, ylabel, path=os.path.join(scratch, filename))
+                 for filename, kind, attr, title, xlabel, ylabel in CHARTS]
+        # This runs on the renderer thread, so worker processes are spawned, not forked.
+        paths = render_charts(specs, mp_context=multiprocessing.get_context("spawn"))
+        for filename, path in zip([chart[0] for chart in CHARTS], paths):
+            if path:
+                os.replace(path, os.path.join(folder, filename))
+
+class ChartCache:
+    """PNG charts reused until the data version changes, re-rendered by one background thread.
+
+    Pages are served from whatever was rendered last (stale-while-revalidate);
+    a version change only wakes the worker.
+    """
+
+    def __init__(self, folder, db_path):
+        self.folder = folder
+        self.db_path = db_path
+        self.version_file = os.path.join(folder, "version.json")
+        self.rendered_version = self._load_version()
+        self._checked_version = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._rendered = threading.Event()
+        if self.rendered_version is not None:
+            self._rendered.set()
+        self._thread = None
+
+    def _load_version(self):
+        try:
+            with open(self.version_file, encoding="utf-8") as f:
+                return json.load(f)["version"]
+        except (OSError, ValueError, KeyError):
+            return None
+
+    def current_version(self):
+        with self._lock:
+            if self._checked_version is None or time.monotonic() - self._checked_at > VERSION_TTL:
+                self._checked_version = data_version(self.db_path)
+                self._checked_at = time.monotonic()
+            return self._checked_version
+
+    def refresh(self):
+        """Schedule a re-render if the data changed; returns the version to serve now."""
+        if self.current_version() != self.rendered_version:
+            with self._lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name="chart-renderer", daemon=True)
+                    self._thread.start()
+            self._wakeup.set()
+            if self.rendered_version is None:
+                self._rendered.wait(FIRST_RENDER_WAIT)
+        return self.rendered_version
+
+    def _run(self):
+        while True:
+            self._wakeup.wait()
+            self._wakeup.clear()
+            version = data_version(self.db_path)
+            if version == self.rendered_version:
+                continue
+            try:
+                render_dashboard(self.db_path, self.folder)
+            except Exception as e:
+                print(f"Chart rendering failed: {e}")
+                continue
+            with open(self.version_file, "w", encoding="utf-8") as f:
+                json.dump({"version": version}, f)
+            self.rendered_version = version
+            self._rendered.set()
 
 # Ensure export folder exists
 os.makedirs(EXPORT_FOLDER, exist_ok=True)
+chart_cache = ChartCache(EXPORT_FOLDER, DB_PATH)
 
 @app.route("/")
 def index():
-    # Generate charts and save to PNG files
-    user_data, query_data, time_data, avg_data = fetch_data()
-
-    plot_bar_chart(user_data, "Searches Per User", "User ID", "Search Count", save=True)
-    plot_bar_chart(query_data, "Searches Per Query", "Search Query", "Count", save=True)
-    plot_bar_chart(time_data, "Searches Per Day", "Date", "Count", save=True)
-    plot_line_chart(time_data, "Searches Per Day (Line Chart)", "Date", "Count", save=True)
-    plot_bar_chart(avg_data, "Average Response Time Per User", "User ID", "Avg Response Time (s)", save=True)
-
-    # Move images to export folder (if not already saved there)
-    filenames = [
-        "searches_per_user.png",
-        "searches_per_query.png",
-        "searches_per_day.png",
-        "searches_per_day_(line_chart).png",
-        "average_response_time_per_user.png"
-    ]
-
-    for f in filenames:
-        if os.path.exists(f):
-            os.replace(f, os.path.join(EXPORT_FOLDER, f))
-
-    return render_template("index.html", images=filenames)
+    version = chart_cache.refresh()
+    filenames = [chart[0] for chart in CHARTS]
+    return render_template("index.html", images=filenames, version=version)
 
 @app.route("/charts/<filename>")
 def charts(filename):
-    return send_from_directory(EXPORT_FOLDER, filename)
+    # send_from_directory sets ETag and Last-Modified from the file, so
+    # browsers revalidate with a cheap 304 until the chart is re-rendered.
+    return send_from_directory(chart_cache.folder, filename, max_age=0)
 
 if __name__ == "__main__":
-    app.run(debug=True)
\ No newline at end of file
+    app.run(debug=True)